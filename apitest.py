@@ -1,68 +1,81 @@
-import requests
+"""Smoke test and load benchmark for the Sensor Vest API.
+
+    python apitest.py                  # call each endpoint once and print the responses
+    python apitest.py load [options]   # concurrent writers and readers, latency report
+
+The load benchmark creates N vests with M sensors each, then for a fixed
+duration runs one writer per vest, posting every sensor's samples at the
+given rate, alongside dashboard-style readers.  It reports throughput and
+p50/p95/p99 latency per endpoint and saves the results as JSON; pass an
+earlier results file with --compare to see the change.  With --local it
+runs offline against backend/local_server.py on DATABASE_URL:
+
+    DATABASE_URL=postgresql://postgres@localhost/sensor_vest \
+        python apitest.py load --local --vests 4 --sensors 10 --rate 50 --duration 30
+"""
+import argparse
 import json
+import random
+import threading
 import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+import config
+from utils.api_requests import ApiError, SensorVestClient
 
 # Configuration
-API_BASE_URL = "https://b4aifmwd05.execute-api.us-east-1.amazonaws.com/dev"
+API_BASE_URL = config.API_BASE_URL
 
-headers = {
-    "Content-Type": "application/json",
-}
+client = SensorVestClient(API_BASE_URL)
+
+def report(label, call, *args, **kwargs):
+    """Run a client call, print its status and JSON body, and return the body"""
+    try:
+        data = call(*args, **kwargs)
+    except ApiError as e:
+        print(f"{label} status: {e.status_code}")
+        print(e.message)
+        return None
+    print(f"{label} status: OK")
+    print(json.dumps(data, indent=2))
+    return data
 
 def test_get_vests():
     """Test GET /vests endpoint"""
-    response = requests.get(f"{API_BASE_URL}/vests", headers=headers)
-    print(f"GET /vests status: {response.status_code}")
-    print(json.dumps(response.json(), indent=2))
-    return response.json()
+    return report("GET /vests", client.get_vests)
 
 def test_create_vest():
     """Test POST /vests endpoint"""
-    vest_data = {
-        "name": f"Test Vest {int(time.time())}",
-        "description": "Automatically created test vest",
-        "is_active": True
-    }
-    response = requests.post(
-        f"{API_BASE_URL}/vests", 
-        headers=headers,
-        json=vest_data
+    return report(
+        "POST /vests",
+        client.create_vest,
+        name=f"Test Vest {int(time.time())}",
+        description="Automatically created test vest",
+        is_active=True
     )
-    print(f"POST /vests status: {response.status_code}")
-    print(json.dumps(response.json(), indent=2))
-    return response.json()
 
 def test_get_vest(vest_id):
     """Test GET /vests/{vest_id} endpoint"""
-    response = requests.get(f"{API_BASE_URL}/vests/{vest_id}", headers=headers)
-    print(f"GET /vests/{vest_id} status: {response.status_code}")
-    print(json.dumps(response.json(), indent=2))
-    return response.json()
+    return report(f"GET /vests/{vest_id}", client.get_vest, vest_id)
 
 def test_create_sensor(vest_id, sensor_type_id, position):
     """Test POST /sensors endpoint"""
-    sensor_data = {
-        "vest_id": vest_id,
-        "sensor_type_id": sensor_type_id,
-        "position": position,
-        "is_active": True,
-        "calibration_data": json.dumps({"offset": 0.5, "scale": 1.2})
-    }
-    response = requests.post(
-        f"{API_BASE_URL}/sensors", 
-        headers=headers,
-        json=sensor_data
+    return report(
+        "POST /sensors",
+        client.create_sensor,
+        vest_id=vest_id,
+        sensor_type_id=sensor_type_id,
+        position=position,
+        is_active=True,
+        calibration_data=json.dumps({"offset": 0.5, "scale": 1.2})
     )
-    print(f"POST /sensors status: {response.status_code}")
-    print(json.dumps(response.json(), indent=2))
-    return response.json()
 
 def test_get_vest_sensors(vest_id):
     """Test GET /vests/{vest_id}/sensors endpoint"""
-    response = requests.get(f"{API_BASE_URL}/vests/{vest_id}/sensors", headers=headers)
-    print(f"GET /vests/{vest_id}/sensors status: {response.status_code}")
-    print(json.dumps(response.json(), indent=2))
-    return response.json()
+    return report(f"GET /vests/{vest_id}/sensors", client.get_vest_sensors, vest_id)
 
 def test_add_measurements(sensor_id, vest_id):
     """Test POST /measurements endpoint"""
@@ -80,21 +93,16 @@ def test_add_measurements(sensor_id, vest_id):
         })
     
     request_data = {"measurements": measurements}
-    response = requests.post(
-        f"{API_BASE_URL}/measurements", 
-        headers=headers,
-        json=request_data
-    )
-    print(f"POST /measurements status: {response.status_code}")
-    print(json.dumps(response.json(), indent=2))
-    return response.json()
+    return report("POST /measurements", client.add_measurements, request_data)
 
 def test_get_recent_measurements(vest_id):
     """Test GET /vests/{vest_id}/measurements/recent endpoint"""
-    response = requests.get(f"{API_BASE_URL}/vests/{vest_id}/measurements/recent?seconds=10000000", headers=headers)
-    print(f"GET /vests/{vest_id}/measurements/recent status: {response.status_code}")
-    print(json.dumps(response.json(), indent=2))
-    return response.json()
+    return report(
+        f"GET /vests/{vest_id}/measurements/recent",
+        client.get_recent_measurements,
+        vest_id,
+        seconds=10000000
+    )
 
 def run_full_test():
     """Run a complete test of all endpoints"""
@@ -127,5 +135,278 @@ def run_full_test():
     
     print("=== API TEST COMPLETED ===")
 
+# Load benchmark
+
+# Endpoint labels use the route templates, so runs with different ids compare
+WRITE_ENDPOINTS = {
+    "measurements": ("POST /measurements", lambda client, rows: client.add_measurements({"measurements": rows})),
+    "bulk": ("POST /measurements/bulk", lambda client, rows: client.bulk_add_measurements(rows)),
+}
+
+
+class LatencyRecorder:
+    """Thread-safe collection of call latencies, grouped by endpoint label."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def call(self, label, func, *args, **kwargs):
+        """Time func(*args, **kwargs) under label; failures count as errors and return None."""
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.latencies[label].append(elapsed)
+                self.errors[label] += 1
+            return None
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies[label].append(elapsed)
+        return result
+
+    def summary(self, duration):
+        """Per-endpoint request count, errors, throughput and latency percentiles (ms)."""
+        endpoints = {}
+        for label in sorted(self.latencies):
+            millis = np.array(self.latencies[label]) * 1000
+            p50, p95, p99 = np.percentile(millis, [50, 95, 99])
+            endpoints[label] = {
+                "requests": len(millis),
+                "errors": self.errors[label],
+                "requests_per_second": round(len(millis) / duration, 2),
+                "p50_ms": round(float(p50), 2),
+                "p95_ms": round(float(p95), 2),
+                "p99_ms": round(float(p99), 2),
+                "max_ms": round(float(millis.max()), 2),
+            }
+        return endpoints
+
+
+def create_load_fixtures(client, vests, sensors):
+    """Create the vests and sensors the load run writes to; returns {vest_id: [sensor_id, ...]}."""
+    run_id = int(time.time())
+    fixtures = {}
+    for i in range(vests):
+        vest = client.create_vest(name=f"Load Test Vest {run_id}-{i + 1}", description="Created by apitest.py load")
+        fixtures[vest["vest_id"]] = [
+            # Cycle through the seeded sensor types (IMU, FlexSensor, StretchSensor)
+            client.create_sensor(vest["vest_id"], sensor_type_id=j % 3 + 1, position=f"load_{j + 1}")["sensor_id"]
+            for j in range(sensors)
+        ]
+    return fixtures
+
+
+def run_writer(base_url, recorder, sensor_ids, rate, batch_interval, deadline, write, totals):
+    """Post rate samples per second for every sensor, one batch every batch_interval seconds."""
+    label, send = WRITE_ENDPOINTS[write]
+    client = SensorVestClient(base_url, max_retries=1)
+    step = timedelta(seconds=1 / rate)
+    next_sample = datetime.now(timezone.utc)
+    next_batch = time.monotonic() + batch_interval
+    rows_written = late_batches = 0
+    try:
+        while next_batch <= deadline:
+            delay = next_batch - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # The writer cannot keep up with the requested rate
+                late_batches += 1
+            next_batch += batch_interval
+
+            # Every sample that came due since the previous batch
+            now = datetime.now(timezone.utc)
+            rows = []
+            while next_sample <= now:
+                stamp = next_sample.isoformat()
+                rows.extend(
+                    {"sensor_id": sensor_id, "timestamp": stamp, "value": round(random.gauss(0, 10), 3)}
+                    for sensor_id in sensor_ids
+                )
+                next_sample += step
+            if rows and recorder.call(label, send, client, rows) is not None:
+                rows_written += len(rows)
+    finally:
+        client.close()
+        with totals["lock"]:
+            totals["rows_written"] += rows_written
+            totals["late_batches"] += late_batches
+
+
+def run_reader(base_url, recorder, vest_ids, think_time, deadline):
+    """Repeat the requests one dashboard rerun of the vest detail page makes."""
+    client = SensorVestClient(base_url, max_retries=1)
+    cursors = {}
+    try:
+        while time.monotonic() < deadline:
+            vest_id = random.choice(vest_ids)
+            recorder.call("GET /vests", client.get_vests, include_sensor_count=True)
+            recorder.call("GET /vests/{vest_id}", client.get_vest, vest_id)
+            recorder.call("GET /vests/{vest_id}/sensors", client.get_vest_sensors, vest_id)
+            frame = recorder.call(
+                "GET /vests/{vest_id}/measurements/recent",
+                client.get_recent_measurements,
+                vest_id,
+                seconds=config.MEASUREMENT_HISTORY_SECONDS,
+                after_measurement_id=cursors.get(vest_id, 0),
+                limit=config.MEASUREMENT_PAGE_SIZE,
+                as_frame=True,
+            )
+            if frame is not None and len(frame):
+                cursors[vest_id] = int(frame["measurement_id"].iloc[-1])
+            recorder.call(
+                "GET /vests/{vest_id}/measurements/aggregate",
+                client.get_aggregated_measurements,
+                vest_id,
+                bucket="1m",
+                seconds=3600,
+                as_frame=True,
+            )
+            if think_time:
+                time.sleep(think_time)
+    finally:
+        client.close()
+
+
+def run_load_test(base_url, vests=2, sensors=10, rate=50.0, readers=2, duration=30.0,
+                  batch_interval=1.0, think_time=0.5, write="measurements"):
+    """Run writers and readers against base_url concurrently and return the results."""
+    setup_client = SensorVestClient(base_url)
+    try:
+        fixtures = create_load_fixtures(setup_client, vests, sensors)
+    finally:
+        setup_client.close()
+
+    recorder = LatencyRecorder()
+    totals = {"rows_written": 0, "late_batches": 0, "lock": threading.Lock()}
+    started_at = datetime.now(timezone.utc)
+    start = time.monotonic()
+    deadline = start + duration
+    threads = [
+        threading.Thread(
+            target=run_writer,
+            args=(base_url, recorder, sensor_ids, rate, batch_interval, deadline, write, totals),
+            name=f"writer-{vest_id}",
+        )
+        for vest_id, sensor_ids in fixtures.items()
+    ] + [
+        threading.Thread(
+            target=run_reader,
+            args=(base_url, recorder, list(fixtures), think_time, deadline),
+            name=f"reader-{i + 1}",
+        )
+        for i in range(readers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    return {
+        "started_at": started_at.isoformat(),
+        "base_url": base_url,
+        "config": {
+            "vests": vests,
+            "sensors_per_vest": sensors,
+            "rate_hz": rate,
+            "readers": readers,
+            "duration_s": duration,
+            "batch_interval_s": batch_interval,
+            "think_time_s": think_time,
+            "write_endpoint": write,
+        },
+        "elapsed_s": round(elapsed, 2),
+        "rows_written": totals["rows_written"],
+        "rows_per_second": round(totals["rows_written"] / elapsed, 1),
+        "target_rows_per_second": vests * sensors * rate,
+        "late_batches": totals["late_batches"],
+        "endpoints": recorder.summary(elapsed),
+    }
+
+
+def print_load_report(results, baseline=None):
+    """Print the endpoint table; with a baseline, add the p95 change against it."""
+    print(
+        f"Wrote {results['rows_written']:,} rows in {results['elapsed_s']}s: "
+        f"{results['rows_per_second']:,} rows/s (target {results['target_rows_per_second']:,}), "
+        f"{results['late_batches']} late batches"
+    )
+    header = f"{'endpoint':<45} {'reqs':>7} {'errs':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+    if baseline is not None:
+        header += f" {'p95 vs base':>12}"
+    print(header)
+    for label, stats in results["endpoints"].items():
+        line = (
+            f"{label:<45} {stats['requests']:>7} {stats['errors']:>5} {stats['requests_per_second']:>8.1f} "
+            f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}"
+        )
+        base = (baseline or {}).get("endpoints", {}).get(label)
+        if base and base["p95_ms"]:
+            line += f" {(stats['p95_ms'] / base['p95_ms'] - 1):>+12.0%}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+    load = commands.add_parser("load", help="run the load and latency benchmark")
+    load.add_argument("--base-url", default=API_BASE_URL)
+    load.add_argument("--local", action="store_true",
+                      help="serve the Lambda handler locally (backend/local_server.py) on DATABASE_URL")
+    load.add_argument("--vests", type=int, default=2)
+    load.add_argument("--sensors", type=int, default=10, help="sensors per vest")
+    load.add_argument("--rate", type=float, default=50.0, help="samples per second per sensor")
+    load.add_argument("--readers", type=int, default=2, help="concurrent dashboard readers")
+    load.add_argument("--duration", type=float, default=30.0, help="seconds")
+    load.add_argument("--batch-interval", type=float, default=1.0, help="seconds between writes per vest")
+    load.add_argument("--think-time", type=float, default=0.5, help="reader pause between page loads (seconds)")
+    load.add_argument("--write-endpoint", choices=sorted(WRITE_ENDPOINTS), default="measurements")
+    load.add_argument("--output", default=f"loadtest-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    load.add_argument("--compare", help="earlier results file to compare p95 latencies against")
+    args = parser.parse_args()
+
+    if args.command != "load":
+        run_full_test()
+        return
+
+    server = None
+    base_url = args.base_url
+    if args.local:
+        from backend.local_server import start_server
+
+        server = start_server()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        results = run_load_test(
+            base_url,
+            vests=args.vests,
+            sensors=args.sensors,
+            rate=args.rate,
+            readers=args.readers,
+            duration=args.duration,
+            batch_interval=args.batch_interval,
+            think_time=args.think_time,
+            write=args.write_endpoint,
+        )
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+    print_load_report(results, baseline)
+    with open(args.output, "w") as handle:
+        json.dump(results, handle, indent=2)
+    print(f"Results saved to {args.output}")
+
+
 if __name__ == "__main__":
-    run_full_test()
\ No newline at end of file
+    main()
@@ -1,16 +1,12 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import requests
-import json
-import time
-import plotly.express as px
-from datetime import datetime
-
-API_BASE_URL = "https://b4aifmwd05.execute-api.us-east-1.amazonaws.com/dev"
-headers = {
-    "Content-Type": "application/json",
-}
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import config
+from utils.api_cache import ApiCache
+from utils.perf import PerfRegistry
+
+API_BASE_URL = config.API_BASE_URL
 
 # Initialize session state variables for login functionality
 if 'logged_in' not in st.session_state:
@@ -18,6 +14,72 @@ if 'logged_in' not in st.session_state:
 if 'username' not in st.session_state:
     st.session_state.username = ""
 
+# Response cache shared across all sessions of this server process
+@st.cache_resource
+def get_api_cache():
+    return ApiCache(config.CACHE_MAX_ENTRIES, config.CACHE_TTLS)
+
+api_cache = get_api_cache()
+
+# Timing histograms for fetches, DataFrame builds and chart renders, shared by all sessions
+@st.cache_resource
+def get_perf_registry():
+    registry = PerfRegistry()
+    registry.describe("dashboard_fetch_seconds", "Time spent in each data fetch helper.")
+    registry.describe("dashboard_api_seconds", "API call durations by endpoint and phase.")
+    registry.describe("dashboard_frame_seconds", "Time spent building DataFrames for display.")
+    registry.describe("dashboard_render_seconds", "Time spent building and sending charts.")
+    return registry
+
+perf_registry = get_perf_registry()
+
+# Function to record the client-side and Server-Timing phases of each API call
+def record_api_timing(endpoint, timings):
+    for phase, seconds in timings.items():
+        perf_registry.observe("dashboard_api_seconds", seconds, endpoint=endpoint, phase=phase)
+
+# Pooled keep-alive HTTP client shared across all sessions
+# Created on first use after login, so the login page never imports requests
+@st.cache_resource
+def get_api_client():
+    from utils.api_requests import SensorVestClient
+    return SensorVestClient(API_BASE_URL, timing_hook=record_api_timing)
+
+# Parsed sensor calibrations, re-parsed only when a sensor's calibration_data changes
+@st.cache_resource
+def get_calibration_cache():
+    from utils.calibration import CalibrationCache
+    return CalibrationCache()
+
+# Thread pool for independent API requests; caps concurrency across all sessions
+@st.cache_resource
+def get_fetch_executor():
+    return ThreadPoolExecutor(max_workers=config.FETCH_MAX_WORKERS, thread_name_prefix="api-fetch")
+
+fetch_executor = get_fetch_executor()
+
+# On-disk measurement history shared by every session and worker process
+# Only the vest detail and Settings pages use it, so pyarrow.parquet loads there
+@st.cache_resource
+def get_history_cache():
+    if not config.HISTORY_CACHE_DIR:
+        return None
+    from utils.history_cache import HistoryCache
+    return HistoryCache(config.HISTORY_CACHE_DIR, config.HISTORY_CACHE_MAX_BYTES)
+
+# Fetch helpers, built once per server process rather than on every rerun
+# frontend.data imports pandas and the API client, so it loads only after login
+@st.cache_resource
+def get_dashboard_data():
+    from frontend.data import DashboardData
+    return DashboardData(
+        get_api_client(),
+        api_cache,
+        perf_registry,
+        history_cache=get_history_cache,
+        calibration_cache=get_calibration_cache,
+    )
+
 # App title
 st.title("🥊 Rock Steady Boxing Dashboard")
 
@@ -38,13 +100,94 @@ def login(username, password):
         return True
     return False
 
+# Function to stop this session's live measurement stream
+def stop_live_stream():
+    stream = st.session_state.pop("live_stream", None)
+    if stream is not None:
+        stream.stop()
+
 # Function to handle logout
 def logout():
     st.session_state.logged_in = False
     st.session_state.username = ""
-    # Clear selected vest on logout
+    # Clear selected vest and buffered measurements on logout
     if "selected_vest" in st.session_state:
         del st.session_state["selected_vest"]
+    if "measurement_buffers" in st.session_state:
+        del st.session_state["measurement_buffers"]
+    if "feature_engines" in st.session_state:
+        del st.session_state["feature_engines"]
+    from frontend.data import discard_export
+    discard_export()
+    stop_live_stream()
+
+# Function to show the admin's current page of vests with Previous/Next buttons
+# The page cursors (last vest ID of each earlier page) live in session state
+def vest_pager(data, key, active_only):
+    pages = st.session_state.get(key)
+    if pages is None or pages["active_only"] != active_only:
+        pages = st.session_state[key] = {"active_only": active_only, "cursors": [0]}
+    vests = data.get_vest_page(pages["cursors"][-1], active_only)
+    has_next = len(vests) > config.VEST_PAGE_SIZE
+    vests = vests[:config.VEST_PAGE_SIZE]
+
+    col1, col2, col3 = st.columns([0.2, 0.6, 0.2])
+    if col1.button("Previous", key=f"{key}_previous", disabled=len(pages["cursors"]) == 1):
+        pages["cursors"].pop()
+        st.rerun()
+    col2.caption(f"Page {len(pages['cursors'])}")
+    if col3.button("Next", key=f"{key}_next", disabled=not has_next):
+        pages["cursors"].append(vests[-1]["vest_id"])
+        st.rerun()
+    return vests
+
+# Function to get (or start) this session's live stream for a vest
+def get_live_stream(vest_id):
+    from utils.live_stream import MeasurementStream
+
+    stream = st.session_state.get("live_stream")
+    if stream is not None and stream.vest_id == vest_id and stream.running:
+        return stream
+    stop_live_stream()
+    # Resume right after the newest row already fetched, so nothing is missed
+    buffer = st.session_state.get("measurement_buffers", {}).get(vest_id)
+    stream = MeasurementStream(
+        config.LIVE_STREAM_URL,
+        vest_id,
+        capacity=config.LIVE_BUFFER_ROWS,
+        after_measurement_id=buffer["last_id"] if buffer else None,
+    ).start()
+    st.session_state["live_stream"] = stream
+    return stream
+
+# Live charts redraw on their own timer from the ring buffer, without a full rerun
+@st.fragment(run_every=config.LIVE_REFRESH_SECONDS)
+def render_live_charts(data, sensors):
+    import pandas as pd
+    from frontend.charts import faceted_figure
+    from frontend.dashboard import format_measurements_data, sensor_panels
+
+    stream = st.session_state.get("live_stream")
+    if stream is None:
+        return
+    if stream.error and not stream.connected:
+        st.warning(f"Live stream unavailable, retrying: {stream.error}")
+
+    live_df = format_measurements_data(stream.buffer.snapshot())
+    if live_df.empty:
+        st.info("Waiting for live readings...")
+        return
+
+    # Only the most recent window is drawn
+    window_start = live_df["timestamp"].max() - pd.Timedelta(seconds=config.LIVE_WINDOW_SECONDS)
+    live_df = live_df[live_df["timestamp"] >= window_start]
+    if st.session_state.get("calibrated"):
+        live_df = data.calibrate_measurements(live_df, sensors)
+    panels = [(title, plot_data) for _, title, plot_data, _ in sensor_panels(live_df, sensors, config.CHART_POINT_BUDGET)]
+
+    st.caption(f"{stream.buffer.total:,} readings received")
+    with perf_registry.timed("dashboard_render_seconds", chart="live"):
+        st.plotly_chart(faceted_figure(panels), use_container_width=True, key="live_chart")
 
 # Login form
 if not st.session_state.logged_in:
@@ -63,7 +206,7 @@ if not st.session_state.logged_in:
 else:
     # Sidebar for navigation
     st.sidebar.title("Navigation")
-    page = st.sidebar.radio("Go to", ["Home", "Vest Dashboard", "Settings"])
+    page = st.sidebar.radio("Go to", ["Home", "Vest Dashboard", "Settings"], key="page")
     
     # Logout button in sidebar
     if st.sidebar.button("Logout"):
@@ -73,165 +216,16 @@ else:
     # Display current user
     st.sidebar.write(f"Logged in as User: {st.session_state.username}")
 
-    # Function to get all vests
-    def get_all_vests():
-        try:
-            response = requests.get(f"{API_BASE_URL}/vests", headers=headers)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                st.error(f"Failed to fetch vests. Status code: {response.status_code}")
-                return []
-        except Exception as e:
-            st.error(f"Error fetching vests: {str(e)}")
-            return []
-
-    # Function to get a specific vest
-    def get_vest(vest_id):
-        try:
-            response = requests.get(f"{API_BASE_URL}/vests/{vest_id}", headers=headers)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                st.error(f"Failed to fetch vest. Status code: {response.status_code}")
-                return None
-        except Exception as e:
-            st.error(f"Error fetching vest: {str(e)}")
-            return None
-
-    # Function to get sensors for a vest
-    def get_vest_sensors(vest_id):
-        try:
-            response = requests.get(f"{API_BASE_URL}/vests/{vest_id}/sensors", headers=headers)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                st.error(f"Failed to fetch sensors. Status code: {response.status_code}")
-                return []
-        except Exception as e:
-            st.error(f"Error fetching sensors: {str(e)}")
-            return []
-
-    # Function to get recent measurements for a vest
-    def get_recent_measurements(vest_id):
-        try:
-            response = requests.get(f"{API_BASE_URL}/vests/{vest_id}/measurements/recent?seconds=10000000", headers=headers)
-            if response.status_code == 200:
-                return response.json()
-            elif response.status_code == 500:
-                # Handle potential error with the endpoint
-                st.warning("The measurements API is currently experiencing issues. Displaying sample data instead.")
-                # Return simulated data for development
-                return generate_sample_measurements(vest_id)
-            else:
-                st.error(f"Failed to fetch measurements. Status code: {response.status_code}")
-                return []
-        except Exception as e:
-            st.error(f"Error fetching measurements: {str(e)}")
-            return []
-
-    # Function to generate sample measurements for development when API fails
-    def generate_sample_measurements(vest_id):
-        sensors = get_vest_sensors(vest_id)
-        if not sensors:
-            return []
-            
-        sample_data = []
-        current_time = time.time()
-        
-        for sensor in sensors:
-            # Generate 10 sample measurements for each sensor
-            for i in range(10):
-                timestamp = datetime.fromtimestamp(current_time - i * 3600)  # One hour intervals
-                sample_data.append({
-                    "measurement_id": i,
-                    "sensor_id": sensor.get("sensor_id"),
-                    "vest_id": vest_id,
-                    "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                    "value": 20 + np.random.normal(0, 5),  # Random value around 20
-                    "position": sensor.get("position", "unknown"),
-                    "sensor_type": sensor.get("sensor_type", "unknown"),
-                    "additional_data": {"simulated": True}
-                })
-        
-        return sample_data
-
-    # Function to add new measurements for a sensor
-    def add_measurement(sensor_id, value):
-        try:
-            # Create measurement data
-            measurement = {
-                "sensor_id": sensor_id,
-                "value": value,
-                "additional_data": {"source": "dashboard"}
-            }
-            
-            # Try both API formats - with and without wrapper
-            try:
-                # First try with the measurements wrapper
-                request_data = {"measurements": [measurement]}
-                response = requests.post(
-                    f"{API_BASE_URL}/measurements", 
-                    headers=headers,
-                    json=request_data
-                )
-                
-                if response.status_code >= 400:
-                    # If that fails, try direct format
-                    response = requests.post(
-                        f"{API_BASE_URL}/measurements", 
-                        headers=headers,
-                        json=[measurement]  # Send as direct list
-                    )
-                    
-                    # If that fails too, try single object
-                    if response.status_code >= 400:
-                        response = requests.post(
-                            f"{API_BASE_URL}/measurements", 
-                            headers=headers,
-                            json=measurement  # Send as single object
-                        )
-            except Exception as e:
-                st.error(f"Error adding measurement: {str(e)}")
-                return False
-            
-            if response.status_code in [200, 201]:
-                return True
-            else:
-                st.error(f"Failed to add measurement. Status code: {response.status_code}")
-                if response.text:
-                    st.error(f"Response: {response.text}")
-                return False
-        except Exception as e:
-            st.error(f"Error adding measurement: {str(e)}")
-            return False
-
-    # Function to format measurements data for plotting
-    def format_measurements_data(measurements):
-        if not measurements:
-            return pd.DataFrame()
-        
-        formatted_data = []
-        for m in measurements:
-            # Parse timestamp
-            try:
-                timestamp = datetime.strptime(m.get("timestamp"), "%Y-%m-%d %H:%M:%S")
-            except:
-                # Try another format if the first one fails
-                try:
-                    timestamp = datetime.fromisoformat(m.get("timestamp").replace('Z', '+00:00'))
-                except:
-                    timestamp = datetime.now()  # Fallback
-                
-            formatted_data.append({
-                "sensor_id": m.get("sensor_id"),
-                "timestamp": timestamp,
-                "value": float(m.get("value", 0)),  # Ensure value is float
-                "position": m.get("position", "unknown"),
-                "sensor_type": m.get("sensor_type", "unknown")
-            })
-        
-        return pd.DataFrame(formatted_data)
+    # Imported here rather than at the top, so the login page starts without them
+    import pandas as pd
+    from frontend.data import fetch_concurrently, prepared_export
+    from utils.api_requests import ApiError
+
+    data = get_dashboard_data()
+
+    # Stop streaming once the user leaves the vest detail page
+    if "selected_vest" not in st.session_state:
+        stop_live_stream()
 
     # Home Page
     if page == "Home":
@@ -239,22 +233,22 @@ else:
         st.write("This dashboard displays real-time sensor data from your boxing vest.")
         st.write("Use the navigation on the left to view vest data or change settings.")
         
-        # Get all vests and filter for the logged-in user's vest ID
-        all_vests = get_all_vests()
         user_vest_id = st.session_state.username  # Using username as vest_id filter
         if user_vest_id == "*":
-            user_vests = all_vests
+            # The admin sees the whole fleet, one page at a time
+            st.metric("Active Vests", data.count_active_vests())
+            st.subheader("All Vests")
+            user_vests = vest_pager(data, "home_vest_pages", active_only=False)
         else:
-        # Filter vests for the current user
-            user_vests = [v for v in all_vests if str(v.get("vest_id")) == user_vest_id]
-        
-        active_vests = [v for v in user_vests if v.get("is_active", False)]
-        
-        st.metric("Your Active Vests", len(active_vests))
+            # Only the user's own vest is requested from the API
+            user_vests = data.get_user_vests(user_vest_id)
+            active_vests = [v for v in user_vests if v.get("is_active", False)]
+            st.metric("Your Active Vests", len(active_vests))
+            if user_vests:
+                st.subheader("Your Vests")
         
         # Show the user's vests
         if user_vests:
-            st.subheader("Your Vests")
             vest_df = pd.DataFrame([{
                 "Vest ID": v.get("vest_id"),
                 "Name": v.get("name"),
@@ -269,61 +263,47 @@ else:
     elif page == "Vest Dashboard":
         st.header("📈 Vest Dashboard")
         
-        # Get all vests and filter for the logged-in user
-        all_vests = get_all_vests()
-        user_vest_id = st.session_state.username  # Using username as vest_id filter
-        
-        # Special case for "*" user who can see all vests
-        if user_vest_id == "*":
-            user_vests = all_vests
-        else:
-            # Filter vests for the current user
-            user_vests = [v for v in all_vests if str(v.get("vest_id")) == user_vest_id]
-        
-        if not user_vests:
-            st.warning(f"No vests found for User {st.session_state.username}. Please check your API connection.")
-        else:
-            # If not in detailed view, show user's vests
-            if "selected_vest" not in st.session_state:
-                # Layout for vest cards
-                vest_cards = []
-                for i, vest in enumerate(user_vests):
-                    # Only show active vests by default
-                    if vest.get("is_active", False):
-                        vest_cards.append(vest)
-                
-                # Show toggle for inactive vests
-                show_inactive = st.checkbox("Show Inactive Vests")
-                if show_inactive:
-                    vest_cards = user_vests
-                
-                # Create a 3-column layout for vest cards
-                cols = st.columns(3)
-                for i, vest in enumerate(vest_cards):
-                    with cols[i % 3]:
-                        # Create a card-like container
-                        with st.container():
-                            st.subheader(vest.get("name", f"Vest {vest.get('vest_id')}"))
-                            st.caption(f"ID: {vest.get('vest_id')}")
-                            
-                            # Status indicator
-                            status = "🟢 Active" if vest.get("is_active", False) else "🔴 Inactive"
-                            st.caption(status)
-                            
-                            # Get sensors for this vest
-                            sensors = get_vest_sensors(vest.get("vest_id"))
-                            
-                            # Show sensor count
-                            sensor_count = len(sensors) if sensors else 0
-                            st.caption(f"Sensors: {sensor_count}")
-                            
-                            # Description
-                            st.write(vest.get("description", "No description"))
-                            
-                            # Button to view details
-                            if st.button(f"View Details", key=f"vest_{vest.get('vest_id')}"):
-                                st.session_state["selected_vest"] = vest.get("vest_id")
-                                st.rerun()
+        # If not in detailed view, show user's vests
+        if "selected_vest" not in st.session_state:
+            # Show toggle for inactive vests
+            show_inactive = st.checkbox("Show Inactive Vests")
+            
+            user_vest_id = st.session_state.username  # Using username as vest_id filter
+            if user_vest_id == "*":
+                # Special case for "*" user: the fleet is filtered and paged by the API
+                vest_cards = vest_pager(data, "dashboard_vest_pages", active_only=not show_inactive)
+            else:
+                user_vests = data.get_user_vests(user_vest_id)
+                # Only show active vests by default
+                vest_cards = user_vests if show_inactive else [v for v in user_vests if v.get("is_active", False)]
+            
+            if not vest_cards:
+                which = "vests" if show_inactive else "active vests"
+                st.warning(f"No {which} found for User {st.session_state.username}. Please check your API connection.")
+            
+            # Create a 3-column layout for vest cards
+            cols = st.columns(3)
+            for i, vest in enumerate(vest_cards):
+                with cols[i % 3]:
+                    # Create a card-like container
+                    with st.container():
+                        st.subheader(vest.get("name", f"Vest {vest.get('vest_id')}"))
+                        st.caption(f"ID: {vest.get('vest_id')}")
+                        
+                        # Status indicator
+                        status = "🟢 Active" if vest.get("is_active", False) else "🔴 Inactive"
+                        st.caption(status)
+                        
+                        # Show sensor count (included in the vests response)
+                        st.caption(f"Sensors: {vest.get('sensor_count', 0)}")
+                        
+                        # Description
+                        st.write(vest.get("description", "No description"))
+                        
+                        # Button to view details
+                        if st.button(f"View Details", key=f"vest_{vest.get('vest_id')}"):
+                            st.session_state["selected_vest"] = vest.get("vest_id")
+                            st.rerun()
 
     # Settings Page
     elif page == "Settings":
@@ -340,17 +320,91 @@ else:
         
         # Test connection
         if st.button("Test API Connection"):
+            from utils.api_requests import SensorVestClient
+            test_client = SensorVestClient(api_url, max_retries=1)
             try:
-                response = requests.get(f"{api_url}/vests", headers=headers)
-                if response.status_code == 200:
-                    st.success(f"Connection successful! Found {len(response.json())} vests.")
-                else:
-                    st.error(f"Connection failed with status code: {response.status_code}")
+                vests = test_client.get_vests()
+                st.success(f"Connection successful! Found {len(vests)} vests.")
+            except ApiError as e:
+                st.error(f"Connection failed with status code: {e.status_code}")
             except Exception as e:
                 st.error(f"Connection error: {str(e)}")
+            finally:
+                test_client.close()
+
+        # Response cache statistics
+        st.subheader("API Cache")
+        cache_stats = api_cache.stats()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Cache Hits", cache_stats["hits"])
+        col2.metric("Cache Misses", cache_stats["misses"])
+        col3.metric("Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+        st.caption(f"Entries: {cache_stats['entries']} / {cache_stats['max_entries']}")
+
+        if st.button("Clear Cache"):
+            api_cache.clear()
+            st.success("Cache cleared!")
+
+        # Disk history cache statistics
+        st.subheader("History Cache")
+        history_cache = get_history_cache()
+        if history_cache is None:
+            st.caption("Disabled (HISTORY_CACHE_DIR is empty).")
+        else:
+            history_stats = history_cache.stats()
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Vests", history_stats["vests"])
+            col2.metric("Days", history_stats["days"])
+            col3.metric("Size", f"{history_stats['bytes'] / 1024 ** 2:.1f} MB")
+            st.caption(f"{config.HISTORY_CACHE_DIR}, limit {history_stats['max_bytes'] / 1024 ** 3:.1f} GB")
+
+            if st.button("Clear History Cache"):
+                history_cache.clear()
+                st.session_state.pop("measurement_buffers", None)
+                st.success("History cache cleared!")
+
+        # Timing histograms, admin only
+        if st.session_state.username == "*":
+            st.subheader("Performance")
+            perf_rows = perf_registry.snapshot()
+            if not perf_rows:
+                st.caption("No timings recorded yet.")
+            else:
+                st.caption("Latencies in milliseconds, estimated from histogram buckets since the server started or was reset.")
+                perf_df = pd.DataFrame([{
+                    "Metric": row["name"],
+                    "Labels": ", ".join(f"{k}={v}" for k, v in row["labels"].items()),
+                    "Count": row["count"],
+                    "Mean": row["mean"] * 1000,
+                    "p50": row["p50"] * 1000,
+                    "p95": row["p95"] * 1000,
+                    "p99": row["p99"] * 1000,
+                    "Max": row["max"] * 1000,
+                } for row in perf_rows])
+                st.dataframe(perf_df.round(2), hide_index=True)
+
+            col1, col2 = st.columns(2)
+            col1.download_button(
+                "Download Prometheus Metrics",
+                perf_registry.to_prometheus(),
+                file_name="dashboard_metrics.prom",
+                mime="text/plain",
+            )
+            if col2.button("Reset Timings"):
+                perf_registry.reset()
+                st.rerun()
 
     # Vest Detail Page
     if "selected_vest" in st.session_state:
+        # Formatting and plotly figure modules are only needed on this page
+        from frontend.charts import aggregate_figure, faceted_figure, sensor_figure
+        from frontend.dashboard import (
+            choose_bucket,
+            format_aggregate_data,
+            format_measurements_data,
+            sensor_panels,
+        )
+
         vest_id = st.session_state["selected_vest"]
         
         # Verify the vest belongs to the logged-in user
@@ -359,8 +413,14 @@ else:
             del st.session_state["selected_vest"]
             st.rerun()
         
-        # Get vest details
-        vest = get_vest(vest_id)
+        # Fetch vest details, sensors and measurements in parallel
+        vest, sensors, measurements = fetch_concurrently(
+            fetch_executor,
+            data.fetch_timeout(),
+            (data.get_vest, vest_id),
+            (data.get_vest_sensors, vest_id),
+            (data.get_recent_measurements, vest_id),
+        )
         
         if not vest:
             st.error("Failed to load vest details")
@@ -380,18 +440,27 @@ else:
             # Vest metadata
             st.caption(f"ID: {vest_id} | Status: {'Active' if vest.get('is_active', False) else 'Inactive'}")
             
-            # Get sensors for this vest
-            sensors = get_vest_sensors(vest_id)
-            
             if not sensors:
                 st.warning("No sensors found for this vest")
             else:
-                # Get measurements
-                measurements = get_recent_measurements(vest_id)
-                measurements_df = format_measurements_data(measurements)
+                # Calibration is applied on read; stored readings stay raw
+                calibrated = st.toggle("Calibrated values", key="calibrated", help="Apply each sensor's calibration curve")
+                
+                # Live mode: readings are pushed by the stream server instead of polled
+                if st.toggle("Live mode", help="Stream new readings as they arrive"):
+                    get_live_stream(vest_id)
+                    render_live_charts(data, sensors)
+                else:
+                    stop_live_stream()
+                
+                with perf_registry.timed("dashboard_frame_seconds", step="format_measurements"):
+                    measurements_df = format_measurements_data(measurements)
+                if calibrated:
+                    with perf_registry.timed("dashboard_frame_seconds", step="calibrate"):
+                        measurements_df = data.calibrate_measurements(measurements_df, sensors)
                 
                 # Create tabs for different views
-                tab1, tab2, tab3 = st.tabs(["Sensors Overview", "Measurements Data", "Add Data"])
+                tab1, tab2, tab3, tab4 = st.tabs(["Sensors Overview", "Measurements Data", "Metrics", "Add Data"])
                 
                 with tab1:
                     # Create a table showing sensor details
@@ -407,33 +476,50 @@ else:
                     # Show graphs for each sensor
                     st.subheader("Sensor Measurements")
                     
-                    if measurements_df.empty:
+                    chart_mode = st.radio("Chart data", ["Aggregated", "Raw"], horizontal=True)
+                    
+                    if chart_mode == "Aggregated":
+                        # Bucket size follows the visible time range so each chart stays small
+                        range_label = st.selectbox("Time range", list(config.CHART_RANGES.keys()), index=1)
+                        range_seconds = config.CHART_RANGES[range_label]
+                        bucket = choose_bucket(range_seconds, config.CHART_BUCKETS, config.CHART_TARGET_POINTS)
+                        aggregate_rows = data.get_aggregated_measurements(vest_id, bucket, range_seconds, calibrated)
+                        with perf_registry.timed("dashboard_frame_seconds", step="format_aggregate"):
+                            aggregate_df = format_aggregate_data(aggregate_rows)
+                        
+                        if aggregate_df.empty:
+                            st.info("No measurements in this time range")
+                        else:
+                            st.caption(f"Showing min/max envelope and mean per {bucket} bucket")
+                            for sensor_id, sensor_buckets in aggregate_df.groupby("sensor_id", sort=False):
+                                first = sensor_buckets.iloc[0]
+                                st.subheader(f"{first['sensor_type']} at {first['position']}")
+                                with perf_registry.timed("dashboard_render_seconds", chart="aggregate"):
+                                    fig = aggregate_figure(sensor_buckets, f"Sensor ID: {sensor_id}")
+                                    st.plotly_chart(fig, use_container_width=True)
+                    elif measurements_df.empty:
                         st.info("No recent measurements available for this vest")
                     else:
-                        # Group by sensor_id
-                        sensor_ids = measurements_df["sensor_id"].unique()
+                        single_figure = st.checkbox("Show all sensors in one figure")
                         
-                        for sensor_id in sensor_ids:
-                            # Find the matching sensor info
-                            sensor_info = next((s for s in sensors if s.get("sensor_id") == sensor_id), {})
-                            sensor_type = sensor_info.get("sensor_type", "Unknown Type")
-                            position = sensor_info.get("position", "Unknown Position")
-                            
-                            # Filter data for this sensor
-                            sensor_data = measurements_df[measurements_df["sensor_id"] == sensor_id]
-                            
-                            if not sensor_data.empty:
+                        # Split by sensor, keeping each chart within the point budget
+                        panels = sensor_panels(measurements_df, sensors, config.CHART_POINT_BUDGET)
+                        
+                        if single_figure:
+                            with perf_registry.timed("dashboard_render_seconds", chart="faceted"):
+                                fig = faceted_figure([(title, plot_data) for _, title, plot_data, _ in panels])
+                                st.plotly_chart(fig, use_container_width=True)
+                        else:
+                            for sensor_id, title, plot_data, total_points in panels:
                                 # Create a card-like container for each sensor
-                                st.subheader(f"{sensor_type} at {position}")
+                                st.subheader(title)
+                                if len(plot_data) < total_points:
+                                    st.caption(f"Showing {len(plot_data):,} of {total_points:,} points")
                                 
-                                # Create an interactive time series plot
-                                fig = px.line(
-                                    sensor_data,
-                                    x="timestamp",
-                                    y="value",
-                                    title=f"Sensor ID: {sensor_id}"
-                                )
-                                st.plotly_chart(fig, use_container_width=True)
+                                # Create an interactive WebGL time series plot
+                                with perf_registry.timed("dashboard_render_seconds", chart="sensor"):
+                                    fig = sensor_figure(plot_data, f"Sensor ID: {sensor_id}")
+                                    st.plotly_chart(fig, use_container_width=True)
                 
                 with tab2:
                     # Show raw data
@@ -441,11 +527,107 @@ else:
                         st.info("No measurement data available")
                     else:
                         st.dataframe(measurements_df)
+                    
+                    # Longer histories go to a file page by page instead of through the table above
+                    st.subheader("Export")
+                    today = datetime.now(timezone.utc).date()
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        export_range = st.date_input(
+                            "Date range (UTC)", value=(today - timedelta(days=config.EXPORT_DEFAULT_DAYS), today),
+                            max_value=today, key="export_range",
+                        )
+                        export_format = st.radio("Format", ["csv", "parquet"], format_func=str.upper,
+                                                 horizontal=True, key="export_format")
+                    with col2:
+                        export_sensor_options = {
+                            f"{s.get('sensor_type')} at {s.get('position')} (ID: {s.get('sensor_id')})": s.get("sensor_id")
+                            for s in sensors
+                        }
+                        export_sensors = st.multiselect("Sensors", list(export_sensor_options),
+                                                        placeholder="All sensors", key="export_sensors")
+                        export_bucket = st.selectbox(
+                            "Resolution", ["Raw"] + list(config.CHART_BUCKETS), key="export_bucket",
+                            help="Raw readings, or mean/min/max/count per bucket",
+                        )
+                    
+                    if len(export_range) != 2:
+                        st.info("Pick the last day of the range")
+                    elif st.button("Prepare export"):
+                        data.export_vest_measurements(
+                            vest_id,
+                            export_format,
+                            export_range[0],
+                            export_range[1],
+                            [export_sensor_options[name] for name in export_sensors],
+                            None if export_bucket == "Raw" else export_bucket,
+                            calibrated,
+                        )
+                    
+                    export = prepared_export(vest_id)
+                    if export is not None:
+                        with open(export["path"], "rb") as export_data:
+                            st.download_button(
+                                f"Download {export['name']} ({export['rows']:,} rows)",
+                                export_data, file_name=export["name"], mime=export["mime"],
+                            )
                 
                 with tab3:
+                    st.subheader("Rolling Metrics")
+                    
+                    # Sample data has no measurement ids to resume from
+                    if not isinstance(measurements, pd.DataFrame) or "measurement_id" not in measurements:
+                        st.info("Metrics are computed from fetched measurements, which are not available")
+                    else:
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            window = st.selectbox(
+                                "Window", config.METRICS_WINDOWS, format_func=lambda seconds: f"{seconds} s",
+                                key="metrics_window",
+                            )
+                        with col2:
+                            threshold = st.number_input(
+                                "Peak threshold", value=None, step=1.0, key="metrics_threshold",
+                                help="Readings at or above this count as a peak, such as a punch; empty to skip",
+                            )
+                        with col3:
+                            hysteresis = st.number_input(
+                                "Hysteresis", min_value=0.0, value=0.0, step=0.5, key="metrics_hysteresis",
+                                help="How far below the threshold a reading must fall to end a peak",
+                            )
+                        
+                        engine = data.update_session_features(
+                            vest_id, measurements, sensors, (window, threshold, hysteresis, calibrated)
+                        )
+                        snapshot = engine.snapshot()
+                        if not snapshot:
+                            st.info("No measurement data available")
+                        else:
+                            metrics_df = pd.DataFrame([{
+                                "Sensor ID": s.get("sensor_id"),
+                                "Type": s.get("sensor_type"),
+                                "Position": s.get("position"),
+                                "Samples": metrics["samples"],
+                                "Mean": metrics["mean"],
+                                "Std": metrics["std"],
+                                "Min": metrics["min"],
+                                "Max": metrics["max"],
+                                "Range": metrics["range"],
+                                "Peaks": metrics["peaks"],
+                                "Highest Peak": metrics["highest_peak"],
+                            } for s in sensors if (metrics := snapshot.get(s.get("sensor_id"))) is not None])
+                            st.caption(f"Statistics over each sensor's last {window} s of readings; "
+                                       "peaks over everything fetched this session")
+                            st.dataframe(metrics_df, hide_index=True)
+                
+                with tab4:
                     # Form to add new measurements
                     st.subheader("Add New Measurement")
                     
+                    # Confirmation carried over from the rerun after a successful add
+                    if "added_measurement_message" in st.session_state:
+                        st.success(st.session_state.pop("added_measurement_message"))
+                    
                     # Sensor selection dropdown
                     sensor_options = {f"{s.get('sensor_type')} at {s.get('position')} (ID: {s.get('sensor_id')})": s.get('sensor_id') for s in sensors}
                     selected_sensor_name = st.selectbox("Select Sensor", list(sensor_options.keys()))
@@ -456,9 +638,8 @@ else:
                     
                     # Submit button
                     if st.button("Add Measurement"):
-                        success = add_measurement(selected_sensor_id, value)
+                        success = data.add_measurement(vest_id, selected_sensor_id, value)
                         if success:
-                            st.success(f"Measurement added successfully for sensor {selected_sensor_id}!")
-                            # Refresh data after 1 second
-                            time.sleep(1)
+                            st.session_state["added_measurement_message"] = f"Measurement added successfully for sensor {selected_sensor_id}!"
+                            # The cache for this vest was invalidated, so the rerun fetches only the new rows
                             st.rerun()
\ No newline at end of file
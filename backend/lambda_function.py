@@ -0,0 +1,1017 @@
+import base64
+import csv
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+import re
+import zlib
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import psycopg2
+import psycopg2.errors
+import psycopg2.extras
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils import db_connector, perf
+from utils.calibration import CalibrationCache, CalibrationError, apply_calibrations, calibration_sql, parse_calibration
+
+logger = logging.getLogger(__name__)
+
+# Page size for cursor-based measurement queries
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+# Time-bucket aggregation: accepted bucket units and aggregate functions
+BUCKET_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+AGGREGATES = {
+    "mean": "AVG({value})",
+    "min": "MIN({value})",
+    "max": "MAX({value})",
+    "count": "COUNT(*)",
+}
+DEFAULT_AGGREGATE_SECONDS = 3600
+# Rollup tables (data/database_setup.sql), largest first; a bucket that is a
+# multiple of a rollup's size is computed from it instead of raw rows
+ROLLUPS = [(3600, "measurements_1h"), (60, "measurements_1m")]
+ROLLUP_AGGREGATES = {
+    "mean": "SUM(m.sum) / SUM(m.count)",
+    "min": "MIN(m.min)",
+    "max": "MAX(m.max)",
+    "count": "SUM(m.count)::bigint",
+}
+
+# Partition maintenance, run on the scheduled (EventBridge) invocation
+PARTITION_DAYS_AHEAD = int(os.environ.get("PARTITION_DAYS_AHEAD", "7"))
+RAW_RETENTION_DAYS = int(os.environ.get("RAW_RETENTION_DAYS", "30"))
+MINUTE_ROLLUP_RETENTION_DAYS = int(os.environ.get("MINUTE_ROLLUP_RETENTION_DAYS", "365"))
+
+# Measurement endpoints answer with an Arrow IPC stream when the client
+# sends this Accept type; JSON stays the default
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_COMPRESSION = "zstd"
+ARROW_TIMESTAMP = pa.timestamp("us", tz="UTC")
+# Columns not listed here are type-inferred; DICTIONARY_COLUMNS repeat on every
+# row and are dictionary-encoded
+ARROW_COLUMN_TYPES = {
+    "measurement_id": pa.int64(),
+    "sensor_id": pa.int32(),
+    "vest_id": pa.int32(),
+    "timestamp": ARROW_TIMESTAMP,
+    "bucket": ARROW_TIMESTAMP,
+    "value": pa.float64(),
+    "mean": pa.float64(),
+    "min": pa.float64(),
+    "max": pa.float64(),
+    "count": pa.int64(),
+    "additional_data": pa.string(),
+}
+DICTIONARY_COLUMNS = {"position", "sensor_type"}
+
+# Exports: rows per page.  A Lambda response is capped at 6 MB, which a
+# page of raw rows stays well under as CSV.
+DEFAULT_EXPORT_PAGE_SIZE = 10000
+MAX_EXPORT_PAGE_SIZE = 20000
+EXPORT_TYPES = {"csv": "text/csv; charset=utf-8", "parquet": "application/vnd.apache.parquet"}
+EXPORT_COLUMNS = ["measurement_id", "vest_id", "sensor_id", "position", "sensor_type", "timestamp", "value",
+                  "additional_data"]
+EXPORT_BUCKET_COLUMNS = ["bucket", "vest_id", "sensor_id", "position", "sensor_type", "mean", "min", "max", "count"]
+
+# Bulk ingest: rows per request and rows per multi-row INSERT statement
+MAX_BULK_ROWS = 20000
+BULK_INSERT_PAGE_SIZE = 1000
+
+# Largest request body accepted after gzip decompression (bytes)
+MAX_DECOMPRESSED_BODY_BYTES = 32 * 1024 * 1024
+
+# Parsed sensor calibrations, reused across warm invocations of the container
+_calibrations = CalibrationCache()
+
+# Channel notified after every measurement insert, carrying the vest_id;
+# the live stream server (backend/local_server.py) listens on it
+NOTIFY_CHANNEL = "new_measurements"
+
+# First key of the pg_advisory_xact_lock(key, vest_id) taken by measurement
+# writes (see _lock_vests)
+VEST_WRITE_LOCK = 5301
+
+class HttpError(Exception):
+    """Raised by route handlers to return an error response."""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _response(status_code, body):
+    return {
+        "statusCode": status_code,
+        "headers": {
+            "Content-Type": "application/json",
+            "Access-Control-Allow-Origin": "*",
+        },
+        "body": json.dumps(body, default=_json_default),
+    }
+
+
+def _arrow_column(rows, name):
+    values = [row[name] for row in rows]
+    if name in DICTIONARY_COLUMNS:
+        return pa.array(values, type=pa.string()).dictionary_encode()
+    arrow_type = ARROW_COLUMN_TYPES.get(name)
+    if arrow_type == pa.float64():
+        # NUMERIC columns come back as Decimal, which Arrow will not cast to double
+        values = [None if v is None else float(v) for v in values]
+    return pa.array(values, type=arrow_type)
+
+
+def _arrow_response(status_code, rows, columns):
+    table = pa.table({name: _arrow_column(rows, name) for name in columns})
+    sink = pa.BufferOutputStream()
+    options = pa.ipc.IpcWriteOptions(compression=ARROW_COMPRESSION)
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return {
+        "statusCode": status_code,
+        "headers": {
+            "Content-Type": ARROW_STREAM_TYPE,
+            "Access-Control-Allow-Origin": "*",
+            "Vary": "Accept",
+        },
+        # API Gateway passes binary bodies through base64
+        "body": base64.b64encode(sink.getvalue().to_pybytes()).decode("ascii"),
+        "isBase64Encoded": True,
+    }
+
+
+def _export_table(rows, columns):
+    return pa.table({name: _arrow_column(rows, name) for name in columns})
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _export_response(status_code, page):
+    """One export page as CSV text or a Parquet file of a single row group."""
+    rows, columns = page["rows"], page["columns"]
+    if page["format"] == "parquet":
+        sink = pa.BufferOutputStream()
+        pq.write_table(_export_table(rows, columns), sink, compression=ARROW_COMPRESSION)
+        body = base64.b64encode(sink.getvalue().to_pybytes()).decode("ascii")
+    else:
+        text = io.StringIO()
+        writer = csv.writer(text, lineterminator="\n")
+        # Only the first page has a header, so pages concatenate into one file
+        if page["header"]:
+            writer.writerow(columns)
+        writer.writerows([_csv_value(row[name]) for name in columns] for row in rows)
+        body = text.getvalue()
+    headers = {
+        "Content-Type": EXPORT_TYPES[page["format"]],
+        "Access-Control-Allow-Origin": "*",
+        "Access-Control-Expose-Headers": "X-Next-Cursor, X-Row-Count",
+        "X-Row-Count": str(len(rows)),
+    }
+    if page["next_cursor"]:
+        headers["X-Next-Cursor"] = page["next_cursor"]
+    return {
+        "statusCode": status_code,
+        "headers": headers,
+        "body": body,
+        "isBase64Encoded": page["format"] == "parquet",
+    }
+
+
+def _header(event, name):
+    """Request header value by case-insensitive name ("" when absent)."""
+    name = name.lower()
+    for key, value in (event.get("headers") or {}).items():
+        if key.lower() == name:
+            return value or ""
+    return ""
+
+
+def _wants_arrow(event):
+    return ARROW_STREAM_TYPE in _header(event, "Accept")
+
+
+def _require(body, *fields):
+    if not isinstance(body, dict):
+        raise HttpError(400, "Request body must be a JSON object")
+    missing = [f for f in fields if body.get(f) in (None, "")]
+    if missing:
+        raise HttpError(400, f"Missing required fields: {', '.join(missing)}")
+
+
+def _as_text(value):
+    # calibration_data and additional_data are TEXT columns holding JSON
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def _parse_id_list(raw, name):
+    try:
+        ids = [int(v) for v in raw.split(",") if v.strip()]
+    except ValueError:
+        raise HttpError(400, f"{name} must be a comma-separated list of integers")
+    if not ids:
+        raise HttpError(400, f"{name} must not be empty")
+    return ids
+
+
+def _parse_number(query, name, cast):
+    try:
+        return cast(query[name])
+    except ValueError:
+        raise HttpError(400, f"{name} must be a number")
+
+
+def _parse_flag(query, name):
+    value = query.get(name, "false").lower()
+    if value not in ("true", "false", "1", "0"):
+        raise HttpError(400, f"{name} must be true or false")
+    return value in ("true", "1")
+
+
+def _vest_calibrations(cur, vest_id):
+    """{sensor_id: Calibration} for the vest's sensors; parsed only when changed."""
+    db_connector.execute(cur, "SELECT sensor_id, calibration_data FROM sensors WHERE vest_id = %s", (vest_id,))
+    return _calibrations.for_sensors(cur.fetchall())
+
+
+def _parse_time(query, name):
+    try:
+        value = datetime.fromisoformat(query[name])
+    except ValueError:
+        raise HttpError(400, f"{name} must be an ISO 8601 timestamp")
+    # Timestamps without an offset are taken as UTC
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _measurement_time(raw):
+    """A measurement's timestamp as an aware datetime, or None when it has none.
+
+    Raises ValueError when the timestamp is not an ISO 8601 string.
+    """
+    if raw is None:
+        return None
+    if not isinstance(raw, str):
+        raise ValueError(f"{raw!r} is not a timestamp")
+    value = datetime.fromisoformat(raw)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _is_finite(value):
+    # NaN and infinities, including the strings Postgres reads as them, would
+    # poison the rollups and cannot be written back out as JSON
+    try:
+        return math.isfinite(float(value))
+    except (TypeError, ValueError):
+        # Not a number at all; the insert's cast refuses it
+        return True
+
+
+def _encode_cursor(state):
+    raw = json.dumps(state, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor):
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        state["from"] = datetime.fromisoformat(state["from"])
+        state["end"] = datetime.fromisoformat(state["end"])
+        int(state["vest_id"]), int(state.get("after_id", 0))
+    except (ValueError, TypeError, KeyError):
+        raise HttpError(400, "cursor is not valid; pass X-Next-Cursor from the previous page unchanged")
+    return state
+
+
+def _parse_bucket(raw):
+    # "30s", "1m", "5m", "1h", "1d" -> seconds
+    match = re.match(r"^(\d+)([smhd])$", raw or "")
+    if not match or int(match.group(1)) == 0:
+        raise HttpError(400, "bucket must look like 30s, 1m, 5m, 1h or 1d")
+    return int(match.group(1)) * BUCKET_UNITS[match.group(2)]
+
+
+SENSOR_COLUMNS = """
+    s.sensor_id, s.vest_id, s.sensor_type_id, st.name AS sensor_type,
+    st.unit_of_measurement, s.position, s.is_active, s.calibration_data,
+    s.last_maintenance
+"""
+
+
+# GET handlers
+
+def get_vests(cur, query, body):
+    """Vests in vest_id order, optionally filtered and paged.
+
+    ``vest_ids`` and ``is_active`` filter in the database, so a user's
+    dashboard downloads only the vests it shows.  ``after_vest_id`` and
+    ``limit`` page through the fleet: the next page starts after the last
+    vest_id returned.  ``include=count`` returns ``{"count": n}`` for the
+    same filters instead of the vests themselves.
+    """
+    conditions = []
+    params = []
+    if "vest_ids" in query:
+        conditions.append("v.vest_id = ANY(%s)")
+        params.append(_parse_id_list(query["vest_ids"], "vest_ids"))
+    if "is_active" in query:
+        conditions.append("v.is_active = %s")
+        params.append(_parse_flag(query, "is_active"))
+    if "after_vest_id" in query:
+        conditions.append("v.vest_id > %s")
+        params.append(_parse_number(query, "after_vest_id", int))
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    if query.get("include") == "count":
+        db_connector.execute(cur, f"SELECT COUNT(*) AS count FROM vests v {where_clause}", params)
+        return 200, cur.fetchone()
+
+    limit_clause = ""
+    if "limit" in query:
+        limit_clause = "LIMIT %s"
+        params.append(max(1, min(_parse_number(query, "limit", int), MAX_PAGE_SIZE)))
+
+    if query.get("include") == "sensor_count":
+        # One grouped query instead of a sensors request per vest
+        db_connector.execute(cur, f"""
+            SELECT v.vest_id, v.name, v.description, v.created_at, v.is_active,
+                   COUNT(s.sensor_id) AS sensor_count
+            FROM vests v
+            LEFT JOIN sensors s ON s.vest_id = v.vest_id
+            {where_clause}
+            GROUP BY v.vest_id
+            ORDER BY v.vest_id
+            {limit_clause}
+        """, params)
+    else:
+        db_connector.execute(cur, f"""
+            SELECT v.vest_id, v.name, v.description, v.created_at, v.is_active
+            FROM vests v
+            {where_clause}
+            ORDER BY v.vest_id
+            {limit_clause}
+        """, params)
+    return 200, cur.fetchall()
+
+
+def get_vest(cur, query, body, vest_id):
+    db_connector.execute(cur, """
+        SELECT vest_id, name, description, created_at, is_active
+        FROM vests
+        WHERE vest_id = %s
+    """, (vest_id,))
+    vest = cur.fetchone()
+    if vest is None:
+        raise HttpError(404, f"Vest {vest_id} not found")
+    return 200, vest
+
+
+def get_vest_sensors(cur, query, body, vest_id):
+    db_connector.execute(cur, f"""
+        SELECT {SENSOR_COLUMNS}
+        FROM sensors s
+        JOIN sensor_types st ON st.sensor_type_id = s.sensor_type_id
+        WHERE s.vest_id = %s
+        ORDER BY s.sensor_id
+    """, (vest_id,))
+    return 200, cur.fetchall()
+
+
+def get_sensors(cur, query, body):
+    if not query.get("vest_ids"):
+        raise HttpError(400, "Missing required query parameter: vest_ids")
+    vest_ids = _parse_id_list(query["vest_ids"], "vest_ids")
+    db_connector.execute(cur, f"""
+        SELECT {SENSOR_COLUMNS}
+        FROM sensors s
+        JOIN sensor_types st ON st.sensor_type_id = s.sensor_type_id
+        WHERE s.vest_id = ANY(%s)
+        ORDER BY s.vest_id, s.sensor_id
+    """, (vest_ids,))
+    return 200, cur.fetchall()
+
+
+def get_recent_measurements(cur, query, body, vest_id):
+    """Measurements for a vest, either as a time window or after a cursor.
+
+    ``after_measurement_id`` returns rows with a larger id in id order and
+    ``since`` returns rows newer than a timestamp in time order; both are
+    paged with ``limit``.  Without either, the last ``seconds`` (default 10)
+    are returned newest first.  ``calibrated=true`` returns each value
+    through its sensor's calibration curve.
+    """
+    # Looked up first: the Arrow encoder reads the column names off the cursor
+    calibrations = _vest_calibrations(cur, vest_id) if _parse_flag(query, "calibrated") else None
+    conditions = ["m.vest_id = %s"]
+    params = [vest_id]
+
+    if "seconds" in query or not ("since" in query or "after_measurement_id" in query):
+        conditions.append("m.timestamp >= NOW() - make_interval(secs => %s)")
+        params.append(_parse_number(query, "seconds", float) if "seconds" in query else 10)
+
+    if "after_measurement_id" in query:
+        conditions.append("m.measurement_id > %s")
+        params.append(_parse_number(query, "after_measurement_id", int))
+        order_by = "m.measurement_id"
+    elif "since" in query:
+        conditions.append("m.timestamp > %s::timestamptz")
+        params.append(query["since"])
+        order_by = "m.timestamp, m.measurement_id"
+    else:
+        order_by = "m.timestamp DESC"
+
+    limit_clause = ""
+    if "limit" in query or order_by != "m.timestamp DESC":
+        limit = _parse_number(query, "limit", int) if "limit" in query else DEFAULT_PAGE_SIZE
+        limit_clause = "LIMIT %s"
+        params.append(max(1, min(limit, MAX_PAGE_SIZE)))
+
+    db_connector.execute(cur, f"""
+        SELECT m.measurement_id, m.sensor_id, m.vest_id, m.timestamp, m.value,
+               m.additional_data, s.position, st.name AS sensor_type
+        FROM measurements m
+        JOIN sensors s ON s.sensor_id = m.sensor_id
+        JOIN sensor_types st ON st.sensor_type_id = s.sensor_type_id
+        WHERE {" AND ".join(conditions)}
+        ORDER BY {order_by}
+        {limit_clause}
+    """, params)
+    rows = cur.fetchall()
+    if calibrations and rows:
+        values = apply_calibrations(
+            [row["sensor_id"] for row in rows], [row["value"] for row in rows], calibrations
+        )
+        for row, value in zip(rows, values.tolist()):
+            row["value"] = value
+    return 200, rows
+
+
+def get_aggregated_measurements(cur, query, body, vest_id):
+    """Per-sensor time-bucket aggregates for a vest over the last ``seconds``.
+
+    Charts only need one point per bucket, so the reduction happens in the
+    database instead of shipping every raw row to the browser.  Minute and
+    hour multiples are read from the rollup tables, which also cover time
+    whose raw partitions have been dropped.
+
+    With ``calibrated=true`` rows are calibrated in SQL before they are
+    reduced.  Linear curves commute with the aggregates, so rollups are
+    still used and calibrated afterwards; a polynomial or piecewise curve
+    on any of the vest's sensors forces the raw table.
+    """
+    bucket_seconds = _parse_bucket(query.get("bucket", "1m"))
+    names = [a.strip() for a in query.get("agg", "mean,min,max").split(",") if a.strip()]
+    unknown = [a for a in names if a not in AGGREGATES]
+    if unknown or not names:
+        raise HttpError(400, f"agg must be a comma-separated subset of {', '.join(AGGREGATES)}")
+    seconds = _parse_number(query, "seconds", float) if "seconds" in query else DEFAULT_AGGREGATE_SECONDS
+
+    calibrations = _vest_calibrations(cur, vest_id) if _parse_flag(query, "calibrated") else {}
+
+    source, time_column, expressions = _aggregate_source(bucket_seconds, calibrations)
+    aggregates = ", ".join(f"{expressions[a]} AS {a}" for a in names)
+    db_connector.execute(cur, f"""
+        SELECT m.sensor_id, s.position, st.name AS sensor_type,
+               to_timestamp(floor(extract(epoch FROM {time_column}) / %(bucket)s) * %(bucket)s) AS bucket,
+               {aggregates}
+        FROM {source} m
+        JOIN sensors s ON s.sensor_id = m.sensor_id
+        JOIN sensor_types st ON st.sensor_type_id = s.sensor_type_id
+        WHERE m.vest_id = %(vest_id)s
+          AND {time_column} >= NOW() - make_interval(secs => %(seconds)s)
+        GROUP BY m.sensor_id, s.position, st.name, 4
+        ORDER BY m.sensor_id, 4
+    """, {"bucket": bucket_seconds, "vest_id": vest_id, "seconds": seconds})
+    return 200, cur.fetchall()
+
+
+def _aggregate_source(bucket_seconds, calibrations):
+    """(table, time column, {aggregate: SQL}) to compute buckets of this size from."""
+    rollup = next((table for size, table in ROLLUPS if bucket_seconds % size == 0), None)
+    if any(c.linear is None for c in calibrations.values()):
+        rollup = None
+    if rollup:
+        return rollup, "m.bucket", _calibrated_rollup_aggregates(calibrations)
+    value = calibration_sql(calibrations, "m.value")
+    return "measurements", "m.timestamp", {a: expression.format(value=value) for a, expression in AGGREGATES.items()}
+
+
+def export_measurements(cur, query, body, vest_id=None):
+    """One page of a measurement export for a vest, or for a cohort (vest_ids).
+
+    Rows come in (vest_id, timestamp, measurement_id) order and are paged
+    by keyset: the X-Next-Cursor header of a page holds where the next one
+    starts, and a page without it is the last.  Each page is a bounded
+    range scan of idx_measurements_vest_timestamp, so exports of any
+    length cost the same per page.  The cursor also pins the end of the
+    range on the first page, so rows arriving during the export do not
+    keep extending it.
+
+    ``start`` and ``end`` bound the time range, ``sensor_ids`` the
+    sensors.  With ``bucket`` the export holds per-sensor mean, min, max
+    and count per bucket instead of raw rows, from the rollups where the
+    bucket allows it; each page then covers whole buckets.
+    ``calibrated=true`` works as on the other measurement endpoints.
+    """
+    fmt = query.get("format", "csv")
+    if fmt not in EXPORT_TYPES:
+        raise HttpError(400, f"format must be one of {', '.join(EXPORT_TYPES)}")
+    if vest_id is not None:
+        vest_ids = [vest_id]
+    elif "vest_ids" in query:
+        vest_ids = sorted(set(_parse_id_list(query["vest_ids"], "vest_ids")))
+    else:
+        raise HttpError(400, "vest_ids is required")
+    sensor_ids = _parse_id_list(query["sensor_ids"], "sensor_ids") if "sensor_ids" in query else None
+    bucket_seconds = _parse_bucket(query["bucket"]) if "bucket" in query else None
+    limit = _parse_number(query, "limit", int) if "limit" in query else DEFAULT_EXPORT_PAGE_SIZE
+    limit = max(1, min(limit, MAX_EXPORT_PAGE_SIZE))
+
+    start = _parse_time(query, "start") if "start" in query else datetime.min.replace(tzinfo=timezone.utc)
+    if "cursor" in query:
+        state = _decode_cursor(query["cursor"])
+        if state["vest_id"] not in vest_ids:
+            raise HttpError(400, "cursor does not belong to this export")
+    else:
+        end = _parse_time(query, "end") if "end" in query else datetime.now(timezone.utc)
+        state = {"vest_id": vest_ids[0], "from": start, "after_id": 0, "end": end}
+
+    # Sensor metadata is attached in Python, so the measurement scans need no joins
+    sensor_filter = "AND s.sensor_id = ANY(%s)" if sensor_ids else ""
+    db_connector.execute(cur, f"""
+        SELECT s.sensor_id, s.vest_id, s.position, st.name AS sensor_type, s.calibration_data
+        FROM sensors s
+        JOIN sensor_types st ON st.sensor_type_id = s.sensor_type_id
+        WHERE s.vest_id = ANY(%s) {sensor_filter}
+    """, (vest_ids, sensor_ids) if sensor_ids else (vest_ids,))
+    sensors = {row["sensor_id"]: row for row in cur.fetchall()}
+    calibrations = _calibrations.for_sensors(sensors.values()) if _parse_flag(query, "calibrated") else {}
+    sensors_per_vest = {}
+    for sensor in sensors.values():
+        sensors_per_vest[sensor["vest_id"]] = sensors_per_vest.get(sensor["vest_id"], 0) + 1
+
+    # A page fills up from as many vests as it takes
+    rows = []
+    remaining = vest_ids[vest_ids.index(state["vest_id"]):]
+    while remaining and len(rows) < limit:
+        state["vest_id"] = remaining[0]
+        sensor_count = sensors_per_vest.get(state["vest_id"], 0)
+        if not sensor_count:
+            done = True
+        elif bucket_seconds is None:
+            done = _export_raw_page(cur, state, sensor_ids, limit - len(rows), rows)
+        elif rows and limit - len(rows) < sensor_count:
+            # Not even one bucket of this vest fits in what is left of the page
+            break
+        else:
+            done = _export_bucket_page(cur, state, sensor_ids, bucket_seconds, calibrations,
+                                       sensor_count, limit - len(rows), rows)
+        if done:
+            remaining = remaining[1:]
+            state["from"], state["after_id"] = start, 0
+        elif bucket_seconds is not None:
+            break
+
+    for row in rows:
+        sensor = sensors[row["sensor_id"]]
+        row["position"], row["sensor_type"] = sensor["position"], sensor["sensor_type"]
+    if calibrations and bucket_seconds is None and rows:
+        values = apply_calibrations([row["sensor_id"] for row in rows], [row["value"] for row in rows], calibrations)
+        for row, value in zip(rows, values.tolist()):
+            row["value"] = value
+
+    next_cursor = None
+    if remaining:
+        state["vest_id"] = remaining[0]
+        next_cursor = _encode_cursor({
+            "vest_id": state["vest_id"], "from": state["from"].isoformat(),
+            "after_id": state["after_id"], "end": state["end"].isoformat(),
+        })
+    return 200, {
+        "format": fmt,
+        "columns": EXPORT_COLUMNS if bucket_seconds is None else EXPORT_BUCKET_COLUMNS,
+        "rows": rows,
+        "header": "cursor" not in query,
+        "next_cursor": next_cursor,
+    }
+
+
+def _export_raw_page(cur, state, sensor_ids, limit, rows):
+    """Append up to limit raw rows of state's vest past its keyset; True when the vest is exhausted."""
+    # The plain timestamp bound is what the index range scan starts from;
+    # the row comparison then skips rows of that instant already sent
+    sensor_filter = "AND m.sensor_id = ANY(%(sensor_ids)s)" if sensor_ids else ""
+    db_connector.execute(cur, f"""
+        SELECT m.measurement_id, m.vest_id, m.sensor_id, m.timestamp, m.value, m.additional_data
+        FROM measurements m
+        WHERE m.vest_id = %(vest_id)s
+          AND m.timestamp >= %(from)s AND m.timestamp < %(end)s
+          AND (m.timestamp, m.measurement_id) > (%(from)s, %(after_id)s)
+          {sensor_filter}
+        ORDER BY m.timestamp, m.measurement_id
+        LIMIT %(limit)s
+    """, {**state, "sensor_ids": sensor_ids, "limit": limit})
+    page = cur.fetchall()
+    rows.extend(page)
+    if len(page) < limit:
+        return True
+    state["from"], state["after_id"] = page[-1]["timestamp"], page[-1]["measurement_id"]
+    return False
+
+
+def _export_bucket_page(cur, state, sensor_ids, bucket_seconds, calibrations, sensor_count, limit, rows):
+    """Append the buckets of the next window of state's vest that fits in limit rows.
+
+    The window starts at the bucket holding the vest's next row, so gaps
+    in the data cost one index lookup rather than empty pages.  Returns
+    True when the vest is exhausted.
+    """
+    source, time_column, expressions = _aggregate_source(bucket_seconds, calibrations)
+    sensor_filter = "AND m.sensor_id = ANY(%(sensor_ids)s)" if sensor_ids else ""
+    params = {**state, "sensor_ids": sensor_ids, "bucket": bucket_seconds}
+    db_connector.execute(cur, f"""
+        SELECT MIN({time_column}) AS first
+        FROM {source} m
+        WHERE m.vest_id = %(vest_id)s AND {time_column} >= %(from)s AND {time_column} < %(end)s
+          {sensor_filter}
+    """, params)
+    first = cur.fetchone()["first"]
+    if first is None:
+        return True
+    epoch = first.timestamp()
+    window_start = datetime.fromtimestamp(epoch - epoch % bucket_seconds, timezone.utc)
+    # At most one row per sensor and bucket, so the window holds at most limit rows
+    window_end = window_start + timedelta(seconds=bucket_seconds * max(1, limit // sensor_count))
+
+    aggregates = ", ".join(f"{expressions[a]} AS {a}" for a in ("mean", "min", "max", "count"))
+    db_connector.execute(cur, f"""
+        SELECT to_timestamp(floor(extract(epoch FROM {time_column}) / %(bucket)s) * %(bucket)s) AS bucket,
+               m.vest_id, m.sensor_id, {aggregates}
+        FROM {source} m
+        WHERE m.vest_id = %(vest_id)s
+          AND {time_column} >= %(from)s AND {time_column} < LEAST(%(window_end)s::timestamptz, %(end)s::timestamptz)
+          {sensor_filter}
+        GROUP BY 1, m.vest_id, m.sensor_id
+        ORDER BY 1, m.sensor_id
+    """, {**params, "window_end": window_end})
+    rows.extend(cur.fetchall())
+    if window_end >= state["end"]:
+        return True
+    state["from"] = window_end
+    return False
+
+
+def _calibrated_rollup_aggregates(calibrations):
+    # A linear curve maps each bucket's mean to the calibrated mean, and its
+    # min and max to the calibrated extremes (swapped when the scale is negative)
+    if not calibrations:
+        return ROLLUP_AGGREGATES
+    lowest = calibration_sql(calibrations, ROLLUP_AGGREGATES["min"])
+    highest = calibration_sql(calibrations, ROLLUP_AGGREGATES["max"])
+    return {
+        "mean": calibration_sql(calibrations, ROLLUP_AGGREGATES["mean"]),
+        "min": f"LEAST({lowest}, {highest})",
+        "max": f"GREATEST({lowest}, {highest})",
+        "count": ROLLUP_AGGREGATES["count"],
+    }
+
+
+# POST handlers
+
+def create_vest(cur, query, body):
+    _require(body, "name")
+    db_connector.execute(cur, """
+        INSERT INTO vests (name, description, is_active)
+        VALUES (%s, %s, %s)
+        RETURNING vest_id, name, description, created_at, is_active
+    """, (body["name"], body.get("description"), body.get("is_active", True)))
+    return 201, cur.fetchone()
+
+
+def create_sensor(cur, query, body):
+    _require(body, "vest_id", "sensor_type_id", "position")
+    try:
+        parse_calibration(body.get("calibration_data"))
+    except CalibrationError as e:
+        raise HttpError(400, f"Invalid calibration_data: {e}")
+    db_connector.execute(cur, """
+        INSERT INTO sensors (vest_id, sensor_type_id, position, is_active, calibration_data)
+        VALUES (%s, %s, %s, %s, %s)
+        RETURNING sensor_id, vest_id, sensor_type_id, position, is_active,
+                  calibration_data, last_maintenance
+    """, (
+        body["vest_id"],
+        body["sensor_type_id"],
+        body["position"],
+        body.get("is_active", True),
+        _as_text(body.get("calibration_data")),
+    ))
+    return 201, cur.fetchone()
+
+
+def _lock_vests(cur, sensor_ids):
+    """Hold each sensor's vest write lock until this transaction ends.
+
+    measurement_id comes from a sequence, so without the lock two concurrent
+    inserts for a vest can commit out of id order, and a reader that polls
+    ``measurement_id > cursor`` would move past the row that commits last.
+    Writers to one vest queue on the lock, so its ids become visible in id
+    order; every cursor read is scoped to a single vest.  Locks are taken in
+    vest_id order so batches spanning vests cannot deadlock.  Returns
+    {sensor_id: vest_id} for the sensors that exist.
+    """
+    db_connector.execute(cur, "SELECT sensor_id, vest_id FROM sensors WHERE sensor_id = ANY(%s)",
+                         (sorted(set(sensor_ids)),))
+    vests = {row["sensor_id"]: row["vest_id"] for row in cur.fetchall()}
+    for vest_id in sorted(set(vests.values())):
+        db_connector.execute(cur, "SELECT pg_advisory_xact_lock(%s, %s)", (VEST_WRITE_LOCK, vest_id))
+    return vests
+
+
+def add_measurements(cur, query, body):
+    # Accept a single object, a list, or the {"measurements": [...]} wrapper
+    if isinstance(body, dict) and "measurements" in body:
+        measurements = body["measurements"]
+    elif isinstance(body, dict):
+        measurements = [body]
+    else:
+        measurements = body
+    if not isinstance(measurements, list) or not measurements:
+        raise HttpError(400, "Request body must contain at least one measurement")
+
+    timestamps = []
+    for measurement in measurements:
+        _require(measurement, "sensor_id", "value")
+        if not _is_finite(measurement["value"]):
+            raise HttpError(400, "value must be a finite number")
+        try:
+            timestamps.append(_measurement_time(measurement.get("timestamp")))
+        except ValueError:
+            raise HttpError(400, "timestamp must be an ISO 8601 timestamp")
+    _lock_vests(cur, [measurement["sensor_id"] for measurement in measurements])
+
+    added = []
+    for measurement, timestamp in zip(measurements, timestamps):
+        # vest_id is taken from the sensor so the two can never disagree
+        db_connector.execute(cur, """
+            INSERT INTO measurements (sensor_id, vest_id, timestamp, value, additional_data)
+            SELECT s.sensor_id, s.vest_id, COALESCE(%s::timestamptz, NOW()), %s, %s
+            FROM sensors s
+            WHERE s.sensor_id = %s
+            RETURNING measurement_id, sensor_id, vest_id, timestamp, value, additional_data
+        """, (
+            timestamp,
+            measurement["value"],
+            _as_text(measurement.get("additional_data")),
+            measurement["sensor_id"],
+        ))
+        row = cur.fetchone()
+        if row is None:
+            raise HttpError(400, f"Sensor {measurement['sensor_id']} not found")
+        added.append(row)
+
+    # Wake live stream subscribers once per vest; delivered on commit
+    for vest_id in sorted({row["vest_id"] for row in added}):
+        db_connector.execute(cur, "SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, str(vest_id)))
+    return 201, added
+
+
+def _bulk_row(measurement, index):
+    """The row to insert, or None when its timestamp or value cannot be stored.
+
+    A batch with the wrong shape fails whole; a reading whose timestamp does
+    not parse or whose value is NaN or infinite is only rejected.
+    """
+    if not isinstance(measurement, dict):
+        raise HttpError(400, f"measurements[{index}] must be a JSON object")
+    sensor_id, value = measurement.get("sensor_id"), measurement.get("value")
+    if isinstance(sensor_id, bool) or not isinstance(sensor_id, int):
+        raise HttpError(400, f"measurements[{index}].sensor_id must be an integer")
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise HttpError(400, f"measurements[{index}].value must be a number")
+    if not math.isfinite(value):
+        return None
+    try:
+        timestamp = _measurement_time(measurement.get("timestamp"))
+    except ValueError:
+        return None
+    return (sensor_id, timestamp, value, _as_text(measurement.get("additional_data")))
+
+
+def add_measurements_bulk(cur, query, body):
+    """Insert a batch of measurements in one transaction.
+
+    Only the {"measurements": [...]} form is accepted.  Rows for unknown
+    sensors, unreadable timestamps or NaN and infinite values are counted
+    as rejected, and rows whose (sensor_id, timestamp) already exists are
+    counted as duplicates; neither fails the batch.
+    """
+    if not isinstance(body, dict) or not isinstance(body.get("measurements"), list):
+        raise HttpError(400, 'Request body must be {"measurements": [...]}')
+    measurements = body["measurements"]
+    if len(measurements) > MAX_BULK_ROWS:
+        raise HttpError(413, f"At most {MAX_BULK_ROWS} measurements per request")
+    rows = [row for row in (_bulk_row(m, i) for i, m in enumerate(measurements)) if row is not None]
+
+    sensor_ids = sorted({row[0] for row in rows})
+    known = _lock_vests(cur, sensor_ids) if sensor_ids else {}
+    valid = [row for row in rows if row[0] in known]
+
+    inserted = []
+    if valid:
+        # vest_id is taken from the sensor, as in add_measurements.  clock_timestamp()
+        # rather than NOW() so rows sent without a timestamp do not collide
+        with perf.phase("db"):
+            inserted = psycopg2.extras.execute_values(cur, """
+                INSERT INTO measurements (sensor_id, vest_id, timestamp, value, additional_data)
+                SELECT s.sensor_id, s.vest_id, COALESCE(v.timestamp::timestamptz, clock_timestamp()),
+                       v.value::numeric, v.additional_data::text
+                FROM (VALUES %s) AS v (sensor_id, timestamp, value, additional_data)
+                JOIN sensors s ON s.sensor_id = v.sensor_id
+                ON CONFLICT (sensor_id, timestamp) DO NOTHING
+                RETURNING vest_id
+            """, valid, page_size=BULK_INSERT_PAGE_SIZE, fetch=True)
+
+    for vest_id in sorted({row["vest_id"] for row in inserted}):
+        db_connector.execute(cur, "SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, str(vest_id)))
+    return 200, {
+        "received": len(measurements),
+        "accepted": len(inserted),
+        "duplicates": len(valid) - len(inserted),
+        "rejected": len(measurements) - len(valid),
+        "rejected_sensor_ids": [s for s in sensor_ids if s not in known],
+    }
+
+
+ROUTES = [
+    (re.compile(r"^/vests$"), {"GET": get_vests, "POST": create_vest}),
+    (re.compile(r"^/vests/(?P<vest_id>\d+)$"), {"GET": get_vest}),
+    (re.compile(r"^/vests/(?P<vest_id>\d+)/sensors$"), {"GET": get_vest_sensors}),
+    (re.compile(r"^/vests/(?P<vest_id>\d+)/measurements/recent$"), {"GET": get_recent_measurements}),
+    (re.compile(r"^/vests/(?P<vest_id>\d+)/measurements/aggregate$"), {"GET": get_aggregated_measurements}),
+    (re.compile(r"^/vests/(?P<vest_id>\d+)/measurements/export$"), {"GET": export_measurements}),
+    (re.compile(r"^/sensors$"), {"GET": get_sensors, "POST": create_sensor}),
+    (re.compile(r"^/measurements$"), {"POST": add_measurements}),
+    (re.compile(r"^/measurements/bulk$"), {"POST": add_measurements_bulk}),
+    (re.compile(r"^/measurements/export$"), {"GET": export_measurements}),
+]
+
+
+# Handlers whose list responses can be sent as Arrow
+ARROW_HANDLERS = {get_recent_measurements, get_aggregated_measurements}
+
+# Handlers that answer with pages of CSV or Parquet (see _export_response)
+EXPORT_HANDLERS = {export_measurements}
+
+# Handlers whose responses carry an ETag; a matching If-None-Match gets a 304
+ETAG_HANDLERS = {get_vests, get_vest, get_vest_sensors, get_sensors}
+
+
+def _match_route(method, path):
+    for pattern, handlers in ROUTES:
+        match = pattern.match(path)
+        if match:
+            if method not in handlers:
+                raise HttpError(405, f"Method {method} not allowed on {path}")
+            path_params = {k: int(v) for k, v in match.groupdict().items()}
+            return handlers[method], path_params
+    raise HttpError(404, f"No route for {path}")
+
+
+def _conditional(event, response):
+    """Add an ETag to a 200 response, or turn it into a 304 the client can reuse."""
+    etag = '"' + hashlib.blake2b(response["body"].encode("utf-8"), digest_size=16).hexdigest() + '"'
+    response["headers"]["ETag"] = etag
+    candidates = [tag.strip() for tag in _header(event, "If-None-Match").split(",")]
+    # Weak comparison, as RFC 9110 asks for If-None-Match
+    if etag in candidates or f"W/{etag}" in candidates or "*" in candidates:
+        response["statusCode"] = 304
+        response["body"] = ""
+    return response
+
+
+def _gunzip(data):
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        raw = decompressor.decompress(data, MAX_DECOMPRESSED_BODY_BYTES + 1)
+    except zlib.error:
+        raise HttpError(400, "Request body is not valid gzip")
+    if len(raw) > MAX_DECOMPRESSED_BODY_BYTES or decompressor.unconsumed_tail:
+        raise HttpError(413, f"Request body is larger than {MAX_DECOMPRESSED_BODY_BYTES} bytes uncompressed")
+    return raw
+
+
+def _parse_body(event):
+    raw = event.get("body")
+    if not raw:
+        return None
+    # Binary bodies (e.g. gzip from the edge gateway) arrive base64-encoded
+    if event.get("isBase64Encoded"):
+        raw = base64.b64decode(raw)
+    if _header(event, "Content-Encoding").strip().lower() == "gzip":
+        raw = _gunzip(raw if isinstance(raw, bytes) else raw.encode("utf-8"))
+    try:
+        return json.loads(raw)
+    except ValueError:
+        raise HttpError(400, "Request body is not valid JSON")
+
+
+def run_maintenance():
+    """Create upcoming measurement partitions and apply retention."""
+    with db_connector.connection() as conn:
+        with conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(
+                "SELECT create_measurement_partitions(CURRENT_DATE, %s) AS created",
+                (PARTITION_DAYS_AHEAD,),
+            )
+            created = cur.fetchone()["created"]
+            cur.execute(
+                "SELECT drop_old_measurement_partitions(make_interval(days => %s), make_interval(days => %s)) AS dropped",
+                (RAW_RETENTION_DAYS, MINUTE_ROLLUP_RETENTION_DAYS),
+            )
+            dropped = cur.fetchone()["dropped"]
+    return {"partitions": created, "dropped": dropped}
+
+
+def lambda_handler(event, context):
+    """Entry point for API Gateway proxy integration events.
+
+    Scheduled EventBridge events run partition maintenance instead.  Every
+    response carries a Server-Timing header (total, pool wait, each query,
+    encoding), and the same durations are recorded in perf.registry.
+    """
+    if event.get("source") == "aws.events":
+        return run_maintenance()
+    method = event.get("httpMethod", "GET")
+    path = (event.get("path") or "/").rstrip("/") or "/"
+    with perf.request_timing() as timing:
+        response = _handle_request(event, method, path, timing)
+        total = timing.elapsed
+    response["headers"]["Server-Timing"] = timing.header(total)
+
+    route = timing.route or "unmatched"
+    perf.registry.observe("api_request_seconds", total, route=route, status=str(response["statusCode"]))
+    for phase, seconds in timing.phases.items():
+        perf.registry.observe("api_phase_seconds", seconds, route=route, phase=phase)
+    return response
+
+
+def _handle_request(event, method, path, timing):
+    try:
+        handler, path_params = _match_route(method, path)
+        timing.route = handler.__name__
+        query = event.get("queryStringParameters") or {}
+        body = _parse_body(event)
+
+        # Pooled connection, reused across warm invocations of the container
+        with db_connector.connection() as conn:
+            with conn, conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                status_code, payload = handler(cur, query, body, **path_params)
+                if handler in EXPORT_HANDLERS:
+                    with perf.phase("encode"):
+                        return _export_response(status_code, payload)
+                if handler in ARROW_HANDLERS and _wants_arrow(event):
+                    columns = [column.name for column in cur.description]
+                    with perf.phase("encode"):
+                        return _arrow_response(status_code, payload, columns)
+        with perf.phase("encode"):
+            response = _response(status_code, payload)
+            if handler in ETAG_HANDLERS and status_code == 200:
+                response = _conditional(event, response)
+            return response
+    except HttpError as e:
+        return _response(e.status_code, {"error": e.message})
+    except db_connector.PoolTimeout:
+        return _response(503, {"error": "Database is busy, retry shortly"})
+    except psycopg2.errors.UniqueViolation as e:
+        return _response(409, {"error": "Resource already exists", "detail": str(e).strip()})
+    except psycopg2.errors.ForeignKeyViolation as e:
+        return _response(400, {"error": "Referenced resource does not exist", "detail": str(e).strip()})
+    except (psycopg2.DataError, psycopg2.errors.NotNullViolation) as e:
+        return _response(400, {"error": "Invalid request data", "detail": str(e).strip()})
+    except Exception:
+        logger.exception("Unhandled error for %s %s", method, path)
+        return _response(500, {"error": "Internal server error"})
@@ -0,0 +1,224 @@
+"""Local stand-in for API Gateway + Lambda, plus a live measurement stream.
+
+Serves lambda_handler over plain HTTP so the dashboard, apitest.py and the
+tests can run without AWS, and adds
+
+    GET /vests/{vest_id}/measurements/stream
+
+which pushes new measurements to the client as Server-Sent Events, and
+
+    GET /metrics
+
+with the handler's timing histograms (utils/perf.py) and connection pool
+gauges in the Prometheus text format.  The stream LISTENs on the channel the Lambda notifies after each insert and
+also polls every few seconds, so rows written by any other path still
+arrive.  Reconnecting clients send Last-Event-ID (the last measurement_id
+they received) and resume from there.
+
+Usage:
+    DATABASE_URL=postgresql://... python -m backend.local_server --port 8000
+"""
+import argparse
+import base64
+import json
+import re
+import select
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import psycopg2.extras
+
+from backend import lambda_function
+from utils import db_connector, perf
+
+STREAM_PATH = re.compile(r"^/vests/(?P<vest_id>\d+)/measurements/stream$")
+METRICS_PATH = "/metrics"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+POLL_INTERVAL = 2.0
+KEEPALIVE_INTERVAL = 15.0
+STREAM_PAGE_SIZE = 1000
+
+
+def to_lambda_event(method, path, query, headers, body):
+    """Build an API Gateway proxy event from a plain HTTP request."""
+    event = {
+        "httpMethod": method,
+        "path": path,
+        "queryStringParameters": query or None,
+        "headers": dict(headers),
+        "body": None,
+        "isBase64Encoded": False,
+    }
+    if body:
+        try:
+            event["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            event["body"] = base64.b64encode(body).decode("ascii")
+            event["isBase64Encoded"] = True
+    return event
+
+
+def _wait_for_vest(conn, vest_id, timeout):
+    """Wait up to timeout seconds for a notification about vest_id."""
+    deadline = time.monotonic() + timeout
+    payload = str(vest_id)
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        if select.select([conn], [], [], remaining) == ([], [], []):
+            return False
+        conn.poll()
+        notified = any(n.payload == payload for n in conn.notifies)
+        conn.notifies.clear()
+        if notified:
+            return True
+
+
+class LocalApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, keep-alive
+    # clients wait for a delayed ACK (~40 ms) on every response
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _dispatch(self):
+        url = urlsplit(self.path)
+        query = dict(parse_qsl(url.query))
+        match = STREAM_PATH.match(url.path.rstrip("/"))
+        if self.command == "GET" and match:
+            self._stream_measurements(int(match.group("vest_id")), query)
+            return
+        if self.command == "GET" and url.path.rstrip("/") == METRICS_PATH:
+            self._send_metrics()
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else None
+        event = to_lambda_event(self.command, url.path, query, self.headers, body)
+        # Request threads share the connection pool in utils/db_connector.py
+        result = lambda_function.lambda_handler(event, None)
+
+        payload = result.get("body") or ""
+        if result.get("isBase64Encoded"):
+            payload = base64.b64decode(payload)
+        else:
+            payload = payload.encode("utf-8")
+        self.send_response(result["statusCode"])
+        for name, value in result.get("headers", {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_metrics(self):
+        for state, value in db_connector.get_pool().stats().items():
+            perf.registry.set_gauge("db_pool_connections", value, state=state)
+        payload = perf.registry.to_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _write_event(self, text):
+        # One HTTP chunk per event so clients see it as soon as it is sent
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream_measurements(self, vest_id, query):
+        # A dedicated connection: it LISTENs for as long as the client stays
+        conn = db_connector.connect()
+        conn.autocommit = True
+        try:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+                cursor = self.headers.get("Last-Event-ID") or query.get("after_measurement_id")
+                if cursor is None:
+                    # Start from the newest row: the client already has history
+                    cur.execute(
+                        "SELECT COALESCE(MAX(measurement_id), 0) AS last_id FROM measurements WHERE vest_id = %s",
+                        (vest_id,),
+                    )
+                    cursor = cur.fetchone()["last_id"]
+                cursor = int(cursor)
+                cur.execute(f"LISTEN {lambda_function.NOTIFY_CHANNEL}")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                self._write_event(f"retry: 1000\nid: {cursor}\n: connected\n\n")
+                last_write = time.monotonic()
+
+                while True:
+                    _, rows = lambda_function.get_recent_measurements(
+                        cur,
+                        {"after_measurement_id": cursor, "limit": STREAM_PAGE_SIZE},
+                        None,
+                        vest_id,
+                    )
+                    if rows:
+                        cursor = rows[-1]["measurement_id"]
+                        data = json.dumps(rows, default=lambda_function._json_default)
+                        self._write_event(f"id: {cursor}\nevent: measurements\ndata: {data}\n\n")
+                        last_write = time.monotonic()
+                        if len(rows) == STREAM_PAGE_SIZE:
+                            continue
+                    elif time.monotonic() - last_write > KEEPALIVE_INTERVAL:
+                        self._write_event(": keepalive\n\n")
+                        last_write = time.monotonic()
+                    _wait_for_vest(conn, vest_id, POLL_INTERVAL)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away
+            pass
+        finally:
+            conn.close()
+
+
+def start_server(host="127.0.0.1", port=0, verbose=False):
+    """Start the server on a background thread and return it.
+
+    Port 0 picks a free port; read it back from server.server_port.
+    """
+    server = ThreadingHTTPServer((host, port), LocalApiHandler)
+    server.daemon_threads = True
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, name="local-api", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), LocalApiHandler)
+    server.daemon_threads = True
+    server.verbose = True
+    print(f"Serving the Sensor Vest API on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Measure Streamlit cold-start and rerun time of app.py per page.
+
+Each page runs in a fresh interpreter through Streamlit's AppTest, so the
+first run includes every import the page triggers.  Reported per page:
+the first run, the median of the following reruns, and which heavy
+modules ended up imported.  With --local the app talks to
+backend/local_server.py on DATABASE_URL, and the vest detail page is
+measured too; without it the API calls fail fast against a closed port.
+
+Usage:
+    python -m benchmarks.bench_app_startup --reruns 10
+    DATABASE_URL=postgresql://postgres@localhost/sensor_vest \\
+        python -m benchmarks.bench_app_startup --local --vest 1
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app.py")
+
+# Modules whose presence shows what a page paid for
+HEAVY_MODULES = ["requests", "pandas", "pyarrow", "pyarrow.parquet", "plotly.subplots", "frontend.charts"]
+
+PAGES = ["login", "home", "settings", "detail"]
+
+
+def run_page(page, reruns, local, vest_id):
+    """Run in the child interpreter: time one page and print the result as JSON."""
+    start = time.perf_counter()
+    server = None
+    if local:
+        from backend.local_server import start_server
+
+        server = start_server()
+        os.environ["API_BASE_URL"] = f"http://127.0.0.1:{server.server_port}"
+    else:
+        # Nothing listens on the discard port, so API calls fail at once
+        os.environ["API_BASE_URL"] = "http://127.0.0.1:9"
+        os.environ["API_MAX_RETRIES"] = "1"
+    os.environ["HISTORY_CACHE_DIR"] = ""
+    # The backend's own imports are not part of the app's cold start
+    baseline = set(sys.modules)
+
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(APP, default_timeout=60)
+    if page != "login":
+        app.session_state["logged_in"] = True
+        app.session_state["username"] = "*"
+    if page == "settings":
+        app.session_state["page"] = "Settings"
+    if page == "detail":
+        app.session_state["selected_vest"] = vest_id
+
+    first_start = time.perf_counter()
+    app.run()
+    first = time.perf_counter() - first_start
+    times = []
+    for _ in range(reruns):
+        rerun_start = time.perf_counter()
+        app.run()
+        times.append(time.perf_counter() - rerun_start)
+    if server is not None:
+        server.shutdown()
+
+    print(json.dumps({
+        "page": page,
+        "process_ms": (time.perf_counter() - start) * 1000,
+        "first_run_ms": first * 1000,
+        "rerun_ms": statistics.median(times) * 1000 if times else None,
+        "imported": [m for m in HEAVY_MODULES if m in sys.modules and m not in baseline],
+        "exceptions": [e.value for e in app.exception],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs="+", choices=PAGES)
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--local", action="store_true", help="serve the API from backend/local_server.py")
+    parser.add_argument("--vest", type=int, default=1, help="vest shown on the detail page (with --local)")
+    parser.add_argument("--child", choices=PAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_page(args.child, args.reruns, args.local, args.vest)
+        return
+
+    pages = args.pages or (PAGES if args.local else PAGES[:-1])
+    print(f"{'page':<10} {'first run (ms)':>15} {'rerun (ms)':>11}  imported")
+    for page in pages:
+        command = [sys.executable, "-m", "benchmarks.bench_app_startup", "--child", page,
+                   "--reruns", str(args.reruns), "--vest", str(args.vest)]
+        if args.local:
+            command.append("--local")
+        output = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if result["exceptions"]:
+            print(f"{page:<10} failed: {result['exceptions']}")
+            continue
+        print(f"{page:<10} {result['first_run_ms']:>15.0f} {result['rerun_ms']:>11.1f}  {', '.join(result['imported'])}")
+
+
+if __name__ == "__main__":
+    main()
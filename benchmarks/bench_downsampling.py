@@ -0,0 +1,43 @@
+"""Benchmark the chart downsampling methods on long random-walk series.
+
+Usage:
+    python -m benchmarks.bench_downsampling --points 1000000 5000000 10000000 --budget 2000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.downsampling import downsample
+
+METHODS = ["minmax", "minmax_lttb", "lttb"]
+
+
+def make_series(points, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.datetime64("2025-03-01T00:00:00") + np.arange(points) * np.timedelta64(10, "ms")
+    y = np.cumsum(rng.normal(size=points))
+    return x, y
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, nargs="+", default=[1_000_000, 5_000_000, 10_000_000])
+    parser.add_argument("--budget", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'points':>12} {'method':>12} {'best (ms)':>10} {'kept':>7}")
+    for points in args.points:
+        x, y = make_series(points)
+        for method in METHODS:
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                idx = downsample(x, y, args.budget, method=method)
+                best = min(best, time.perf_counter() - start)
+            print(f"{points:>12,} {method:>12} {best * 1000:>10.1f} {len(idx):>7}")
+
+
+if __name__ == "__main__":
+    main()
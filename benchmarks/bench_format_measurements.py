@@ -0,0 +1,94 @@
+"""Benchmark format_measurements_data against the original per-row parser.
+
+Usage:
+    python -m benchmarks.bench_format_measurements --rows 1000000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from frontend.dashboard import format_measurements_data
+
+POSITIONS = ["chest", "upper_back", "left_shoulder", "right_shoulder", "left_elbow", "right_elbow"]
+SENSOR_TYPES = ["IMU", "FlexSensor", "StretchSensor"]
+
+
+def make_measurements(rows, sensors=20, seed=0):
+    """Synthetic /measurements/recent response with ISO timestamps like the API returns"""
+    rng = np.random.default_rng(seed)
+    start = datetime(2025, 3, 1)
+    values = rng.normal(20, 5, rows)
+    return [
+        {
+            "measurement_id": i,
+            "sensor_id": i % sensors,
+            "vest_id": 1,
+            "timestamp": (start + timedelta(milliseconds=10 * i)).isoformat() + "+00:00",
+            "value": values[i],
+            "position": POSITIONS[i % sensors % len(POSITIONS)],
+            "sensor_type": SENSOR_TYPES[i % sensors % len(SENSOR_TYPES)],
+            "additional_data": None,
+        }
+        for i in range(rows)
+    ]
+
+
+def legacy_format_measurements_data(measurements):
+    """The original row-by-row implementation from app.py, kept for comparison"""
+    if not measurements:
+        return pd.DataFrame()
+
+    formatted_data = []
+    for m in measurements:
+        try:
+            timestamp = datetime.strptime(m.get("timestamp"), "%Y-%m-%d %H:%M:%S")
+        except:
+            try:
+                timestamp = datetime.fromisoformat(m.get("timestamp").replace('Z', '+00:00'))
+            except:
+                timestamp = datetime.now()
+
+        formatted_data.append({
+            "sensor_id": m.get("sensor_id"),
+            "timestamp": timestamp,
+            "value": float(m.get("value", 0)),
+            "position": m.get("position", "unknown"),
+            "sensor_type": m.get("sensor_type", "unknown")
+        })
+
+    return pd.DataFrame(formatted_data)
+
+
+def time_call(func, measurements, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(measurements)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows:,} synthetic measurements...")
+    measurements = make_measurements(args.rows)
+
+    legacy = time_call(legacy_format_measurements_data, measurements, args.repeat)
+    vectorized = time_call(format_measurements_data, measurements, args.repeat)
+    memory_mb = format_measurements_data(measurements).memory_usage(deep=True).sum() / 1e6
+
+    print(f"legacy per-row parse:  {legacy:8.3f} s")
+    print(f"vectorized parse:      {vectorized:8.3f} s")
+    print(f"speedup:               {legacy / vectorized:8.1f}x")
+    print(f"DataFrame memory:      {memory_mb:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark the streaming feature engine at class scale.
+
+Feeds --vests vests x --sensors sensors sampled at --rate Hz for
+--seconds of simulated time, one second of readings per batch as the edge
+gateway would, and reports throughput and how many times faster than
+real time the engine keeps up.  For comparison it also times recomputing
+the same metrics over the whole history with pandas after each batch,
+which is what a dashboard rerun would otherwise do.
+
+Usage:
+    python -m benchmarks.bench_stream_features --vests 50 --sensors 20 --rate 100 --seconds 10
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.stream_features import FeatureEngine
+
+
+def make_batches(vests, sensors, rate, seconds, seed=0):
+    """One (keys, times, values) batch per simulated second, samples interleaved by tick."""
+    rng = np.random.default_rng(seed)
+    streams = vests * sensors
+    keys = [(vest_id, sensor_id) for vest_id in range(1, vests + 1) for sensor_id in range(1, sensors + 1)]
+    batches = []
+    for second in range(seconds):
+        times = second + np.arange(rate) / rate
+        # Noise around 20 with a punch-like spike of about 60 roughly twice a second
+        values = rng.normal(20, 3, (rate, streams))
+        spikes = rng.random((rate, streams)) < 2 / rate
+        values[spikes] += 60
+        batches.append((
+            keys * rate,
+            np.repeat(times, streams).tolist(),
+            values.ravel().tolist(),
+        ))
+    return batches
+
+
+def recompute(history, window):
+    """Full recompute over every row so far: the per-rerun alternative."""
+    frame = pd.concat(history, ignore_index=True)
+    latest = frame["t"].max()
+    recent = frame[frame["t"] > latest - window]
+    return recent.groupby("key")["value"].agg(["mean", "std", "min", "max"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vests", type=int, default=50)
+    parser.add_argument("--sensors", type=int, default=20)
+    parser.add_argument("--rate", type=int, default=100, help="samples per second per sensor")
+    parser.add_argument("--seconds", type=int, default=10, help="simulated seconds")
+    parser.add_argument("--window", type=float, default=5.0)
+    parser.add_argument("--threshold", type=float, default=50.0)
+    args = parser.parse_args()
+
+    batches = make_batches(args.vests, args.sensors, args.rate, args.seconds)
+    samples = sum(len(values) for _, _, values in batches)
+    print(f"{args.vests} vests x {args.sensors} sensors at {args.rate} Hz for {args.seconds} s: {samples:,} samples")
+
+    engine = FeatureEngine(window=args.window, threshold=args.threshold, hysteresis=10.0, min_interval=0.1)
+    batch_times = []
+    peaks = 0
+    for keys, times, values in batches:
+        start = time.perf_counter()
+        peaks += len(engine.update_many(keys, times, values))
+        batch_times.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    engine.snapshot()
+    snapshot_time = time.perf_counter() - start
+    total = sum(batch_times)
+    print(f"streaming:  {samples / total:,.0f} samples/s, {total / samples * 1e6:.2f} us/sample, "
+          f"{args.seconds / total:.1f}x real time")
+    print(f"            per 1 s batch: median {np.median(batch_times) * 1000:.0f} ms, "
+          f"max {max(batch_times) * 1000:.0f} ms; snapshot of {len(engine)} sensors {snapshot_time * 1000:.1f} ms; "
+          f"{peaks:,} peaks")
+
+    history = []
+    recompute_times = []
+    for keys, times, values in batches:
+        history.append(pd.DataFrame({"key": [k[0] * 1000 + k[1] for k in keys], "t": times, "value": values}))
+        start = time.perf_counter()
+        recompute(history, args.window)
+        recompute_times.append(time.perf_counter() - start)
+    print(f"recompute:  per batch median {np.median(recompute_times) * 1000:.0f} ms, "
+          f"last {recompute_times[-1] * 1000:.0f} ms (grows with history)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compare the JSON and Arrow wire formats for measurement responses.
+
+Encodes the same rows with the Lambda's JSON and Arrow response builders,
+then times what the dashboard does with each: decode the body and build
+the plotting DataFrame.
+
+Usage:
+    python -m benchmarks.bench_wire_format --rows 10000 100000 500000
+"""
+import argparse
+import base64
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pyarrow as pa
+
+from backend import lambda_function
+from frontend.dashboard import format_measurements_data
+from utils.api_requests import _as_frame
+
+COLUMNS = ["measurement_id", "sensor_id", "vest_id", "timestamp", "value",
+           "additional_data", "position", "sensor_type"]
+SENSORS = [(1, "chest", "IMU"), (2, "left_elbow", "FlexSensor"), (3, "upper_back", "StretchSensor")]
+
+
+def make_rows(count):
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(count):
+        sensor_id, position, sensor_type = SENSORS[i % len(SENSORS)]
+        rows.append({
+            "measurement_id": i + 1,
+            "sensor_id": sensor_id,
+            "vest_id": 1,
+            "timestamp": start + timedelta(microseconds=20_000 * i + 137),
+            "value": Decimal(i % 1000) / 7,
+            "additional_data": None,
+            "position": position,
+            "sensor_type": sensor_type,
+        })
+    return rows
+
+
+def best_of(repeat, func):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 500_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'format':>6} {'bytes':>12} {'encode (ms)':>12} {'decode+frame (ms)':>18}")
+    for count in args.rows:
+        rows = make_rows(count)
+
+        start = time.perf_counter()
+        json_body = lambda_function._response(200, rows)["body"].encode("utf-8")
+        json_encode = time.perf_counter() - start
+        json_decode = best_of(args.repeat, lambda: format_measurements_data(json.loads(json_body)))
+
+        start = time.perf_counter()
+        arrow_body = base64.b64decode(lambda_function._arrow_response(200, rows, COLUMNS)["body"])
+        arrow_encode = time.perf_counter() - start
+        arrow_decode = best_of(args.repeat, lambda: format_measurements_data(
+            _as_frame(pa.ipc.open_stream(arrow_body).read_all())
+        ))
+
+        print(f"{count:>10,} {'json':>6} {len(json_body):>12,} {json_encode * 1000:>12.1f} {json_decode * 1000:>18.1f}")
+        print(f"{count:>10,} {'arrow':>6} {len(arrow_body):>12,} {arrow_encode * 1000:>12.1f} {arrow_decode * 1000:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
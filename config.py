@@ -0,0 +1,86 @@
+import os
+import tempfile
+
+# API configuration
+API_BASE_URL = os.environ.get(
+    "API_BASE_URL", "https://b4aifmwd05.execute-api.us-east-1.amazonaws.com/dev"
+)
+
+# Response cache shared by every dashboard session
+# TTLs are in seconds, keyed by endpoint name
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "512"))
+CACHE_TTLS = {
+    "vests": 60,
+    "vest": 60,
+    "sensors": 300,
+    "measurements": 10,
+    "aggregate": 15,
+}
+
+# Vests per page in the admin's fleet view
+VEST_PAGE_SIZE = int(os.environ.get("VEST_PAGE_SIZE", "30"))
+
+# HTTP client settings (seconds)
+API_CONNECT_TIMEOUT = float(os.environ.get("API_CONNECT_TIMEOUT", "3.05"))
+API_READ_TIMEOUT = float(os.environ.get("API_READ_TIMEOUT", "15"))
+API_MAX_RETRIES = int(os.environ.get("API_MAX_RETRIES", "3"))
+API_POOL_SIZE = int(os.environ.get("API_POOL_SIZE", "10"))
+
+# Concurrent fetching: max requests in flight per server process,
+# and how long the page waits for any single request (seconds).  Unset,
+# the wait is the client's retry budget (SensorVestClient.retry_budget),
+# so a request is not given up on while its retries may still succeed.
+FETCH_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", "8"))
+FETCH_TIMEOUT = float(os.environ["FETCH_TIMEOUT"]) if os.environ.get("FETCH_TIMEOUT") else None
+
+# Incremental measurement fetching: how far back the first load reaches,
+# rows per page, and the cap on rows a session keeps per vest
+MEASUREMENT_HISTORY_SECONDS = int(os.environ.get("MEASUREMENT_HISTORY_SECONDS", "10000000"))
+MEASUREMENT_PAGE_SIZE = int(os.environ.get("MEASUREMENT_PAGE_SIZE", "5000"))
+MEASUREMENT_BUFFER_MAX_ROWS = int(os.environ.get("MEASUREMENT_BUFFER_MAX_ROWS", "500000"))
+
+# Disk cache of measurement history, shared by all sessions and worker processes.
+# Set HISTORY_CACHE_DIR to an empty string to disable it; the size limit is in bytes.
+HISTORY_CACHE_DIR = os.environ.get(
+    "HISTORY_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "sensor-vest", "history")
+)
+HISTORY_CACHE_MAX_BYTES = int(os.environ.get("HISTORY_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Aggregated charts: bucket sizes the dashboard may request (seconds, smallest first)
+# and the number of points per chart it aims for
+CHART_BUCKETS = {
+    "1s": 1, "5s": 5, "10s": 10, "30s": 30,
+    "1m": 60, "5m": 300, "15m": 900,
+    "1h": 3600, "6h": 21600, "1d": 86400,
+}
+CHART_TARGET_POINTS = int(os.environ.get("CHART_TARGET_POINTS", "600"))
+CHART_RANGES = {
+    "Last 15 minutes": 900,
+    "Last hour": 3600,
+    "Last 6 hours": 21600,
+    "Last 24 hours": 86400,
+    "Last 7 days": 604800,
+    "Last 30 days": 2592000,
+}
+
+# Raw charts: most points sent to the browser per chart
+CHART_POINT_BUDGET = int(os.environ.get("CHART_POINT_BUDGET", "2000"))
+
+# Live mode: stream server base URL (backend/local_server.py locally),
+# rows kept in the in-memory ring buffer, chart refresh interval and
+# how many seconds of data the live chart shows
+LIVE_STREAM_URL = os.environ.get("LIVE_STREAM_URL", "http://localhost:8000")
+LIVE_BUFFER_ROWS = int(os.environ.get("LIVE_BUFFER_ROWS", "20000"))
+LIVE_REFRESH_SECONDS = float(os.environ.get("LIVE_REFRESH_SECONDS", "0.5"))
+LIVE_WINDOW_SECONDS = int(os.environ.get("LIVE_WINDOW_SECONDS", "60"))
+
+# Metrics tab: rolling window choices in seconds (first is the default)
+METRICS_WINDOWS = [5, 10, 30, 60]
+
+# Export: days of history the export form covers by default
+EXPORT_DEFAULT_DAYS = int(os.environ.get("EXPORT_DEFAULT_DAYS", "30"))
+
+# Export: prepared files wait for download here, and any older than
+# EXPORT_FILE_TTL seconds are deleted when the next export starts
+EXPORT_DIR = os.environ.get("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "sensor-vest-exports"))
+EXPORT_FILE_TTL = int(os.environ.get("EXPORT_FILE_TTL", "3600"))
@@ -0,0 +1,201 @@
+-- Sensor Vest database schema (PostgreSQL 14+).
+--
+-- measurements is range-partitioned by day on timestamp.  Rows for a day
+-- without a partition land in measurements_default and are moved out when
+-- the partition is created.  Per-minute and per-hour rollups are kept
+-- current by a statement trigger on every insert, so charts over long
+-- ranges never scan raw rows and survive the raw retention window.
+--
+-- The script is idempotent: running it again only adds what is missing.
+--
+-- Maintenance, run daily (the Lambda does this on an EventBridge schedule):
+--     SELECT create_measurement_partitions(CURRENT_DATE, 7);
+--     SELECT drop_old_measurement_partitions(INTERVAL '30 days', INTERVAL '365 days');
+
+CREATE TABLE IF NOT EXISTS vests (
+    vest_id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    description TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    is_active BOOLEAN DEFAULT TRUE
+);
+
+CREATE TABLE IF NOT EXISTS sensor_types (
+    sensor_type_id SERIAL PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE,
+    description TEXT,
+    unit_of_measurement VARCHAR(50)
+);
+
+INSERT INTO sensor_types (name, description, unit_of_measurement) VALUES
+    ('IMU', 'Inertial Measurement Unit', 'degrees'),
+    ('FlexSensor', 'Flexibility sensor', 'ohms'),
+    ('StretchSensor', 'Stretchable sensor', 'ohms')
+ON CONFLICT (name) DO NOTHING;
+
+CREATE TABLE IF NOT EXISTS sensors (
+    sensor_id SERIAL PRIMARY KEY,
+    vest_id INTEGER NOT NULL REFERENCES vests (vest_id),
+    sensor_type_id INTEGER NOT NULL REFERENCES sensor_types (sensor_type_id),
+    position VARCHAR(100) NOT NULL,
+    is_active BOOLEAN DEFAULT TRUE,
+    calibration_data TEXT,
+    last_maintenance TIMESTAMP WITH TIME ZONE,
+    UNIQUE (vest_id, position)
+);
+
+-- Raw measurements.  The partition key has to be part of every unique
+-- constraint, hence the composite primary key.
+CREATE TABLE IF NOT EXISTS measurements (
+    measurement_id BIGSERIAL,
+    sensor_id INTEGER NOT NULL REFERENCES sensors (sensor_id),
+    vest_id INTEGER NOT NULL REFERENCES vests (vest_id),
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    value DOUBLE PRECISION NOT NULL,
+    additional_data TEXT,
+    PRIMARY KEY (measurement_id, timestamp),
+    UNIQUE (sensor_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE TABLE IF NOT EXISTS measurements_default PARTITION OF measurements DEFAULT;
+
+-- Rows arrive in time order, so BRIN summaries stay tight and cost almost
+-- nothing to maintain.  The B-tree serves the per-vest "recent" queries.
+CREATE INDEX IF NOT EXISTS idx_measurements_vest_timestamp
+    ON measurements (vest_id, timestamp);
+CREATE INDEX IF NOT EXISTS brin_measurements_timestamp
+    ON measurements USING BRIN (timestamp) WITH (pages_per_range = 32);
+CREATE INDEX IF NOT EXISTS brin_measurements_measurement_id
+    ON measurements USING BRIN (measurement_id) WITH (pages_per_range = 32);
+
+-- Rollups.  mean is sum / count, so buckets can be merged incrementally.
+CREATE TABLE IF NOT EXISTS measurements_1m (
+    sensor_id INTEGER NOT NULL REFERENCES sensors (sensor_id),
+    vest_id INTEGER NOT NULL,
+    bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+    count BIGINT NOT NULL,
+    sum DOUBLE PRECISION NOT NULL,
+    min DOUBLE PRECISION NOT NULL,
+    max DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (sensor_id, bucket)
+);
+CREATE INDEX IF NOT EXISTS idx_measurements_1m_vest_bucket ON measurements_1m (vest_id, bucket);
+
+CREATE TABLE IF NOT EXISTS measurements_1h (
+    sensor_id INTEGER NOT NULL REFERENCES sensors (sensor_id),
+    vest_id INTEGER NOT NULL,
+    bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+    count BIGINT NOT NULL,
+    sum DOUBLE PRECISION NOT NULL,
+    min DOUBLE PRECISION NOT NULL,
+    max DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (sensor_id, bucket)
+);
+CREATE INDEX IF NOT EXISTS idx_measurements_1h_vest_bucket ON measurements_1h (vest_id, bucket);
+
+-- Folds the rows of one INSERT statement into both rollups.  Only rows that
+-- were actually inserted appear in new_rows, so ON CONFLICT DO NOTHING
+-- duplicates are not counted twice.  Updates and deletes of raw rows are
+-- not reflected; raw data is append-only.
+CREATE OR REPLACE FUNCTION update_measurement_rollups() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO measurements_1m AS r (sensor_id, vest_id, bucket, count, sum, min, max)
+    SELECT sensor_id, vest_id, date_trunc('minute', timestamp),
+           COUNT(*), SUM(value), MIN(value), MAX(value)
+    FROM new_rows
+    GROUP BY 1, 2, 3
+    ON CONFLICT (sensor_id, bucket) DO UPDATE SET
+        count = r.count + EXCLUDED.count,
+        sum = r.sum + EXCLUDED.sum,
+        min = LEAST(r.min, EXCLUDED.min),
+        max = GREATEST(r.max, EXCLUDED.max);
+
+    INSERT INTO measurements_1h AS r (sensor_id, vest_id, bucket, count, sum, min, max)
+    SELECT sensor_id, vest_id, date_trunc('hour', timestamp),
+           COUNT(*), SUM(value), MIN(value), MAX(value)
+    FROM new_rows
+    GROUP BY 1, 2, 3
+    ON CONFLICT (sensor_id, bucket) DO UPDATE SET
+        count = r.count + EXCLUDED.count,
+        sum = r.sum + EXCLUDED.sum,
+        min = LEAST(r.min, EXCLUDED.min),
+        max = GREATEST(r.max, EXCLUDED.max);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SET TimeZone = 'UTC';
+
+CREATE OR REPLACE TRIGGER measurements_rollup
+    AFTER INSERT ON measurements
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_measurement_rollups();
+
+-- Creates the partition for one UTC day, moving any rows for that day out
+-- of measurements_default first.  Returns the partition name.
+CREATE OR REPLACE FUNCTION create_measurement_partition(day DATE) RETURNS TEXT AS $$
+DECLARE
+    partition_name TEXT := format('measurements_%s', to_char(day, 'YYYYMMDD'));
+    lower_bound TIMESTAMPTZ := day::TIMESTAMP AT TIME ZONE 'UTC';
+    upper_bound TIMESTAMPTZ := (day + 1)::TIMESTAMP AT TIME ZONE 'UTC';
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE measurements INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+        partition_name
+    );
+    EXECUTE format(
+        'WITH moved AS (
+             DELETE FROM measurements_default WHERE timestamp >= $1 AND timestamp < $2 RETURNING *
+         )
+         INSERT INTO %I SELECT * FROM moved',
+        partition_name
+    ) USING lower_bound, upper_bound;
+    EXECUTE format(
+        'ALTER TABLE measurements ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, lower_bound, upper_bound
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION create_measurement_partitions(first_day DATE, days INTEGER)
+RETURNS INTEGER AS $$
+    SELECT COUNT(create_measurement_partition(first_day + offset_days))::INTEGER
+    FROM generate_series(0, days - 1) AS offset_days;
+$$ LANGUAGE sql;
+
+-- Retention: drops daily raw partitions that end before now() - keep_raw and
+-- deletes per-minute rollups older than keep_minutely.  Hourly rollups are
+-- kept.  Returns the number of partitions dropped.
+CREATE OR REPLACE FUNCTION drop_old_measurement_partitions(
+    keep_raw INTERVAL,
+    keep_minutely INTERVAL DEFAULT NULL
+) RETURNS INTEGER AS $$
+DECLARE
+    cutoff TIMESTAMPTZ := NOW() - keep_raw;
+    partition_name TEXT;
+    dropped INTEGER := 0;
+BEGIN
+    FOR partition_name IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'measurements'::REGCLASS
+          AND c.relname ~ '^measurements_\d{8}$'
+          AND (to_date(right(c.relname, 8), 'YYYYMMDD') + 1)::TIMESTAMP AT TIME ZONE 'UTC' <= cutoff
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('DROP TABLE %I', partition_name);
+        dropped := dropped + 1;
+    END LOOP;
+
+    DELETE FROM measurements_default WHERE timestamp < cutoff;
+    IF keep_minutely IS NOT NULL THEN
+        DELETE FROM measurements_1m WHERE bucket < NOW() - keep_minutely;
+    END IF;
+    RETURN dropped;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_measurement_partitions(CURRENT_DATE, 7);
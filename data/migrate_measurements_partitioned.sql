@@ -0,0 +1,63 @@
+-- Migrates a database created with the original, unpartitioned measurements
+-- table (NUMERIC values, B-tree indexes) to the layout in database_setup.sql.
+--
+--     psql "$DATABASE_URL" -f data/migrate_measurements_partitioned.sql
+--
+-- Everything runs in one transaction.  Writers should be stopped first:
+-- the old table is renamed to measurements_legacy and copied into daily
+-- partitions, and the rollups are built from the copied rows by the
+-- insert trigger.  measurements_legacy is kept for checking; drop it once
+-- the row counts match.  Rows with a NULL timestamp cannot be partitioned
+-- and are left behind in measurements_legacy.
+
+\set ON_ERROR_STOP on
+
+BEGIN;
+
+ALTER TABLE measurements RENAME TO measurements_legacy;
+ALTER INDEX IF EXISTS measurements_pkey RENAME TO measurements_legacy_pkey;
+ALTER INDEX IF EXISTS measurements_sensor_id_timestamp_key RENAME TO measurements_legacy_sensor_id_timestamp_key;
+ALTER INDEX IF EXISTS idx_measurements_vest_timestamp RENAME TO idx_measurements_legacy_vest_timestamp;
+ALTER INDEX IF EXISTS idx_measurements_timestamp RENAME TO idx_measurements_legacy_timestamp;
+ALTER SEQUENCE IF EXISTS measurements_measurement_id_seq RENAME TO measurements_legacy_measurement_id_seq;
+
+\ir database_setup.sql
+
+-- One partition for each day that has legacy rows
+SELECT COUNT(create_measurement_partition(day))
+FROM (
+    SELECT DISTINCT (timestamp AT TIME ZONE 'UTC')::DATE AS day
+    FROM measurements_legacy
+    WHERE timestamp IS NOT NULL
+) AS days;
+
+INSERT INTO measurements (measurement_id, sensor_id, vest_id, timestamp, value, additional_data)
+SELECT measurement_id, sensor_id, vest_id, timestamp, value::DOUBLE PRECISION, additional_data
+FROM measurements_legacy
+WHERE timestamp IS NOT NULL
+ORDER BY timestamp;
+
+-- New ids continue after the legacy ones, so measurement_id cursors held by
+-- clients stay valid
+SELECT setval(
+    pg_get_serial_sequence('measurements', 'measurement_id'),
+    COALESCE((SELECT MAX(measurement_id) FROM measurements_legacy), 0) + 1,
+    false
+);
+
+COMMIT;
+
+ANALYZE measurements;
+ANALYZE measurements_1m;
+ANALYZE measurements_1h;
+
+SELECT
+    (SELECT COUNT(*) FROM measurements_legacy) AS legacy_rows,
+    (SELECT COUNT(*) FROM measurements) AS migrated_rows;
+
+-- When the counts match:
+-- DROP TABLE measurements_legacy;
+--
+-- Every partition adds planning time to queries on measurements, so apply
+-- retention right away if the legacy data reaches back further than it:
+-- SELECT drop_old_measurement_partitions(INTERVAL '30 days', INTERVAL '365 days');
@@ -0,0 +1,61 @@
+"""Plotly figures for the vest detail page.
+
+Kept apart from frontend/dashboard.py so that pages without charts never
+import plotly's figure and subplot modules.
+"""
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+
+def aggregate_figure(sensor_df, title):
+    """Min/max envelope with the mean drawn on top, for one sensor's buckets."""
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=sensor_df["bucket"], y=sensor_df["max"],
+        mode="lines", line={"width": 0}, name="max",
+    ))
+    fig.add_trace(go.Scatter(
+        x=sensor_df["bucket"], y=sensor_df["min"],
+        mode="lines", line={"width": 0}, fill="tonexty",
+        fillcolor="rgba(99, 110, 250, 0.2)", name="min",
+    ))
+    fig.add_trace(go.Scatter(
+        x=sensor_df["bucket"], y=sensor_df["mean"],
+        mode="lines", line={"color": "rgb(99, 110, 250)"}, name="mean",
+    ))
+    fig.update_layout(title=title, hovermode="x unified", xaxis_title="timestamp", yaxis_title="value")
+    return fig
+
+
+def sensor_trace(sensor_data, name):
+    """WebGL line trace of one sensor's measurements."""
+    return go.Scattergl(
+        x=sensor_data["timestamp"],
+        y=sensor_data["value"],
+        mode="lines",
+        name=name,
+    )
+
+
+def sensor_figure(sensor_data, title):
+    fig = go.Figure(sensor_trace(sensor_data, title))
+    fig.update_layout(title=title, xaxis_title="timestamp", yaxis_title="value")
+    return fig
+
+
+def faceted_figure(panels, row_height=250):
+    """One figure with a row per sensor sharing the time axis.
+
+    panels is a list of (title, sensor_data) pairs.
+    """
+    fig = make_subplots(
+        rows=len(panels),
+        cols=1,
+        shared_xaxes=True,
+        vertical_spacing=min(0.05, 0.3 / len(panels)),
+        subplot_titles=[title for title, _ in panels],
+    )
+    for row, (title, sensor_data) in enumerate(panels, start=1):
+        fig.add_trace(sensor_trace(sensor_data, title), row=row, col=1)
+    fig.update_layout(height=row_height * len(panels), showlegend=False)
+    return fig
@@ -0,0 +1,143 @@
+import pandas as pd
+import pyarrow as pa
+
+from utils.downsampling import downsample
+
+# Columns of the plotting DataFrame built from measurement API responses
+MEASUREMENT_COLUMNS = ["sensor_id", "timestamp", "value", "position", "sensor_type"]
+CATEGORY_COLUMNS = ["sensor_id", "position", "sensor_type"]
+
+# Parsers tried in order on timestamps the previous one could not read.
+# ISO8601 covers both "2025-03-25 15:30:00" and "2025-03-25T15:30:00+00:00";
+# "mixed" falls back to per-value inference for anything else.
+TIMESTAMP_FORMATS = ["ISO8601", "mixed"]
+
+# Strings with a time part ending in a UTC offset.  They are parsed apart
+# from naive ones: in a single to_datetime call pandas reads a naive value
+# that follows an offset one in that offset instead of UTC.
+UTC_OFFSET_SUFFIX = r"[T ]\d.*(?:Z|[+-]\d\d(?::?\d\d)?)$"
+
+# Arrow casts tried first: all-offset strings (what the API returns), then all-naive
+ARROW_TIMESTAMP_TYPES = [pa.timestamp("ns", tz="UTC"), pa.timestamp("ns")]
+
+
+def _parse_timestamps_arrow(raw):
+    strings = pa.array(raw, type=pa.string(), from_pandas=True)
+    if strings.null_count:
+        return None
+    for arrow_type in ARROW_TIMESTAMP_TYPES:
+        try:
+            parsed = strings.cast(arrow_type).to_pandas()
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            continue
+        parsed.index = raw.index
+        if parsed.dt.tz is not None:
+            parsed = parsed.dt.tz_localize(None)
+        return parsed
+    return None
+
+
+def parse_timestamps(raw):
+    """Parse a Series of timestamp strings into naive UTC datetimes.
+
+    Columns that are already datetimes (Arrow responses) are only converted.
+    A uniform column of strings is parsed by a single Arrow cast. Otherwise each
+    format is applied in vectorized calls (one for strings with a UTC offset,
+    one for naive strings, which are taken as UTC) to the rows that are still
+    unparsed, and values no format can read fall back to the current UTC time.
+    """
+    if pd.api.types.is_datetime64_any_dtype(raw):
+        if raw.dt.tz is not None:
+            raw = raw.dt.tz_convert(None)
+        return raw.astype("datetime64[ns]")
+
+    try:
+        parsed = _parse_timestamps_arrow(raw)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        parsed = None
+    if parsed is not None:
+        return parsed
+
+    parsed = pd.Series(pd.NaT, index=raw.index, dtype="datetime64[ns, UTC]")
+    remaining = raw.notna()
+    has_offset = raw.astype("string").str.contains(UTC_OFFSET_SUFFIX, na=False)
+    for fmt in TIMESTAMP_FORMATS:
+        if not remaining.any():
+            break
+        for rows in (remaining & has_offset, remaining & ~has_offset):
+            if rows.any():
+                parsed[rows] = pd.to_datetime(raw[rows], format=fmt, utc=True, errors="coerce")
+        remaining = parsed.isna() & raw.notna()
+    return parsed.dt.tz_localize(None).fillna(pd.Timestamp.now(tz="UTC").tz_localize(None))
+
+
+def format_measurements_data(measurements):
+    """Build the plotting DataFrame from a list of measurement objects or a
+    DataFrame decoded from an Arrow response."""
+    if measurements is None or len(measurements) == 0:
+        return pd.DataFrame()
+
+    if isinstance(measurements, pd.DataFrame):
+        df = measurements.reindex(columns=MEASUREMENT_COLUMNS)
+    else:
+        df = pd.DataFrame.from_records(measurements, columns=MEASUREMENT_COLUMNS)
+    df["timestamp"] = parse_timestamps(df["timestamp"])
+    df["value"] = pd.to_numeric(df["value"], errors="coerce").fillna(0.0).astype("float64")
+    for column in ("position", "sensor_type"):
+        if df[column].isna().any():
+            df[column] = df[column].astype("object").fillna("unknown")
+    df = df.astype({column: "category" for column in CATEGORY_COLUMNS})
+    return df
+
+
+def choose_bucket(range_seconds, buckets, target_points):
+    """Pick the smallest bucket that keeps a chart near target_points points.
+
+    buckets maps labels such as "1m" to their size in seconds, smallest first.
+    """
+    for label, size in buckets.items():
+        if range_seconds / size <= target_points:
+            return label
+    return label
+
+
+def format_aggregate_data(rows):
+    """Build a DataFrame from /measurements/aggregate rows or an Arrow-decoded frame."""
+    if rows is None or len(rows) == 0:
+        return pd.DataFrame()
+
+    df = rows.copy() if isinstance(rows, pd.DataFrame) else pd.DataFrame.from_records(rows)
+    df["bucket"] = parse_timestamps(df["bucket"])
+    for column in ("mean", "min", "max"):
+        if column in df:
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+    return df
+
+
+def downsample_frame(sensor_data, point_budget):
+    """Reduce one sensor's measurements to at most about point_budget rows."""
+    if len(sensor_data) <= point_budget:
+        return sensor_data
+    sensor_data = sensor_data.sort_values("timestamp")
+    keep = downsample(
+        sensor_data["timestamp"].to_numpy(),
+        sensor_data["value"].to_numpy(),
+        point_budget,
+    )
+    return sensor_data.iloc[keep]
+
+
+def sensor_panels(measurements_df, sensors, point_budget):
+    """(sensor_id, title, plot data, total points) per sensor with readings, in order of appearance.
+
+    One groupby pass splits the measurements; sensor categories without
+    readings get no panel, and each panel is downsampled to the budget.
+    """
+    # Index sensor metadata once instead of searching per sensor
+    sensors_by_id = {s.get("sensor_id"): s for s in sensors}
+    panels = []
+    for sensor_id, sensor_data in measurements_df.groupby("sensor_id", observed=True, sort=False):
+        sensor_info = sensors_by_id.get(sensor_id, {})
+        title = f"{sensor_info.get('sensor_type', 'Unknown Type')} at {sensor_info.get('position', 'Unknown Position')}"
+        panels.append((sensor_id, title, downsample_frame(sensor_data, point_budget), len(sensor_data)))
+    return panels
@@ -0,0 +1,470 @@
+"""Data helpers behind the dashboard pages.
+
+DashboardData wraps the shared API client with the response cache, the
+disk history cache and each session's measurement buffers.  app.py
+builds a single instance per server process through st.cache_resource,
+so reruns reuse the helpers instead of redefining them.  As on the
+pages, a failed fetch is reported with st.error and yields an empty
+result.
+"""
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+import config
+from utils.api_requests import ApiError
+
+
+def fetch_concurrently(executor, timeout, *calls):
+    """Run (helper, arg, ...) tuples on executor and return their results in order.
+
+    Wall-clock time is bounded by the slowest call. A call that does not finish
+    within timeout seconds is reported and yields None.
+    """
+    ctx = get_script_run_ctx()
+
+    def run(helper, *args):
+        # Attach this session's context so helpers can still use st.error
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return helper(*args)
+
+    futures = [executor.submit(run, *call) for call in calls]
+    deadline = time.monotonic() + timeout
+    results = []
+    for call, future in zip(calls, futures):
+        try:
+            results.append(future.result(timeout=max(0, deadline - time.monotonic())))
+        except FutureTimeoutError:
+            st.error(f"Timed out waiting for {call[0].__name__}")
+            results.append(None)
+    return results
+
+
+class DashboardData:
+    """Fetch helpers shared by every session of the server process.
+
+    history_cache and calibration_cache are zero-argument callables
+    returning those caches (or None), so pages that never use them do
+    not load them.
+    """
+
+    # Helpers timed in dashboard_fetch_seconds, labelled with their names
+    TIMED_HELPERS = (
+        "get_user_vests", "get_vest_page", "count_active_vests", "get_vest", "get_vest_sensors",
+        "fetch_new_measurements", "get_recent_measurements", "get_aggregated_measurements", "add_measurement",
+    )
+
+    def __init__(self, client, api_cache, perf_registry, history_cache=lambda: None,
+                 calibration_cache=lambda: None):
+        self.client = client
+        self.api_cache = api_cache
+        self.perf_registry = perf_registry
+        self.history_cache = history_cache
+        self.calibration_cache = calibration_cache
+        timed_helper = perf_registry.instrument("dashboard_fetch_seconds", label="helper")
+        for name in self.TIMED_HELPERS:
+            setattr(self, name, timed_helper(getattr(self, name)))
+
+    # How long fetch_concurrently waits for a helper: FETCH_TIMEOUT, or the client's retry budget
+    def fetch_timeout(self):
+        return config.FETCH_TIMEOUT or self.client.retry_budget()
+
+    # Function to get the vests a user may see, each with its sensor count
+    # The API filters by vest ID, so only the user's own vest is downloaded
+    def get_user_vests(self, username):
+        if not username.isdigit():
+            return []
+        cached = self.api_cache.get(("vests", username))
+        if cached is not None:
+            return cached
+        try:
+            vests = self.client.get_vests(include_sensor_count=True, vest_ids=[int(username)])
+            self.api_cache.set(("vests", username), vests)
+            return vests
+        except ApiError as e:
+            st.error(f"Failed to fetch vests. Status code: {e.status_code}")
+            return []
+        except Exception as e:
+            st.error(f"Error fetching vests: {str(e)}")
+            return []
+
+    # Function to get one page of the fleet for the admin view
+    # One vest more than a page is requested, to tell whether there is a next page
+    def get_vest_page(self, after_vest_id, active_only):
+        key = ("vests", "page", after_vest_id, active_only)
+        cached = self.api_cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            vests = self.client.get_vests(
+                include_sensor_count=True,
+                is_active=True if active_only else None,
+                after_vest_id=after_vest_id,
+                limit=config.VEST_PAGE_SIZE + 1,
+            )
+            self.api_cache.set(key, vests)
+            return vests
+        except ApiError as e:
+            st.error(f"Failed to fetch vests. Status code: {e.status_code}")
+            return []
+        except Exception as e:
+            st.error(f"Error fetching vests: {str(e)}")
+            return []
+
+    # Function to get every active vest, filtered by the API (admin Home metric)
+    def count_active_vests(self):
+        cached = self.api_cache.get(("vests", "active_count"))
+        if cached is not None:
+            return cached
+        try:
+            count = self.client.count_vests(is_active=True)
+            self.api_cache.set(("vests", "active_count"), count)
+            return count
+        except ApiError as e:
+            st.error(f"Failed to count vests. Status code: {e.status_code}")
+            return 0
+        except Exception as e:
+            st.error(f"Error counting vests: {str(e)}")
+            return 0
+
+    # Function to get a specific vest
+    def get_vest(self, vest_id):
+        cached = self.api_cache.get(("vest", vest_id))
+        if cached is not None:
+            return cached
+        try:
+            vest = self.client.get_vest(vest_id)
+            self.api_cache.set(("vest", vest_id), vest)
+            return vest
+        except ApiError as e:
+            st.error(f"Failed to fetch vest. Status code: {e.status_code}")
+            return None
+        except Exception as e:
+            st.error(f"Error fetching vest: {str(e)}")
+            return None
+
+    # Function to get sensors for a vest
+    def get_vest_sensors(self, vest_id):
+        cached = self.api_cache.get(("sensors", vest_id))
+        if cached is not None:
+            return cached
+        try:
+            sensors = self.client.get_vest_sensors(vest_id)
+            self.api_cache.set(("sensors", vest_id), sensors)
+            return sensors
+        except ApiError as e:
+            st.error(f"Failed to fetch sensors. Status code: {e.status_code}")
+            return []
+        except Exception as e:
+            st.error(f"Error fetching sensors: {str(e)}")
+            return []
+
+    # Function to fetch measurements newer than a cursor, following pages
+    # Without a cursor only the newest page is fetched, instead of the whole history
+    # Returns None once more rows are waiting than the buffer holds, instead of paging on
+    def fetch_new_measurements(self, vest_id, after_id):
+        cached = self.api_cache.get(("measurements", vest_id, after_id))
+        if cached is not None:
+            return cached
+        if not after_id:
+            new_rows = self.fetch_latest_measurements(vest_id)
+            self.api_cache.set(("measurements", vest_id, after_id), new_rows)
+            return new_rows
+        # Pages arrive as Arrow and are decoded straight into DataFrames
+        pages = []
+        gathered = 0
+        cursor = after_id
+        while True:
+            page = self.client.get_recent_measurements(
+                vest_id,
+                seconds=config.MEASUREMENT_HISTORY_SECONDS,
+                after_measurement_id=cursor,
+                limit=config.MEASUREMENT_PAGE_SIZE,
+                as_frame=True,
+            )
+            pages.append(page)
+            gathered += len(page)
+            if len(page) < config.MEASUREMENT_PAGE_SIZE:
+                break
+            if gathered >= config.MEASUREMENT_BUFFER_MAX_ROWS:
+                # The buffer would keep none of its rows from before the gap anyway
+                return None
+            cursor = int(page["measurement_id"].iloc[-1])
+        new_rows = pages[0] if len(pages) == 1 else pd.concat(pages, ignore_index=True)
+        self.api_cache.set(("measurements", vest_id, after_id), new_rows)
+        return new_rows
+
+    # Function to fetch the newest rows of a vest, to seed an empty buffer
+    # Without a cursor the server answers newest first; the rows are put back in id order
+    def fetch_latest_measurements(self, vest_id):
+        rows = self.client.get_recent_measurements(
+            vest_id,
+            seconds=config.MEASUREMENT_HISTORY_SECONDS,
+            limit=min(config.MEASUREMENT_PAGE_SIZE, config.MEASUREMENT_BUFFER_MAX_ROWS),
+            as_frame=True,
+        )
+        if rows.empty:
+            return rows
+        return rows.sort_values("measurement_id", ignore_index=True)
+
+    # Function to load the cached history of a vest into a fresh session buffer
+    def load_cached_history(self, vest_id):
+        buffer = {"frame": pd.DataFrame(), "last_id": 0}
+        history_cache = self.history_cache()
+        if history_cache is None:
+            return buffer
+        since = datetime.now(timezone.utc) - pd.Timedelta(seconds=config.MEASUREMENT_HISTORY_SECONDS)
+        try:
+            frame = history_cache.read(vest_id, since=since, max_rows=config.MEASUREMENT_BUFFER_MAX_ROWS)
+        except Exception as e:
+            st.warning(f"Could not read the history cache: {str(e)}")
+            return buffer
+        if not frame.empty:
+            # The cursor comes from the rows actually loaded, so nothing in between is skipped
+            buffer = {"frame": frame, "last_id": int(frame["measurement_id"].iloc[-1])}
+        return buffer
+
+    # Function to get recent measurements for a vest
+    # Rows are kept in a per-session buffer and only newer rows are fetched on rerun
+    # A new buffer starts from the disk history cache, so only the missing tail is fetched
+    def get_recent_measurements(self, vest_id):
+        buffers = st.session_state.setdefault("measurement_buffers", {})
+        if vest_id not in buffers:
+            buffers[vest_id] = self.load_cached_history(vest_id)
+        buffer = buffers[vest_id]
+        try:
+            new_rows = self.fetch_new_measurements(vest_id, buffer["last_id"])
+            if new_rows is None:
+                # Too far behind, e.g. a stale history cache: start again from the newest rows
+                buffer = buffers[vest_id] = {"frame": pd.DataFrame(), "last_id": 0}
+                new_rows = self.fetch_new_measurements(vest_id, 0)
+        except ApiError as e:
+            if e.status_code == 500:
+                # Handle potential error with the endpoint
+                st.warning("The measurements API is currently experiencing issues. Displaying sample data instead.")
+                # Return simulated data for development
+                return self.generate_sample_measurements(vest_id)
+            st.error(f"Failed to fetch measurements. Status code: {e.status_code}")
+            return buffer["frame"]
+        except Exception as e:
+            st.error(f"Error fetching measurements: {str(e)}")
+            return buffer["frame"]
+
+        if not new_rows.empty:
+            history_cache = self.history_cache()
+            if history_cache is not None:
+                try:
+                    history_cache.append(vest_id, new_rows)
+                except OSError as e:
+                    st.warning(f"Could not update the history cache: {str(e)}")
+            # Build a new frame so earlier results handed out stay unchanged
+            frame = new_rows if buffer["frame"].empty else pd.concat([buffer["frame"], new_rows], ignore_index=True)
+            buffer["frame"] = frame.iloc[-config.MEASUREMENT_BUFFER_MAX_ROWS:]
+            buffer["last_id"] = int(new_rows["measurement_id"].iloc[-1])
+        return buffer["frame"]
+
+    # Function to get per-sensor time-bucket aggregates for charts
+    def get_aggregated_measurements(self, vest_id, bucket, seconds, calibrated=False):
+        key = ("aggregate", vest_id, bucket, seconds, calibrated)
+        cached = self.api_cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            rows = self.client.get_aggregated_measurements(
+                vest_id, bucket=bucket, seconds=seconds, as_frame=True, calibrated=calibrated
+            )
+            self.api_cache.set(key, rows)
+            return rows
+        except ApiError as e:
+            st.error(f"Failed to fetch aggregated measurements. Status code: {e.status_code}")
+            return []
+        except Exception as e:
+            st.error(f"Error fetching aggregated measurements: {str(e)}")
+            return []
+
+    # Function to generate sample measurements for development when API fails
+    def generate_sample_measurements(self, vest_id):
+        sensors = self.get_vest_sensors(vest_id)
+        if not sensors:
+            return []
+
+        sample_data = []
+        current_time = time.time()
+
+        for sensor in sensors:
+            # Generate 10 sample measurements for each sensor
+            for i in range(10):
+                timestamp = datetime.fromtimestamp(current_time - i * 3600)  # One hour intervals
+                sample_data.append({
+                    "measurement_id": i,
+                    "sensor_id": sensor.get("sensor_id"),
+                    "vest_id": vest_id,
+                    "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                    "value": 20 + random.gauss(0, 5),  # Random value around 20
+                    "position": sensor.get("position", "unknown"),
+                    "sensor_type": sensor.get("sensor_type", "unknown"),
+                    "additional_data": {"simulated": True}
+                })
+
+        return sample_data
+
+    # Function to add new measurements for a sensor
+    def add_measurement(self, vest_id, sensor_id, value):
+        try:
+            # Create measurement data; the timestamp makes a resend a duplicate, not a second row
+            measurement = {
+                "sensor_id": sensor_id,
+                "value": value,
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "additional_data": {"source": "dashboard"}
+            }
+
+            result = self.client.bulk_add_measurements([measurement])
+            if result["accepted"]:
+                # Drop cached data for this vest so the rerun shows the new reading
+                self.api_cache.invalidate_vest(vest_id)
+                return True
+            elif result["rejected"]:
+                st.error(f"Failed to add measurement: sensor {sensor_id} not found")
+            else:
+                st.error("Failed to add measurement: a reading with this timestamp already exists")
+            return False
+        except ApiError as e:
+            st.error(f"Failed to add measurement. Status code: {e.status_code}")
+            if e.message:
+                st.error(f"Response: {e.message}")
+            return False
+        except Exception as e:
+            st.error(f"Error adding measurement: {str(e)}")
+            return False
+
+    # Function to pass measurement values through each sensor's calibration curve
+    def calibrate_measurements(self, measurements_df, sensors):
+        from utils.calibration import apply_calibrations
+        if measurements_df.empty:
+            return measurements_df
+        calibration_cache = self.calibration_cache()
+        calibrations = calibration_cache.for_sensors(sensors)
+        unusable = sorted(sensor_id for sensor_id in calibrations if sensor_id in calibration_cache.errors)
+        if unusable:
+            st.warning(f"Unusable calibration data, showing raw values for sensors: {', '.join(map(str, unusable))}")
+        values = apply_calibrations(
+            measurements_df["sensor_id"].to_numpy(), measurements_df["value"].to_numpy(), calibrations
+        )
+        return measurements_df.assign(value=values)
+
+    # Function to fold newly buffered measurements into this session's feature engine for a vest
+    # Only rows past the last measurement_id already pushed are fed, so a rerun costs O(new rows)
+    def update_session_features(self, vest_id, measurements, sensors, settings):
+        from frontend.dashboard import parse_timestamps
+        from utils.stream_features import FeatureEngine
+
+        engines = st.session_state.setdefault("feature_engines", {})
+        state = engines.get(vest_id)
+        if state is None or state["settings"] != settings:
+            window, threshold, hysteresis, _ = settings
+            engine = FeatureEngine(window=window, threshold=threshold, hysteresis=hysteresis)
+            state = engines[vest_id] = {"engine": engine, "last_id": 0, "settings": settings}
+
+        # The buffer is in measurement_id order, so the new rows are its tail
+        start = measurements["measurement_id"].searchsorted(state["last_id"], side="right")
+        new_rows = measurements.iloc[start:]
+        if not new_rows.empty:
+            with self.perf_registry.timed("dashboard_frame_seconds", step="features"):
+                if settings[3]:
+                    new_rows = self.calibrate_measurements(new_rows, sensors)
+                times = parse_timestamps(new_rows["timestamp"]).astype("int64") / 1e9
+                state["engine"].update_many(
+                    new_rows["sensor_id"].tolist(), times.tolist(), new_rows["value"].astype("float64").tolist()
+                )
+            state["last_id"] = int(new_rows["measurement_id"].iloc[-1])
+        return state["engine"]
+
+    # Function to export a vest's measurement history into a temporary file
+    # The client writes the export page by page, so its size is not bounded by memory
+    def export_vest_measurements(self, vest_id, fmt, first_day, last_day, sensor_ids, bucket, calibrated):
+        discard_export()
+        remove_stale_exports()
+        suffix = f".{fmt}"
+        os.makedirs(config.EXPORT_DIR, exist_ok=True)
+        handle, path = tempfile.mkstemp(prefix=f"vest-{vest_id}-", suffix=suffix, dir=config.EXPORT_DIR)
+        start = datetime.combine(first_day, datetime.min.time(), timezone.utc)
+        end = datetime.combine(last_day, datetime.min.time(), timezone.utc) + timedelta(days=1)
+        status = st.empty()
+        try:
+            with os.fdopen(handle, "wb") as out:
+                rows = self.client.export_measurements(
+                    out,
+                    [vest_id],
+                    format=fmt,
+                    start=start.isoformat(),
+                    end=end.isoformat(),
+                    sensor_ids=sensor_ids,
+                    bucket=bucket,
+                    calibrated=calibrated,
+                    progress=lambda rows: status.caption(f"Exported {rows:,} rows..."),
+                )
+        except ApiError as e:
+            os.remove(path)
+            st.error(f"Failed to export measurements. Status code: {e.status_code}")
+            return
+        except Exception as e:
+            os.remove(path)
+            st.error(f"Error exporting measurements: {str(e)}")
+            return
+        finally:
+            status.empty()
+        st.session_state["export_file"] = {
+            "vest_id": vest_id,
+            "path": path,
+            "name": f"vest-{vest_id}-{first_day:%Y%m%d}-{last_day:%Y%m%d}{'' if bucket is None else '-' + bucket}{suffix}",
+            "rows": rows,
+            "mime": "text/csv" if fmt == "csv" else "application/vnd.apache.parquet",
+        }
+
+
+# Function to delete this session's prepared export file
+def discard_export():
+    export = st.session_state.pop("export_file", None)
+    if export is not None and os.path.exists(export["path"]):
+        os.remove(export["path"])
+
+
+# Function to look up this session's prepared export for a vest
+# Returns None if there is none, or if its file was removed as stale
+def prepared_export(vest_id):
+    export = st.session_state.get("export_file")
+    if export is None or export["vest_id"] != vest_id:
+        return None
+    if not os.path.exists(export["path"]):
+        st.session_state.pop("export_file", None)
+        return None
+    return export
+
+
+# Function to delete exports left behind longer than EXPORT_FILE_TTL
+# Sessions that end without logging out never discard their own file
+def remove_stale_exports(now=None):
+    cutoff = (time.time() if now is None else now) - config.EXPORT_FILE_TTL
+    try:
+        entries = list(os.scandir(config.EXPORT_DIR))
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            # Another session removed it first
+            pass
+    return removed
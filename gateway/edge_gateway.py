@@ -0,0 +1,521 @@
+"""Edge ingest gateway: batches vest readings and ships them upstream compressed.
+
+Vests (or the gym's base station) send readings to the gateway as UDP
+datagrams, or over a Unix datagram socket on the same machine.  Each
+datagram holds one JSON reading, a JSON list of them, or newline-delimited
+JSON:
+
+    {"vest_id": 1, "sensor_id": 3, "value": 42.5, "timestamp": "2025-03-25T15:30:00.020Z"}
+
+Readings are buffered per vest and flushed as one gzipped
+POST /measurements/bulk once a vest has BATCH_MAX_ROWS readings or its
+oldest reading is FLUSH_INTERVAL seconds old.  Readings without a
+timestamp, or with one that does not parse, are stamped on arrival, so
+a resent batch only adds duplicates.  Timestamps without an offset are
+UTC.  Readings whose value is NaN or infinite are dropped, since the
+backend rejects them.
+A sensor's stamps are strictly increasing (a microsecond apart when
+readings arrive together), since the backend drops a second reading with
+the same (sensor_id, timestamp).
+
+A single sender thread delivers batches in the order they were flushed.
+When the upstream is slow or unreachable, batches go to a spill directory
+on disk instead of piling up in memory, and are replayed oldest first
+once it answers again; spilled batches also survive a restart.  When the
+spill directory reaches its size limit, flushing blocks until the sender
+makes room.  That stalls the receiver, so a Unix socket sender blocks and
+UDP datagrams are dropped by the kernel, instead of the gateway growing
+without bound.
+
+With --features the gateway also keeps per-sensor rolling metrics and
+punch counts (utils/stream_features.py) as readings arrive, and logs a
+summary with its stats.
+
+Usage:
+    python -m gateway.edge_gateway --upstream http://localhost:8000 --port 9750
+    python -m gateway.edge_gateway --upstream http://localhost:8000 --features --peak-threshold 50
+"""
+import argparse
+import gzip
+import json
+import logging
+import math
+import os
+import queue
+import re
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from utils.api_requests import ApiError, SensorVestClient
+from utils.stream_features import FeatureEngine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = int(os.environ.get("EDGE_GATEWAY_PORT", "9750"))
+# Flush thresholds; the backend accepts at most 20000 rows per bulk request
+BATCH_MAX_ROWS = int(os.environ.get("EDGE_BATCH_MAX_ROWS", "5000"))
+FLUSH_INTERVAL = float(os.environ.get("EDGE_FLUSH_INTERVAL", "1.0"))
+# Batches held in memory before they are spilled to disk
+MAX_PENDING_BATCHES = int(os.environ.get("EDGE_MAX_PENDING_BATCHES", "16"))
+SPILL_DIR = os.environ.get("EDGE_SPILL_DIR", os.path.join(os.path.expanduser("~"), ".cache", "sensor-vest", "spill"))
+MAX_SPILL_BYTES = int(os.environ.get("EDGE_MAX_SPILL_BYTES", str(1024 ** 3)))
+# Upstream retry backoff (seconds)
+RETRY_MIN_DELAY = 0.5
+RETRY_MAX_DELAY = 30.0
+GZIP_LEVEL = 6
+
+# Upstream answers that mean "try again later"; other 4xx answers reject the batch for good
+RETRY_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+_SPILL_NAME = re.compile(r"^(\d{12})-(\d+)\.json\.gz$")
+
+
+def parse_datagram(data):
+    """Readings in one datagram: a JSON object, a JSON list, or JSON lines."""
+    text = data.decode("utf-8").strip()
+    if not text:
+        return []
+    try:
+        parsed = json.loads(text)
+    except ValueError:
+        parsed = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return parsed if isinstance(parsed, list) else [parsed]
+
+
+def _parse_time(timestamp):
+    """An ISO timestamp as an aware datetime, or None when it is missing or unreadable.
+
+    Timestamps without an offset are taken as UTC, as the backend does.
+    """
+    if not isinstance(timestamp, str):
+        return None
+    try:
+        value = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return None
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _reading_time(timestamp, arrival):
+    """Epoch seconds of an ISO timestamp; arrival time when it is missing or unreadable."""
+    value = _parse_time(timestamp)
+    return arrival if value is None else value.timestamp()
+
+
+def _bulk_row(reading):
+    """The reading as a /measurements/bulk row, or None when it is malformed.
+
+    A NaN or infinite value makes the reading malformed.  The row's
+    timestamp is None when the reading has none or it does not parse, so
+    the reading is stamped on arrival instead of being sent for the
+    backend to reject.
+    """
+    if not isinstance(reading, dict):
+        return None
+    sensor_id, value = reading.get("sensor_id"), reading.get("value")
+    if isinstance(sensor_id, bool) or not isinstance(sensor_id, int):
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        return None
+    timestamp = reading.get("timestamp")
+    row = {"sensor_id": sensor_id, "timestamp": timestamp if _parse_time(timestamp) else None, "value": value}
+    if reading.get("additional_data") is not None:
+        row["additional_data"] = reading["additional_data"]
+    return row
+
+
+class Batch:
+    """A gzipped bulk request body; seq orders batches across memory and disk."""
+
+    __slots__ = ("seq", "rows", "body")
+
+    def __init__(self, seq, rows, body):
+        self.seq = seq
+        self.rows = rows
+        self.body = body
+
+
+class SpillQueue:
+    """Batches on disk, one file per batch, oldest (lowest seq) first.
+
+    Files are written under a temporary name and renamed into place, so a
+    crash never leaves a partial batch behind.  Batches the upstream
+    rejected outright are moved to the rejected/ subdirectory for
+    inspection instead of being retried forever.
+    """
+
+    def __init__(self, directory, max_bytes=MAX_SPILL_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rejected_dir = os.path.join(directory, "rejected")
+        os.makedirs(self.rejected_dir, exist_ok=True)
+        self._files = {}
+        for name in os.listdir(directory):
+            match = _SPILL_NAME.match(name)
+            if match:
+                self._files[int(match.group(1))] = (name, os.path.getsize(os.path.join(directory, name)))
+        self.bytes = sum(size for _, size in self._files.values())
+        # Highest seq used so far, including rejected batches, so names are never reused
+        rejected = [int(m.group(1)) for m in map(_SPILL_NAME.match, os.listdir(self.rejected_dir)) if m]
+        self.last_seq = max(list(self._files) + rejected, default=0)
+
+    def __len__(self):
+        return len(self._files)
+
+    def push(self, batch, force=False):
+        """Write the batch; False if it does not fit in max_bytes (unless force)."""
+        if not force and self.bytes + len(batch.body) > self.max_bytes:
+            return False
+        name = f"{batch.seq:012d}-{batch.rows}.json.gz"
+        tmp = os.path.join(self.directory, f".{name}.tmp")
+        with open(tmp, "wb") as handle:
+            handle.write(batch.body)
+        os.replace(tmp, os.path.join(self.directory, name))
+        self._files[batch.seq] = (name, len(batch.body))
+        self.bytes += len(batch.body)
+        return True
+
+    def peek(self):
+        """The oldest spilled batch, or None."""
+        if not self._files:
+            return None
+        seq = min(self._files)
+        name, _ = self._files[seq]
+        with open(os.path.join(self.directory, name), "rb") as handle:
+            body = handle.read()
+        return Batch(seq, int(_SPILL_NAME.match(name).group(2)), body)
+
+    def remove(self, seq):
+        name, size = self._files.pop(seq)
+        os.remove(os.path.join(self.directory, name))
+        self.bytes -= size
+
+    def reject(self, seq):
+        name, size = self._files.pop(seq)
+        os.replace(os.path.join(self.directory, name), os.path.join(self.rejected_dir, name))
+        self.bytes -= size
+
+
+class EdgeGateway:
+    """Per-vest buffering, batching and ordered, spill-backed delivery upstream."""
+
+    def __init__(self, upstream_url, spill_dir=SPILL_DIR, batch_max_rows=BATCH_MAX_ROWS,
+                 flush_interval=FLUSH_INTERVAL, max_pending_batches=MAX_PENDING_BATCHES,
+                 max_spill_bytes=MAX_SPILL_BYTES, client=None, features=None):
+        self.client = client or SensorVestClient(upstream_url, max_retries=1)
+        self.batch_max_rows = batch_max_rows
+        self.flush_interval = flush_interval
+        self.spill = SpillQueue(spill_dir, max_spill_bytes)
+        # Optional FeatureEngine, fed every valid reading keyed by (vest_id, sensor_id)
+        self.features = features
+        self.stats = {
+            "received": 0, "invalid": 0, "restamped": 0, "batches": 0, "sent_batches": 0, "sent_rows": 0,
+            "accepted": 0, "duplicates": 0, "rejected": 0, "rejected_batches": 0,
+            "spilled_batches": 0, "replayed_batches": 0, "upstream_failures": 0, "blocked_flushes": 0,
+        }
+        self._buffers = {}
+        # Last arrival stamp given to each sensor, in epoch microseconds
+        self._last_stamp = {}
+        self._buffer_lock = threading.Lock()
+        self._pending = queue.Queue(maxsize=max_pending_batches)
+        # Guards the spill queue and the choice between memory and disk
+        self._order = threading.Condition()
+        # Sequence numbers continue after batches spilled by an earlier run
+        self._seq = self.spill.last_seq
+        self._stopping = threading.Event()
+        self._threads = []
+
+    # Receiving and batching
+
+    def submit(self, readings):
+        """Buffer readings (dicts as sent by the vests); returns how many were valid."""
+        arrival_us = time.time_ns() // 1000
+        arrival = arrival_us / 1e6
+        full = []
+        valid = restamped = 0
+        keys, times, values = [], [], []
+        with self._buffer_lock:
+            for reading in readings:
+                row = _bulk_row(reading)
+                if row is None:
+                    continue
+                if row["timestamp"] is None:
+                    if reading.get("timestamp") not in (None, ""):
+                        restamped += 1
+                    row["timestamp"] = self._stamp(row["sensor_id"], arrival_us)
+                valid += 1
+                vest_id = reading.get("vest_id")
+                if self.features is not None:
+                    keys.append((vest_id, row["sensor_id"]))
+                    times.append(_reading_time(reading.get("timestamp"), arrival))
+                    values.append(row["value"])
+                buffer = self._buffers.get(vest_id)
+                if buffer is None:
+                    buffer = self._buffers[vest_id] = {"rows": [], "since": time.monotonic()}
+                buffer["rows"].append(row)
+                if len(buffer["rows"]) >= self.batch_max_rows:
+                    full.append(self._buffers.pop(vest_id)["rows"])
+            self.stats["received"] += valid
+            self.stats["invalid"] += len(readings) - valid
+            self.stats["restamped"] += restamped
+        if keys:
+            self.features.update_many(keys, times, values)
+        for rows in full:
+            self._enqueue(rows)
+        return valid
+
+    def _stamp(self, sensor_id, arrival_us):
+        """An arrival timestamp for sensor_id, later than any it was given before."""
+        stamp = max(arrival_us, self._last_stamp.get(sensor_id, 0) + 1)
+        self._last_stamp[sensor_id] = stamp
+        return (_EPOCH + timedelta(microseconds=stamp)).isoformat(timespec="microseconds")
+
+    def flush(self, max_age=0.0):
+        """Flush every vest buffer whose oldest reading is at least max_age seconds old."""
+        now = time.monotonic()
+        with self._buffer_lock:
+            due = [vest_id for vest_id, buffer in self._buffers.items() if now - buffer["since"] >= max_age]
+            batches = [self._buffers.pop(vest_id)["rows"] for vest_id in due]
+        for rows in batches:
+            self._enqueue(rows)
+
+    def _enqueue(self, rows):
+        body = gzip.compress(json.dumps({"measurements": rows}).encode("utf-8"), GZIP_LEVEL)
+        with self._order:
+            self._seq += 1
+            batch = Batch(self._seq, len(rows), body)
+            self.stats["batches"] += 1
+            while True:
+                if not len(self.spill):
+                    try:
+                        self._pending.put_nowait(batch)
+                        return
+                    except queue.Full:
+                        pass
+                # Once anything is on disk, newer batches follow it there to keep the order
+                self._spill_pending()
+                if self.spill.push(batch):
+                    self.stats["spilled_batches"] += 1
+                    return
+                # Spill directory is full: hold the caller until the sender frees room
+                self.stats["blocked_flushes"] += 1
+                self._order.wait(timeout=1.0)
+
+    def _spill_pending(self):
+        # Caller holds self._order
+        while True:
+            try:
+                batch = self._pending.get_nowait()
+            except queue.Empty:
+                return
+            self.spill.push(batch, force=True)
+            self.stats["spilled_batches"] += 1
+
+    # Delivery
+
+    def _post(self, batch):
+        """Send one batch; returns "sent", "retry" or "rejected"."""
+        try:
+            result = self.client.bulk_add_measurements_gzip(batch.body)
+        except ApiError as e:
+            if e.status_code in RETRY_STATUS_CODES:
+                logger.warning("Upstream answered %s, will retry batch %s", e.status_code, batch.seq)
+                return "retry"
+            logger.error("Upstream rejected batch %s: %s %s", batch.seq, e.status_code, e.message)
+            return "rejected"
+        except requests.RequestException as e:
+            logger.warning("Upstream unreachable (%s), will retry batch %s", e, batch.seq)
+            return "retry"
+        for key in ("accepted", "duplicates", "rejected"):
+            self.stats[key] += result.get(key, 0)
+        self.stats["sent_batches"] += 1
+        self.stats["sent_rows"] += batch.rows
+        return "sent"
+
+    def _send_next(self):
+        """Deliver the oldest batch once; returns its outcome, or None when idle."""
+        with self._order:
+            batch = self.spill.peek()
+        from_disk = batch is not None
+        if not from_disk:
+            try:
+                batch = self._pending.get(timeout=0.1)
+            except queue.Empty:
+                return None
+
+        outcome = self._post(batch)
+        with self._order:
+            if outcome == "retry":
+                self.stats["upstream_failures"] += 1
+                if not from_disk:
+                    # Park it, and everything queued behind it, on disk in order
+                    self.spill.push(batch, force=True)
+                    self.stats["spilled_batches"] += 1
+                    self._spill_pending()
+            elif from_disk:
+                if outcome == "sent":
+                    self.spill.remove(batch.seq)
+                    self.stats["replayed_batches"] += 1
+                else:
+                    self.spill.reject(batch.seq)
+            elif outcome == "rejected":
+                self.spill.push(batch, force=True)
+                self.spill.reject(batch.seq)
+            if outcome == "rejected":
+                self.stats["rejected_batches"] += 1
+            self._order.notify_all()
+        return outcome
+
+    def _send_loop(self):
+        delay = RETRY_MIN_DELAY
+        while not self._stopping.is_set():
+            if self._send_next() == "retry":
+                self._stopping.wait(delay)
+                delay = min(delay * 2, RETRY_MAX_DELAY)
+            else:
+                delay = RETRY_MIN_DELAY
+
+    def _flush_loop(self):
+        tick = min(self.flush_interval / 4, 0.25)
+        while not self._stopping.wait(tick):
+            self.flush(self.flush_interval)
+
+    # Lifecycle
+
+    def start(self):
+        for target, name in ((self._send_loop, "edge-sender"), (self._flush_loop, "edge-flusher")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, drain_timeout=5.0):
+        """Flush all buffers, try to deliver for up to drain_timeout seconds, spill the rest."""
+        self.flush()
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        deadline = time.monotonic() + drain_timeout
+        while time.monotonic() < deadline and (len(self.spill) or not self._pending.empty()):
+            if self._send_next() == "retry":
+                break
+        with self._order:
+            # Whatever is left is replayed on the next start
+            self._spill_pending()
+
+    def feature_summary(self):
+        """Per vest: sensors seen, total peaks and the highest peak, for the stats log."""
+        summary = {}
+        for (vest_id, _), metrics in self.features.snapshot().items():
+            vest = summary.setdefault(vest_id, {"sensors": 0, "peaks": 0, "highest_peak": None})
+            vest["sensors"] += 1
+            vest["peaks"] += metrics["peaks"] or 0
+            if metrics["highest_peak"] is not None:
+                vest["highest_peak"] = max(vest["highest_peak"] or metrics["highest_peak"], metrics["highest_peak"])
+        return summary
+
+    def pending(self):
+        """Batches not delivered yet, in memory and on disk."""
+        return {"memory": self._pending.qsize(), "disk": len(self.spill), "disk_bytes": self.spill.bytes}
+
+
+class _DatagramHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data = self.request[0]
+        try:
+            readings = parse_datagram(data)
+        except (UnicodeDecodeError, ValueError):
+            with self.server.gateway._buffer_lock:
+                self.server.gateway.stats["invalid"] += 1
+            return
+        self.server.gateway.submit(readings)
+
+
+class UDPGatewayServer(socketserver.UDPServer):
+    # Largest datagram read; the UDP maximum
+    max_packet_size = 65535
+
+    def __init__(self, address, gateway):
+        self.gateway = gateway
+        super().__init__(address, _DatagramHandler)
+
+
+class UnixGatewayServer(socketserver.UnixDatagramServer):
+    max_packet_size = 65535
+
+    def __init__(self, path, gateway):
+        self.gateway = gateway
+        if os.path.exists(path):
+            os.remove(path)
+        super().__init__(path, _DatagramHandler)
+
+
+def serve(server):
+    """Run a gateway server on a background thread and return it."""
+    threading.Thread(target=server.serve_forever, name="edge-receiver", daemon=True).start()
+    return server
+
+
+def _positive_seconds(text):
+    seconds = float(text)
+    if not seconds > 0:
+        raise argparse.ArgumentTypeError(f"must be positive: {text}")
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--upstream", required=True, help="API base URL, e.g. http://localhost:8000")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="UDP port")
+    parser.add_argument("--unix-socket", help="also listen on this Unix datagram socket")
+    parser.add_argument("--spill-dir", default=SPILL_DIR)
+    parser.add_argument("--batch-rows", type=int, default=BATCH_MAX_ROWS)
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL)
+    parser.add_argument("--features", action="store_true", help="keep rolling metrics and peak counts per sensor")
+    parser.add_argument("--feature-window", type=_positive_seconds, default=5.0, help="rolling window in seconds")
+    parser.add_argument("--peak-threshold", type=float, help="value a reading must reach to count as a peak")
+    parser.add_argument("--peak-hysteresis", type=float, default=0.0,
+                        help="how far below the threshold a peak must fall to end")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    gateway = EdgeGateway(
+        args.upstream,
+        spill_dir=args.spill_dir,
+        batch_max_rows=args.batch_rows,
+        flush_interval=args.flush_interval,
+        features=FeatureEngine(
+            window=args.feature_window, threshold=args.peak_threshold, hysteresis=args.peak_hysteresis
+        ) if args.features else None,
+    ).start()
+    servers = [serve(UDPGatewayServer((args.host, args.port), gateway))]
+    if args.unix_socket:
+        servers.append(serve(UnixGatewayServer(args.unix_socket, gateway)))
+    logger.info("Forwarding readings from udp://%s:%s to %s", args.host, args.port, args.upstream)
+    if len(gateway.spill):
+        logger.info("Replaying %s spilled batches", len(gateway.spill))
+    try:
+        while True:
+            time.sleep(60)
+            logger.info("stats %s pending %s", gateway.stats, gateway.pending())
+            if gateway.features is not None:
+                logger.info("features %s", gateway.feature_summary())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+        gateway.stop()
+
+
+if __name__ == "__main__":
+    main()
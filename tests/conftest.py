@@ -0,0 +1,86 @@
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import NamedTuple
+from urllib.parse import quote
+
+import pytest
+
+# Tests that need Postgres run against TEST_DATABASE_URL and are skipped
+# without it.  Each test gets a fresh schema that is dropped afterwards.
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+SCHEMA_SQL = Path(__file__).resolve().parent.parent.joinpath("data", "database_setup.sql").read_text()
+
+
+@pytest.fixture
+def database_url():
+    """URL of an empty copy of the schema, with search_path pointing at it."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    import psycopg2
+
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    admin = psycopg2.connect(TEST_DATABASE_URL)
+    admin.autocommit = True
+    with admin.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {schema}")
+        cur.execute(f"SET search_path TO {schema}")
+        cur.execute(SCHEMA_SQL)
+    separator = "&" if "?" in TEST_DATABASE_URL else "?"
+    yield f"{TEST_DATABASE_URL}{separator}options={quote(f'-csearch_path={schema}')}"
+    with admin.cursor() as cur:
+        cur.execute(f"DROP SCHEMA {schema} CASCADE")
+    admin.close()
+
+
+@pytest.fixture
+def db_pool(database_url, monkeypatch):
+    """A small connection pool on the test schema, installed as the process pool."""
+    from utils import db_connector
+
+    pool = db_connector.ConnectionPool(database_url, max_size=4, timeout=2)
+    monkeypatch.setattr(db_connector, "_pool", pool)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def lambda_db(db_pool):
+    """backend.lambda_function wired to the test schema."""
+    from backend import lambda_function
+
+    return lambda_function
+
+
+class LambdaResponse(NamedTuple):
+    status: int
+    body: object
+    headers: dict
+
+
+def _invoke(handler, method, path, query=None, body=None, headers=None):
+    event = {
+        "httpMethod": method,
+        "path": path,
+        "queryStringParameters": query,
+        "headers": headers,
+        "body": None if body is None else json.dumps(body),
+    }
+    result = handler.lambda_handler(event, None)
+    response_headers = result.get("headers") or {}
+    content = result["body"]
+    if content and response_headers.get("Content-Type", "").startswith("application/json"):
+        content = json.loads(content)
+    return LambdaResponse(result["statusCode"], content, response_headers)
+
+
+@pytest.fixture
+def invoke():
+    """invoke(handler, method, path, query=None, body=None, headers=None), as API Gateway calls handler.
+
+    Returns (status, body, headers); JSON bodies are decoded, others (CSV,
+    base64 Arrow or Parquet, an empty 304) are returned as sent.
+    """
+    return _invoke
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from frontend.dashboard import choose_bucket
+
+
+@pytest.fixture
+def readings(lambda_db, invoke):
+    """Two sensors with readings every 13 s over the last 40 minutes, not aligned to any bucket."""
+    vest = invoke(lambda_db, "POST", "/vests", body={"name": "Aggregate test vest"}).body
+    sensor_ids = [
+        invoke(lambda_db, "POST", "/sensors",
+               body={"vest_id": vest["vest_id"], "sensor_type_id": 1, "position": position}).body["sensor_id"]
+        for position in ("chest", "back")
+    ]
+    start = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(minutes=40, seconds=7)
+    rows = [
+        {"sensor_id": sensor_id, "timestamp": (start + timedelta(seconds=13 * i)).isoformat(),
+         "value": float((i * 7 + k) % 23)}
+        for k, sensor_id in enumerate(sensor_ids) for i in range(180)
+    ]
+    invoke(lambda_db, "POST", "/measurements/bulk", body={"measurements": rows})
+    return vest["vest_id"], rows
+
+
+def expected_buckets(rows, size):
+    # Buckets start at multiples of their size since the epoch, in UTC
+    buckets = {}
+    for row in rows:
+        epoch = datetime.fromisoformat(row["timestamp"]).timestamp()
+        buckets.setdefault((row["sensor_id"], epoch // size * size), []).append(row["value"])
+    return buckets
+
+
+@pytest.mark.parametrize("bucket, size", [("45s", 45), ("1m", 60), ("5m", 300), ("1h", 3600)])
+def test_buckets_are_epoch_floored(lambda_db, invoke, readings, bucket, size):
+    vest_id, rows = readings
+    result = invoke(lambda_db, "GET", f"/vests/{vest_id}/measurements/aggregate",
+                    query={"bucket": bucket, "seconds": "7200", "agg": "mean,min,max,count"})
+    assert result.status == 200
+    expected = expected_buckets(rows, size)
+    assert len(result.body) == len(expected)
+    for row in result.body:
+        values = expected[(row["sensor_id"], datetime.fromisoformat(row["bucket"]).timestamp())]
+        assert row["count"] == len(values)
+        assert row["mean"] == pytest.approx(sum(values) / len(values))
+        assert (row["min"], row["max"]) == (min(values), max(values))
+    # Rows come per sensor, oldest bucket first
+    keys = [(row["sensor_id"], row["bucket"]) for row in result.body]
+    assert keys == sorted(keys)
+
+
+def test_seconds_bounds_the_range(lambda_db, invoke, readings):
+    vest_id, rows = readings
+    since = datetime.now(timezone.utc) - timedelta(seconds=600)
+    result = invoke(lambda_db, "GET", f"/vests/{vest_id}/measurements/aggregate",
+                    query={"bucket": "1m", "seconds": "600", "agg": "count"})
+    inside = sum(datetime.fromisoformat(row["timestamp"]) >= since for row in rows)
+    # Minute buckets come from the rollup, which filters on the bucket start:
+    # the edge may differ by up to a minute, five readings per sensor
+    assert inside - 10 <= sum(row["count"] for row in result.body) <= inside + 10 < len(rows)
+    assert set(result.body[0]) == {"sensor_id", "position", "sensor_type", "bucket", "count"}
+
+
+@pytest.mark.parametrize("query", [
+    {"bucket": "0m"}, {"bucket": "5"}, {"bucket": "1w"}, {"agg": "median"}, {"agg": ""},
+])
+def test_bad_buckets_and_aggregates_are_refused(lambda_db, invoke, readings, query):
+    vest_id, _ = readings
+    assert invoke(lambda_db, "GET", f"/vests/{vest_id}/measurements/aggregate", query=query).status == 400
+
+
+@pytest.mark.parametrize("range_seconds, expected", [
+    (600, "1s"), (3600, "10s"), (6 * 3600, "1m"), (7 * 86400, "1h"), (400 * 86400, "1d"),
+])
+def test_choose_bucket_keeps_charts_near_the_target(range_seconds, expected):
+    buckets = {"1s": 1, "10s": 10, "1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+    assert choose_bucket(range_seconds, buckets, 600) == expected
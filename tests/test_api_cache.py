@@ -0,0 +1,53 @@
+import time
+
+from utils.api_cache import ApiCache
+
+
+def test_entries_expire_after_their_endpoint_ttl():
+    cache = ApiCache(10, {"measurements": 0.05}, default_ttl=60)
+    cache.set(("measurements", 1, 0), "rows")
+    cache.set(("vest", 1), "vest")
+    assert cache.get(("measurements", 1, 0)) == "rows"
+    time.sleep(0.1)
+    assert cache.get(("measurements", 1, 0)) is None
+    # Endpoints without their own TTL use the default
+    assert cache.get(("vest", 1)) == "vest"
+
+
+def test_least_recently_used_entry_is_evicted_at_max_entries():
+    cache = ApiCache(2, {})
+    cache.set(("vest", 1), "one")
+    cache.set(("vest", 2), "two")
+    cache.get(("vest", 1))
+    cache.set(("vest", 3), "three")
+    assert cache.get(("vest", 2)) is None
+    assert cache.get(("vest", 1)) == "one"
+    assert cache.get(("vest", 3)) == "three"
+    assert cache.stats()["entries"] == 2
+
+
+def test_invalidate_vest_drops_only_that_vests_keys():
+    cache = ApiCache(10, {})
+    cache.set(("vest", 1), "vest 1")
+    cache.set(("sensors", 1), "sensors 1")
+    cache.set(("measurements", 1, 500), "rows 1")
+    cache.set(("vest", 2), "vest 2")
+    cache.set(("vests",), "all vests")
+    cache.invalidate_vest("1")
+    assert cache.get(("vest", 1)) is None
+    assert cache.get(("sensors", 1)) is None
+    assert cache.get(("measurements", 1, 500)) is None
+    assert cache.get(("vest", 2)) == "vest 2"
+    assert cache.get(("vests",)) == "all vests"
+
+
+def test_stats_count_hits_and_misses():
+    cache = ApiCache(10, {})
+    assert cache.stats()["hit_rate"] == 0.0
+    cache.set(("vest", 1), "vest")
+    cache.get(("vest", 1))
+    cache.get(("vest", 1))
+    cache.get(("vest", 2))
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"], stats["max_entries"]) == (2, 1, 1, 10)
+    assert stats["hit_rate"] == 2 / 3
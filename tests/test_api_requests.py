@@ -0,0 +1,76 @@
+import json
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from utils.api_requests import ApiError, SensorVestClient
+
+
+class ScriptedAdapter(BaseAdapter):
+    """Transport that answers each request with the next scripted status or exception."""
+
+    def __init__(self, script):
+        super().__init__()
+        self.script = list(script)
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request.method)
+        outcome = self.script.pop(0) if self.script else 200
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        response._content = json.dumps({"vest_id": 1} if outcome < 400 else {"error": "failed"}).encode()
+        response.headers["Content-Type"] = "application/json"
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+def scripted_client(script, max_retries=3):
+    client = SensorVestClient("http://vests.test", max_retries=max_retries)
+    adapter = ScriptedAdapter(script)
+    client.session.mount("http://", adapter)
+    return client, adapter
+
+
+@pytest.mark.parametrize("failure", [503, 502, 504, requests.ConnectionError("refused"), requests.ReadTimeout()])
+def test_gets_are_retried_on_gateway_errors_and_connection_failures(failure):
+    client, adapter = scripted_client([failure, failure])
+    assert client.get_vest(1) == {"vest_id": 1}
+    assert adapter.requests == ["GET"] * 3
+
+
+def test_gets_are_not_retried_on_other_errors():
+    client, adapter = scripted_client([500])
+    with pytest.raises(ApiError) as error:
+        client.get_vest(1)
+    assert error.value.status_code == 500
+    assert adapter.requests == ["GET"]
+
+
+def test_retries_stop_after_max_retries_attempts():
+    client, adapter = scripted_client([503] * 5, max_retries=2)
+    with pytest.raises(ApiError) as error:
+        client.get_vest(1)
+    assert error.value.status_code == 503
+    assert adapter.requests == ["GET"] * 2
+
+
+@pytest.mark.parametrize("failure", [503, requests.ConnectionError("reset"), requests.ReadTimeout()])
+def test_posts_are_not_retried(failure):
+    client, adapter = scripted_client([failure])
+    with pytest.raises((ApiError, requests.RequestException)):
+        client.create_vest("Retry vest")
+    assert adapter.requests == ["POST"]
+
+
+def test_posts_are_retried_when_the_connection_was_never_opened():
+    client, adapter = scripted_client([requests.ConnectTimeout()])
+    assert client.create_vest("Retry vest") == {"vest_id": 1}
+    assert adapter.requests == ["POST"] * 2
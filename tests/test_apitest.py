@@ -0,0 +1,45 @@
+import json
+
+import apitest
+
+
+def test_latency_recorder_summary():
+    recorder = apitest.LatencyRecorder()
+    for millis in range(1, 101):
+        recorder.latencies["GET /vests"].append(millis / 1000)
+
+    def fail():
+        raise apitest.ApiError(500, "boom")
+
+    assert recorder.call("POST /measurements", fail) is None
+    summary = recorder.summary(duration=10)
+
+    assert summary["GET /vests"]["requests"] == 100
+    assert summary["GET /vests"]["requests_per_second"] == 10
+    assert summary["GET /vests"]["p50_ms"] == 50.5
+    assert summary["GET /vests"]["p99_ms"] == 99.01
+    assert summary["GET /vests"]["max_ms"] == 100
+    assert summary["POST /measurements"]["errors"] == 1
+
+
+def test_load_test_against_local_server(db_pool):
+    from backend.local_server import start_server
+
+    server = start_server()
+    try:
+        results = apitest.run_load_test(
+            f"http://127.0.0.1:{server.server_port}",
+            vests=2, sensors=3, rate=20, readers=2, duration=1.25,
+            batch_interval=0.5, think_time=0.1, write="bulk",
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # Two batches of 10 samples for each of the 6 sensors, plus the first sample
+    assert results["rows_written"] >= 6 * 20
+    endpoints = results["endpoints"]
+    assert endpoints["POST /measurements/bulk"]["requests"] == 2 * 2
+    assert "GET /vests/{vest_id}/measurements/recent" in endpoints
+    assert all(stats["errors"] == 0 for stats in endpoints.values())
+    json.dumps(results)
@@ -0,0 +1,31 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("streamlit.testing.v1")
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def run_page(page):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_app_startup", "--child", page, "--reruns", "1"],
+        cwd=ROOT, capture_output=True, text=True, check=True, timeout=120,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_login_page_imports_no_heavy_modules():
+    result = run_page("login")
+    assert result["exceptions"] == []
+    assert result["imported"] == []
+
+
+def test_home_page_does_not_import_charts():
+    result = run_page("home")
+    assert result["exceptions"] == []
+    assert "frontend.charts" not in result["imported"]
+    assert "plotly.subplots" not in result["imported"]
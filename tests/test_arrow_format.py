@@ -0,0 +1,102 @@
+import base64
+import json
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from backend import lambda_function
+from frontend.dashboard import format_aggregate_data, format_measurements_data
+from utils.api_requests import _as_frame
+
+COLUMNS = ["measurement_id", "sensor_id", "vest_id", "timestamp", "value",
+           "additional_data", "position", "sensor_type"]
+
+
+def make_rows(count):
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "measurement_id": i + 1,
+            "sensor_id": i % 3 + 1,
+            "vest_id": 1,
+            "timestamp": start + timedelta(milliseconds=20 * i),
+            "value": Decimal(i) / 4,
+            "additional_data": None,
+            "position": ["chest", "left_elbow", "back"][i % 3],
+            "sensor_type": ["IMU", "FlexSensor", "StretchSensor"][i % 3],
+        }
+        for i in range(count)
+    ]
+
+
+def decode(response):
+    assert response["isBase64Encoded"]
+    assert response["headers"]["Content-Type"] == lambda_function.ARROW_STREAM_TYPE
+    return pa.ipc.open_stream(base64.b64decode(response["body"])).read_all()
+
+
+def test_arrow_response_is_typed_and_dictionary_encoded():
+    table = decode(lambda_function._arrow_response(200, make_rows(30), COLUMNS))
+    assert table.num_rows == 30
+    assert table.schema.field("timestamp").type == pa.timestamp("us", tz="UTC")
+    assert table.schema.field("value").type == pa.float64()
+    assert pa.types.is_dictionary(table.schema.field("position").type)
+    assert pa.types.is_dictionary(table.schema.field("sensor_type").type)
+    assert len(table.column("position").chunk(0).dictionary) == 3
+
+
+def test_empty_arrow_response_keeps_columns():
+    table = decode(lambda_function._arrow_response(200, [], COLUMNS))
+    assert table.num_rows == 0
+    assert table.column_names == COLUMNS
+
+
+def test_arrow_and_json_build_the_same_plotting_frame():
+    rows = make_rows(300)
+    via_json = format_measurements_data(
+        json.loads(lambda_function._response(200, rows)["body"])
+    )
+    via_arrow = format_measurements_data(
+        _as_frame(decode(lambda_function._arrow_response(200, rows, COLUMNS)))
+    )
+    pd.testing.assert_frame_equal(via_arrow, via_json, check_categorical=False)
+
+
+def test_aggregate_frame_from_arrow():
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    rows = [
+        {"sensor_id": 1, "position": "chest", "sensor_type": "IMU",
+         "bucket": start + timedelta(minutes=i), "mean": Decimal("1.5"), "min": Decimal(1), "max": Decimal(2)}
+        for i in range(5)
+    ]
+    columns = ["sensor_id", "position", "sensor_type", "bucket", "mean", "min", "max"]
+    df = format_aggregate_data(_as_frame(decode(lambda_function._arrow_response(200, rows, columns))))
+    assert df["bucket"].dt.tz is None
+    assert df["mean"].tolist() == [1.5] * 5
+
+
+def test_measurement_routes_negotiate_arrow(lambda_db):
+    event = {
+        "httpMethod": "GET",
+        "path": "/vests/1/measurements/recent",
+        "queryStringParameters": {"seconds": "60"},
+        "headers": {"Accept": lambda_function.ARROW_STREAM_TYPE},
+    }
+    table = decode(lambda_db.lambda_handler(event, None))
+    assert table.column_names == COLUMNS
+
+    event["headers"] = {}
+    response = lambda_db.lambda_handler(event, None)
+    assert response["headers"]["Content-Type"] == "application/json"
+    assert json.loads(response["body"]) == []
+
+
+@pytest.mark.parametrize("path", ["/vests", "/vests/1/sensors"])
+def test_other_routes_ignore_arrow_accept(lambda_db, path):
+    event = {"httpMethod": "GET", "path": path,
+             "headers": {"accept": lambda_function.ARROW_STREAM_TYPE}}
+    response = lambda_db.lambda_handler(event, None)
+    assert response["headers"]["Content-Type"] == "application/json"
@@ -0,0 +1,191 @@
+import base64
+import gzip
+import json
+import math
+import threading
+from datetime import datetime, timedelta, timezone
+
+import psycopg2.extras
+import pytest
+
+from utils import db_connector
+
+
+@pytest.fixture
+def vest(lambda_db, invoke):
+    vest = invoke(lambda_db, "POST", "/vests", body={"name": "Bulk test vest"}).body
+    sensors = [
+        invoke(lambda_db, "POST", "/sensors", body={
+            "vest_id": vest["vest_id"], "sensor_type_id": type_id, "position": position,
+        }).body
+        for type_id, position in [(1, "chest"), (2, "left_elbow"), (3, "back")]
+    ]
+    return vest["vest_id"], [s["sensor_id"] for s in sensors]
+
+
+def make_rows(sensor_ids, count, start=datetime(2025, 3, 1, tzinfo=timezone.utc)):
+    return [
+        {
+            "sensor_id": sensor_ids[i % len(sensor_ids)],
+            "timestamp": (start + timedelta(milliseconds=10 * i)).isoformat(),
+            "value": i * 0.5,
+        }
+        for i in range(count)
+    ]
+
+
+def test_bulk_insert_counts(lambda_db, vest, invoke):
+    vest_id, sensor_ids = vest
+    rows = make_rows(sensor_ids, 6000)
+    status, result, _ = invoke(lambda_db, "POST", "/measurements/bulk", body={"measurements": rows})
+    assert status == 200
+    assert result == {"received": 6000, "accepted": 6000, "duplicates": 0,
+                      "rejected": 0, "rejected_sensor_ids": []}
+
+    with db_connector.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*), MIN(vest_id), MAX(vest_id) FROM measurements")
+        assert cur.fetchone() == (6000, vest_id, vest_id)
+
+
+def test_resending_a_batch_only_reports_duplicates(lambda_db, vest, invoke):
+    _, sensor_ids = vest
+    rows = make_rows(sensor_ids, 500)
+    invoke(lambda_db, "POST", "/measurements/bulk", body={"measurements": rows[:200]})
+    status, result, _ = invoke(lambda_db, "POST", "/measurements/bulk", body={"measurements": rows})
+    assert status == 200
+    assert (result["accepted"], result["duplicates"]) == (300, 200)
+
+
+def test_duplicates_within_a_batch_keep_the_first_row(lambda_db, vest, invoke):
+    _, sensor_ids = vest
+    row = make_rows(sensor_ids, 1)[0]
+    _, result, _ = invoke(lambda_db, "POST", "/measurements/bulk",
+                          body={"measurements": [row, dict(row, value=99)]})
+    assert (result["accepted"], result["duplicates"]) == (1, 1)
+
+
+def test_unknown_sensors_are_rejected_not_fatal(lambda_db, vest, invoke):
+    _, sensor_ids = vest
+    rows = make_rows(sensor_ids, 10) + make_rows([424242], 2)
+    status, result, _ = invoke(lambda_db, "POST", "/measurements/bulk", body={"measurements": rows})
+    assert status == 200
+    assert (result["accepted"], result["rejected"]) == (10, 2)
+    assert result["rejected_sensor_ids"] == [424242]
+
+
+@pytest.mark.parametrize("bad", [
+    {"timestamp": "garbage"}, {"timestamp": 1742916600}, {"value": float("nan")}, {"value": float("-inf")},
+])
+def test_unstorable_rows_are_rejected_not_fatal(lambda_db, vest, invoke, bad):
+    _, sensor_ids = vest
+    rows = make_rows(sensor_ids, 3)
+    rows[1].update(bad)
+    status, result, _ = invoke(lambda_db, "POST", "/measurements/bulk", body={"measurements": rows})
+    assert status == 200
+    assert (result["received"], result["accepted"], result["rejected"]) == (3, 2, 1)
+    assert result["rejected_sensor_ids"] == []
+
+    # The rollups stay finite, so aggregates are still valid JSON
+    with db_connector.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT count, sum, min, max FROM measurements_1m")
+        rollups = cur.fetchall()
+    assert sum(count for count, *_ in rollups) == 2
+    assert all(math.isfinite(stat) for _, *stats in rollups for stat in stats)
+
+
+def test_timestamps_without_an_offset_are_utc(lambda_db, vest, invoke):
+    _, sensor_ids = vest
+    invoke(lambda_db, "POST", "/measurements/bulk",
+           body={"measurements": [{"sensor_id": sensor_ids[0], "value": 1.0, "timestamp": "2025-03-01T12:00:00"}]})
+    with db_connector.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT timestamp FROM measurements")
+        assert cur.fetchone()[0] == datetime(2025, 3, 1, 12, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("bad", [{"value": float("nan")}, {"value": "Infinity"}, {"timestamp": "garbage"}])
+def test_single_rows_must_be_finite_and_timed(lambda_db, vest, invoke, bad):
+    _, sensor_ids = vest
+    good = {"sensor_id": sensor_ids[0], "value": 2.0, "timestamp": "2025-03-01T00:00:00Z"}
+    result = invoke(lambda_db, "POST", "/measurements", body=[good, {"sensor_id": sensor_ids[0], "value": 1.0, **bad}])
+    assert result.status == 400
+    with db_connector.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM measurements")
+        assert cur.fetchone() == (0,)
+
+
+def test_rows_without_timestamp_do_not_collide(lambda_db, vest, invoke):
+    _, sensor_ids = vest
+    rows = [{"sensor_id": sensor_ids[0], "value": v} for v in range(50)]
+    _, result, _ = invoke(lambda_db, "POST", "/measurements/bulk", body={"measurements": rows})
+    assert result["accepted"] == 50
+
+
+def test_writes_to_a_vest_become_visible_in_id_order(lambda_db, vest, database_url, invoke):
+    _, sensor_ids = vest
+    first = make_rows(sensor_ids, 10)
+    # A different hour, so the two batches do not meet on the same rollup rows
+    second = make_rows(sensor_ids, 10, start=datetime(2025, 3, 1, 2, tzinfo=timezone.utc))
+    # An open transaction holds the first batch's ids but has not committed them
+    writer = db_connector.connect(database_url)
+    try:
+        with writer.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            lambda_db.add_measurements_bulk(cur, {}, {"measurements": first})
+        later = threading.Thread(target=invoke, args=(lambda_db, "POST", "/measurements/bulk"),
+                                 kwargs={"body": {"measurements": second}})
+        later.start()
+        later.join(0.5)
+        # The second batch waits instead of committing larger ids ahead of the first
+        assert later.is_alive()
+        writer.commit()
+    finally:
+        writer.close()
+    later.join(5)
+
+    with db_connector.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT timestamp FROM measurements ORDER BY measurement_id")
+        order = [ts.isoformat() for ts, in cur.fetchall()]
+    assert sorted(order[:10]) == [row["timestamp"] for row in first]
+    assert sorted(order[10:]) == [row["timestamp"] for row in second]
+
+
+@pytest.mark.parametrize("body", [
+    [{"sensor_id": 1, "value": 1.0}],
+    {"measurements": [{"sensor_id": "1", "value": 1.0}]},
+    {"measurements": [{"sensor_id": 1, "value": "high"}]},
+])
+def test_malformed_batches_fail_whole(lambda_db, vest, body, invoke):
+    status, _, _ = invoke(lambda_db, "POST", "/measurements/bulk", body=body)
+    assert status == 400
+    with db_connector.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM measurements")
+        assert cur.fetchone() == (0,)
+
+
+def invoke_gzip(lambda_function, payload):
+    # As API Gateway delivers a binary body: base64-encoded, with the request headers
+    event = {
+        "httpMethod": "POST",
+        "path": "/measurements/bulk",
+        "headers": {"content-encoding": "gzip", "Content-Type": "application/json"},
+        "body": base64.b64encode(payload).decode("ascii"),
+        "isBase64Encoded": True,
+    }
+    result = lambda_function.lambda_handler(event, None)
+    return result["statusCode"], json.loads(result["body"])
+
+
+def test_gzip_bodies_are_accepted(lambda_db, vest):
+    _, sensor_ids = vest
+    rows = make_rows(sensor_ids, 300)
+    status, result = invoke_gzip(lambda_db, gzip.compress(json.dumps({"measurements": rows}).encode()))
+    assert status == 200
+    assert result["accepted"] == 300
+
+
+def test_bad_or_oversized_gzip_bodies_are_refused(lambda_db, vest, monkeypatch):
+    status, result = invoke_gzip(lambda_db, b"not gzip at all")
+    assert (status, result["error"]) == (400, "Request body is not valid gzip")
+
+    monkeypatch.setattr(lambda_db, "MAX_DECOMPRESSED_BODY_BYTES", 1000)
+    status, _ = invoke_gzip(lambda_db, gzip.compress(b" " * 5000))
+    assert status == 413
@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from utils import db_connector
+from utils.calibration import (
+    IDENTITY,
+    CalibrationCache,
+    CalibrationError,
+    LinearCalibration,
+    PiecewiseCalibration,
+    PolynomialCalibration,
+    apply_calibrations,
+    calibration_sql,
+    parse_calibration,
+)
+
+PIECEWISE = {"type": "piecewise", "points": [[0, 0], [10, 12.5], [20, 31]]}
+POLYNOMIAL = {"type": "polynomial", "coefficients": [1.0, 0.5, 0.25]}
+
+
+def test_parse_shapes():
+    assert parse_calibration(None) is IDENTITY
+    assert parse_calibration("{}") is IDENTITY
+    assert parse_calibration('{"offset": 0.5, "scale": 1.2}') == LinearCalibration(1.2, 0.5)
+    assert parse_calibration({"offset": 0.5, "multiplier": 1.2}) == LinearCalibration(1.2, 0.5)
+    assert parse_calibration(POLYNOMIAL) == PolynomialCalibration([1.0, 0.5, 0.25])
+    assert parse_calibration(PIECEWISE) == PiecewiseCalibration([0, 10, 20], [0, 12.5, 31])
+
+
+@pytest.mark.parametrize("blob", [
+    "not json",
+    "[1, 2]",
+    {"scale": "2"},
+    {"scale": float("nan")},
+    {"scale": 1, "multiplier": 2},
+    {"type": "polynomial", "coefficients": []},
+    {"type": "piecewise", "points": [[0, 0]]},
+    {"type": "piecewise", "points": [[0, 0], [0, 1]]},
+    {"type": "spline"},
+])
+def test_invalid_blobs_are_rejected(blob):
+    with pytest.raises(CalibrationError):
+        parse_calibration(blob)
+
+
+def test_apply_matches_the_curves():
+    values = np.array([-5.0, 0.0, 4.0, 10.0, 15.0, 25.0])
+    assert np.allclose(parse_calibration({"offset": 0.5, "scale": 1.2}).apply(values), values * 1.2 + 0.5)
+    assert np.allclose(parse_calibration(POLYNOMIAL).apply(values), 1.0 + 0.5 * values + 0.25 * values ** 2)
+    assert np.allclose(parse_calibration(PIECEWISE).apply(values), [0, 0, 5, 12.5, 21.75, 31])
+
+
+def test_apply_calibrations_uses_each_sensors_curve():
+    sensor_ids = np.array([1, 2, 3, 1, 2, 3])
+    values = np.arange(6, dtype="float64")
+    calibrations = {1: LinearCalibration(2.0, 0.0), 2: PolynomialCalibration([0.0, 0.0, 1.0])}
+    result = apply_calibrations(sensor_ids, values, calibrations)
+    assert result.tolist() == [0.0, 1.0, 2.0, 6.0, 16.0, 5.0]
+    assert values.tolist() == [0, 1, 2, 3, 4, 5]
+
+
+def test_cache_parses_again_only_when_the_blob_changes():
+    cache = CalibrationCache()
+    first = cache.get(1, '{"scale": 2}')
+    assert cache.get(1, '{"scale": 2}') is first
+    assert cache.get(1, '{"scale": 3}') == LinearCalibration(3.0, 0.0)
+    assert cache.get(2, "broken") is IDENTITY
+    assert 2 in cache.errors
+    cache.get(2, None)
+    assert 2 not in cache.errors
+
+
+def test_identity_sensors_are_left_out_of_sql():
+    assert calibration_sql({1: IDENTITY}, "m.value") == "m.value"
+    assert "WHEN 2 THEN" in calibration_sql({1: IDENTITY, 2: LinearCalibration(2.0, 1.0)}, "m.value")
+
+
+# Backend: the calibrated query parameter
+
+@pytest.fixture
+def calibrated_vest(lambda_db, invoke):
+    vest = invoke(lambda_db, "POST", "/vests", body={"name": "Calibration test vest"}).body
+    blobs = [None, {"offset": 3.0, "scale": -2.0}, POLYNOMIAL, PIECEWISE]
+    sensors = {}
+    for position, blob in zip(["chest", "back", "left_elbow", "right_elbow"], blobs):
+        sensor = invoke(lambda_db, "POST", "/sensors", body={
+            "vest_id": vest["vest_id"], "sensor_type_id": 1, "position": position, "calibration_data": blob,
+        }).body
+        sensors[sensor["sensor_id"]] = parse_calibration(blob)
+
+    start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+    rows = [
+        {"sensor_id": sensor_id, "timestamp": (start + timedelta(seconds=7 * i)).isoformat(), "value": float(i % 25)}
+        for sensor_id in sensors for i in range(300)
+    ]
+    invoke(lambda_db, "POST", "/measurements/bulk", body={"measurements": rows})
+    return vest["vest_id"], sensors
+
+
+def test_recent_measurements_are_calibrated(lambda_db, calibrated_vest, invoke):
+    vest_id, sensors = calibrated_vest
+    query = {"seconds": "7200", "after_measurement_id": "0", "limit": "10000"}
+    raw = invoke(lambda_db, "GET", f"/vests/{vest_id}/measurements/recent", query=query).body
+    calibrated = invoke(lambda_db, "GET", f"/vests/{vest_id}/measurements/recent",
+                        query=dict(query, calibrated="true")).body
+    assert len(raw) == len(calibrated) == 1200
+    expected = apply_calibrations([r["sensor_id"] for r in raw], [r["value"] for r in raw], sensors)
+    assert [r["value"] for r in calibrated] == pytest.approx(expected.tolist())
+
+
+@pytest.mark.parametrize("bucket", ["30s", "1m"])
+def test_aggregates_calibrate_rows_before_reducing(lambda_db, calibrated_vest, invoke, bucket):
+    vest_id, sensors = calibrated_vest
+    raw = invoke(lambda_db, "GET", f"/vests/{vest_id}/measurements/recent",
+                 query={"seconds": "7200", "after_measurement_id": "0", "limit": "10000", "calibrated": "true"}).body
+    buckets = invoke(lambda_db, "GET", f"/vests/{vest_id}/measurements/aggregate",
+                     query={"bucket": bucket, "seconds": "7200", "calibrated": "true",
+                            "agg": "mean,min,max,count"}).body
+
+    size = {"30s": 30, "1m": 60}[bucket]
+    expected = {}
+    for row in raw:
+        epoch = datetime.fromisoformat(row["timestamp"]).timestamp()
+        expected.setdefault((row["sensor_id"], epoch // size * size), []).append(row["value"])
+    assert len(buckets) == len(expected)
+    for row in buckets:
+        values = expected[(row["sensor_id"], datetime.fromisoformat(row["bucket"]).timestamp())]
+        assert row["count"] == len(values)
+        assert row["mean"] == pytest.approx(np.mean(values))
+        assert (row["min"], row["max"]) == pytest.approx((min(values), max(values)))
+
+
+def test_linear_calibrations_keep_using_rollups(lambda_db, calibrated_vest, invoke, monkeypatch):
+    vest_id, sensors = calibrated_vest
+    statements = []
+    execute = db_connector.execute
+
+    def recording_execute(cur, sql, params=None):
+        statements.append(sql)
+        return execute(cur, sql, params)
+
+    monkeypatch.setattr(db_connector, "execute", recording_execute)
+    query = {"bucket": "1m", "seconds": "7200", "calibrated": "true", "agg": "mean,min,max"}
+    invoke(lambda_db, "GET", f"/vests/{vest_id}/measurements/aggregate", query=query)
+    # Polynomial and piecewise curves cannot be applied to rollup buckets
+    assert not any("measurements_1m" in sql for sql in statements)
+
+    # Changing a sensor's calibration_data is picked up without an explicit invalidate
+    nonlinear = [sensor_id for sensor_id, c in sensors.items() if c.linear is None]
+    with db_connector.connection() as conn, conn, conn.cursor() as cur:
+        cur.execute("UPDATE sensors SET calibration_data = NULL WHERE sensor_id = ANY(%s)", (nonlinear,))
+    statements.clear()
+    buckets = invoke(lambda_db, "GET", f"/vests/{vest_id}/measurements/aggregate", query=query).body
+    assert any("measurements_1m" in sql for sql in statements)
+
+    negative = next(sensor_id for sensor_id, c in sensors.items() if c.linear and c.linear[0] < 0)
+    rows = [row for row in buckets if row["sensor_id"] == negative]
+    assert rows and all(row["min"] <= row["mean"] <= row["max"] for row in rows)
+
+
+def test_invalid_calibration_is_rejected_on_create(lambda_db, invoke):
+    vest = invoke(lambda_db, "POST", "/vests", body={"name": "Bad calibration vest"}).body
+    status, body, _ = invoke(lambda_db, "POST", "/sensors", body={
+        "vest_id": vest["vest_id"], "sensor_type_id": 1, "position": "chest",
+        "calibration_data": {"type": "piecewise", "points": [[1, 0], [0, 1]]},
+    })
+    assert status == 400
+    assert "calibration_data" in body["error"]
@@ -0,0 +1,56 @@
+import plotly.graph_objects as go
+
+from frontend.charts import faceted_figure, sensor_figure
+from frontend.dashboard import format_measurements_data, sensor_panels
+
+
+def measurements(sensor_ids, count):
+    return format_measurements_data([
+        {"sensor_id": sensor_id, "timestamp": f"2025-03-25T15:30:{i:02d}Z", "value": float(i * sensor_id),
+         "position": f"position {sensor_id}", "sensor_type": "IMU"}
+        for i in range(count) for sensor_id in sensor_ids
+    ])
+
+
+def test_sensor_figure_is_one_webgl_trace():
+    df = measurements([1], 30)
+    fig = sensor_figure(df, "Sensor ID: 1")
+    [trace] = fig.data
+    assert isinstance(trace, go.Scattergl) and trace.mode == "lines"
+    assert list(trace.y) == df["value"].tolist()
+    assert fig.layout.title.text == "Sensor ID: 1"
+
+
+def test_sensor_panels_feed_one_trace_per_sensor_with_readings():
+    df = measurements([3, 1, 2], 50)
+    # A sensor of the vest without readings, left as an unused category
+    df["sensor_id"] = df["sensor_id"].cat.add_categories([99])
+    sensors = [{"sensor_id": 1, "sensor_type": "IMU", "position": "chest"},
+               {"sensor_id": 99, "sensor_type": "EMG", "position": "back"}]
+    panels = sensor_panels(df, sensors, point_budget=20)
+
+    assert [(sensor_id, title) for sensor_id, title, _, _ in panels] == [
+        (3, "Unknown Type at Unknown Position"), (1, "IMU at chest"), (2, "Unknown Type at Unknown Position"),
+    ]
+    assert all(total == 50 and 0 < len(plot_data) <= 20 for _, _, plot_data, total in panels)
+    # Each panel keeps only its own sensor's readings, in time order
+    for sensor_id, _, plot_data, _ in panels:
+        assert set(plot_data["sensor_id"]) == {sensor_id}
+        assert plot_data["timestamp"].is_monotonic_increasing
+
+    fig = faceted_figure([(title, plot_data) for _, title, plot_data, _ in panels])
+    assert len(fig.data) == 3
+    assert [len(trace.x) for trace in fig.data] == [len(plot_data) for _, _, plot_data, _ in panels]
+
+
+def test_faceted_figure_has_a_row_per_sensor_on_a_shared_time_axis():
+    df = measurements([1, 2, 3], 20)
+    panels = [(f"Sensor {sensor_id}", group) for sensor_id, group in df.groupby("sensor_id", observed=True)]
+    fig = faceted_figure(panels, row_height=200)
+    assert len(fig.data) == 3
+    assert all(isinstance(trace, go.Scattergl) for trace in fig.data)
+    # Each trace sits on its own row, and every row follows the bottom row's x axis
+    assert [trace.yaxis for trace in fig.data] == ["y", "y2", "y3"]
+    assert fig.layout.xaxis.matches == fig.layout.xaxis2.matches == "x3"
+    assert [annotation.text for annotation in fig.layout.annotations] == ["Sensor 1", "Sensor 2", "Sensor 3"]
+    assert fig.layout.height == 600 and fig.layout.showlegend is False
@@ -0,0 +1,82 @@
+import time
+
+import pandas as pd
+import pytest
+
+from frontend.dashboard import format_measurements_data, parse_timestamps
+
+
+def test_mixed_timestamp_strings_are_parsed_to_naive_utc():
+    raw = pd.Series([
+        "2025-03-25T15:30:00Z",
+        "2025-03-25T17:30:00+02:00",
+        "2025-03-25 15:30:00",
+        "2025-03-25T15:30:00.250-01:00",
+        "2025-03-26",
+    ])
+    parsed = parse_timestamps(raw)
+    assert parsed.dt.tz is None
+    assert parsed.tolist() == [
+        pd.Timestamp("2025-03-25 15:30:00"),
+        pd.Timestamp("2025-03-25 15:30:00"),
+        pd.Timestamp("2025-03-25 15:30:00"),
+        pd.Timestamp("2025-03-25 16:30:00.250"),
+        pd.Timestamp("2025-03-26"),
+    ]
+
+
+def test_uniform_offset_strings_take_the_arrow_path():
+    raw = pd.Series(["2025-03-25T15:30:00+00:00", "2025-03-25T16:30:00+01:00"], index=[5, 9])
+    parsed = parse_timestamps(raw)
+    assert parsed.index.tolist() == [5, 9]
+    assert parsed.tolist() == [pd.Timestamp("2025-03-25 15:30:00")] * 2
+
+
+@pytest.mark.parametrize("tz", ["UTC", None])
+def test_datetime_columns_are_only_converted(tz):
+    raw = pd.Series(pd.to_datetime(["2025-03-25 15:30:00", "2025-03-25 15:30:01"]).tz_localize(tz))
+    parsed = parse_timestamps(raw)
+    assert parsed.dtype == "datetime64[ns]"
+    assert parsed.tolist() == [pd.Timestamp("2025-03-25 15:30:00"), pd.Timestamp("2025-03-25 15:30:01")]
+
+
+def utc_now():
+    return pd.Timestamp.now(tz="UTC").tz_localize(None)
+
+
+@pytest.fixture(params=["UTC", "America/New_York", "Asia/Kolkata"])
+def local_timezone(request, monkeypatch):
+    monkeypatch.setenv("TZ", request.param)
+    time.tzset()
+    yield request.param
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_null_and_unreadable_timestamps_fall_back_to_utc_now(local_timezone):
+    before = utc_now()
+    parsed = parse_timestamps(pd.Series(["2025-03-25T15:30:00Z", None, "not a time"]))
+    assert parsed[0] == pd.Timestamp("2025-03-25 15:30:00")
+    # Naive UTC like the parsed rows, whatever the server's time zone
+    assert before <= parsed[1] <= utc_now()
+    assert before <= parsed[2] <= utc_now()
+
+
+def test_missing_values_and_categories_are_filled():
+    df = format_measurements_data([
+        {"sensor_id": 1, "timestamp": "2025-03-25T15:30:00Z", "value": "12.5", "position": "chest",
+         "sensor_type": "IMU"},
+        {"sensor_id": 2, "timestamp": "2025-03-25T15:30:01Z", "value": "garbage", "position": None,
+         "sensor_type": None},
+        {"sensor_id": 3, "timestamp": "2025-03-25T15:30:02Z", "value": None},
+    ])
+    assert df["value"].tolist() == [12.5, 0.0, 0.0]
+    assert df["value"].dtype == "float64"
+    assert df["position"].tolist() == ["chest", "unknown", "unknown"]
+    assert df["sensor_type"].tolist() == ["IMU", "unknown", "unknown"]
+    assert all(df[column].dtype == "category" for column in ("sensor_id", "position", "sensor_type"))
+
+
+@pytest.mark.parametrize("empty", [None, [], pd.DataFrame()])
+def test_empty_input_gives_an_empty_frame(empty):
+    assert format_measurements_data(empty).empty
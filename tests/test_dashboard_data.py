@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+import streamlit as st
+
+import config
+from frontend.data import DashboardData, fetch_concurrently, remove_stale_exports
+from utils.api_cache import ApiCache
+from utils.api_requests import SensorVestClient
+from utils.perf import PerfRegistry
+
+
+class StandInClient:
+    """Serves /measurements/recent from a list of ids, the way the backend orders them."""
+
+    def __init__(self, ids):
+        self.ids = ids
+        self.calls = []
+
+    def get_recent_measurements(self, vest_id, seconds=None, after_measurement_id=None, limit=None, as_frame=False):
+        self.calls.append({"after_measurement_id": after_measurement_id, "limit": limit})
+        if after_measurement_id is None:
+            ids = sorted(self.ids, reverse=True)[:limit]
+        else:
+            ids = sorted(i for i in self.ids if i > after_measurement_id)[:limit]
+        return pd.DataFrame({"measurement_id": ids, "value": [float(i) for i in ids]})
+
+
+def dashboard_data(client):
+    return DashboardData(client, ApiCache(100, {}), PerfRegistry())
+
+
+def test_first_fetch_seeds_with_the_newest_page_only(monkeypatch):
+    monkeypatch.setattr(config, "MEASUREMENT_PAGE_SIZE", 100)
+    client = StandInClient(list(range(1, 1001)))
+    data = dashboard_data(client)
+
+    rows = data.fetch_new_measurements(1, 0)
+    assert client.calls == [{"after_measurement_id": None, "limit": 100}]
+    assert rows["measurement_id"].tolist() == list(range(901, 1001))
+
+    # Later fetches continue from the newest seeded id
+    client.ids += [1001, 1002]
+    rows = data.fetch_new_measurements(1, 1000)
+    assert client.calls[-1] == {"after_measurement_id": 1000, "limit": 100}
+    assert rows["measurement_id"].tolist() == [1001, 1002]
+
+
+def test_fetch_after_a_cursor_follows_pages(monkeypatch):
+    monkeypatch.setattr(config, "MEASUREMENT_PAGE_SIZE", 100)
+    client = StandInClient(list(range(1, 251)))
+    rows = dashboard_data(client).fetch_new_measurements(1, 10)
+    assert [call["after_measurement_id"] for call in client.calls] == [10, 110, 210]
+    assert rows["measurement_id"].tolist() == list(range(11, 251))
+
+
+class StandInHistory:
+    """A history cache holding a fixed frame, recording what is appended."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.appended = []
+
+    def read(self, vest_id, since=None, max_rows=None):
+        return self.frame
+
+    def append(self, vest_id, rows):
+        self.appended.append(rows)
+
+
+def test_a_cursor_far_behind_is_reseeded_from_the_newest_rows(monkeypatch):
+    monkeypatch.setattr(config, "MEASUREMENT_PAGE_SIZE", 100)
+    monkeypatch.setattr(config, "MEASUREMENT_BUFFER_MAX_ROWS", 250)
+    client = StandInClient(list(range(1, 10001)))
+    history = StandInHistory(pd.DataFrame({"measurement_id": range(1, 11), "value": 0.0}))
+    data = DashboardData(client, ApiCache(100, {}), PerfRegistry(), history_cache=lambda: history)
+    monkeypatch.setitem(st.session_state, "measurement_buffers", {})
+
+    frame = data.get_recent_measurements(1)
+    # Paging stops once the buffer is full, then one request fetches the newest rows
+    assert [call["after_measurement_id"] for call in client.calls] == [10, 110, 210, None]
+    assert frame["measurement_id"].tolist() == list(range(9901, 10001))
+    assert st.session_state["measurement_buffers"][1]["last_id"] == 10000
+    assert [rows["measurement_id"].iloc[0] for rows in history.appended] == [9901]
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        yield executor
+
+
+def test_fetch_concurrently_returns_results_in_call_order(executor):
+    def slow(value, delay):
+        time.sleep(delay)
+        return value
+
+    results = fetch_concurrently(executor, 5, (slow, "first", 0.2), (slow, "second", 0.0), (slow, "third", 0.1))
+    assert results == ["first", "second", "third"]
+
+
+def test_fetch_concurrently_propagates_helper_exceptions(executor):
+    def fail(vest_id):
+        raise ValueError(f"vest {vest_id}")
+
+    with pytest.raises(ValueError, match="vest 7"):
+        fetch_concurrently(executor, 5, (str, 1), (fail, 7))
+
+
+def test_fetch_concurrently_gives_up_on_slow_calls(executor):
+    release = threading.Event()
+    start = time.monotonic()
+    try:
+        results = fetch_concurrently(executor, 0.2, (release.wait,), (str, 1))
+    finally:
+        release.set()
+    # The timeout bounds the whole batch, and a timed out call yields None
+    assert time.monotonic() - start < 1
+    assert results == [None, "1"]
+
+
+def test_fetch_timeout_covers_the_clients_retries(monkeypatch):
+    client = SensorVestClient("http://vests.test", connect_timeout=3, read_timeout=15, max_retries=3)
+    monkeypatch.setattr(config, "FETCH_TIMEOUT", None)
+    # Three attempts that each time out, plus 0.2 s and 0.4 s of backoff
+    assert dashboard_data(client).fetch_timeout() == pytest.approx(3 * 18 + 0.6)
+    monkeypatch.setattr(config, "FETCH_TIMEOUT", 5.0)
+    assert dashboard_data(client).fetch_timeout() == 5.0
+
+
+def test_stale_exports_are_removed(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "EXPORT_FILE_TTL", 3600)
+    now = time.time()
+    for name, age in [("vest-1-old.csv", 7200), ("vest-2-fresh.csv", 60), ("vest-3-edge.parquet", 3599)]:
+        path = tmp_path / name
+        path.write_bytes(b"sensor_id,value\n")
+        os.utime(path, (now - age, now - age))
+
+    assert remove_stale_exports(now) == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["vest-2-fresh.csv", "vest-3-edge.parquet"]
+
+
+def test_stale_exports_need_no_directory(monkeypatch, tmp_path):
+    monkeypatch.setattr(config, "EXPORT_DIR", str(tmp_path / "missing"))
+    assert remove_stale_exports() == 0
@@ -0,0 +1,142 @@
+import threading
+
+import psycopg2
+import pytest
+
+from utils import db_connector
+
+
+def backend_pid(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_backend_pid()")
+        return cur.fetchone()[0]
+
+
+def prepared_statements(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT name, statement FROM pg_prepared_statements")
+        return dict(cur.fetchall())
+
+
+def test_compile_rewrites_placeholders():
+    name, statement, order = db_connector._compile(
+        "SELECT %(a)s, %(b)s, %(a)s WHERE x LIKE 'y%%'"
+    )
+    assert statement == "SELECT $1, $2, $1 WHERE x LIKE 'y%'"
+    assert order == ("a", "b")
+    assert name == db_connector._compile("SELECT %(a)s, %(b)s, %(a)s WHERE x LIKE 'y%%'")[0]
+    assert db_connector._compile("SELECT %s + %s")[1:] == ("SELECT $1 + $2", (0, 1))
+
+
+def test_connections_are_reused(db_pool):
+    with db_pool.connection() as conn:
+        first = backend_pid(conn)
+    with db_pool.connection() as conn:
+        assert backend_pid(conn) == first
+    assert db_pool.stats() == {"max_size": 4, "open": 1, "idle": 1, "in_use": 0}
+
+
+def test_pool_is_bounded(database_url):
+    pool = db_connector.ConnectionPool(database_url, max_size=2, timeout=0.1)
+    try:
+        held = [pool.getconn(), pool.getconn()]
+        with pytest.raises(db_connector.PoolTimeout):
+            pool.getconn()
+        pool.putconn(held.pop())
+        with pool.connection():
+            assert pool.stats()["open"] == 2
+        pool.putconn(held.pop())
+    finally:
+        pool.close()
+
+
+def test_waiting_caller_gets_released_connection(database_url):
+    pool = db_connector.ConnectionPool(database_url, max_size=1, timeout=5)
+    try:
+        conn = pool.getconn()
+        timer = threading.Timer(0.2, pool.putconn, (conn,))
+        timer.start()
+        with pool.connection() as again:
+            assert again is conn
+    finally:
+        pool.close()
+
+
+def test_dead_connection_is_replaced(database_url):
+    pool = db_connector.ConnectionPool(database_url, max_size=1, health_check_seconds=0)
+    try:
+        with pool.connection() as conn:
+            pid = backend_pid(conn)
+        admin = psycopg2.connect(database_url)
+        with admin, admin.cursor() as cur:
+            cur.execute("SELECT pg_terminate_backend(%s)", (pid,))
+        admin.close()
+
+        with pool.connection() as conn:
+            assert backend_pid(conn) != pid
+        assert pool.stats()["open"] == 1
+    finally:
+        pool.close()
+
+
+def test_connection_is_returned_rolled_back(db_pool):
+    with pytest.raises(psycopg2.errors.UndefinedTable):
+        with db_pool.connection() as conn, conn.cursor() as cur:
+            cur.execute("INSERT INTO vests (name) VALUES ('uncommitted')")
+            cur.execute("SELECT * FROM no_such_table")
+    with db_pool.connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM vests")
+        assert cur.fetchone() == (0,)
+
+
+def test_statements_are_prepared_once_per_connection(db_pool):
+    sql = "SELECT %(n)s::int * 2 AS doubled, %(n)s::int + %(m)s::int AS total"
+    with db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            for n in range(3):
+                db_connector.execute(cur, sql, {"n": n, "m": 10})
+                assert cur.fetchone() == (n * 2, n + 10)
+        conn.rollback()
+        name = db_connector._compile(sql)[0]
+        assert name in conn.prepared
+        assert name in prepared_statements(conn)
+
+
+def test_prepared_statement_survives_rollback(db_pool):
+    with db_pool.connection() as conn:
+        with conn.cursor() as cur:
+            db_connector.execute(cur, "SELECT %s::text", ("a",))
+        conn.rollback()
+        with conn.cursor() as cur:
+            db_connector.execute(cur, "SELECT %s::text", ("b",))
+            assert cur.fetchone() == ("b",)
+
+
+def test_plain_connections_fall_back_to_execute(database_url):
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn.cursor() as cur:
+            db_connector.execute(cur, "SELECT %s + %s", (1, 2))
+            assert cur.fetchone() == (3,)
+        assert prepared_statements(conn) == {}
+    finally:
+        conn.close()
+
+
+def test_endpoint_queries_are_prepared(lambda_db, db_pool, invoke):
+    vest = invoke(lambda_db, "POST", "/vests", body={"name": "Pool vest"}).body
+    sensor = invoke(lambda_db, "POST", "/sensors",
+                    body={"vest_id": vest["vest_id"], "sensor_type_id": 1, "position": "chest"}).body
+    invoke(lambda_db, "POST", "/measurements", body={"sensor_id": sensor["sensor_id"], "value": 1.5})
+    for _ in range(2):
+        invoke(lambda_db, "GET", "/vests")
+        invoke(lambda_db, "GET", f"/vests/{vest['vest_id']}")
+        invoke(lambda_db, "GET", f"/vests/{vest['vest_id']}/sensors")
+        invoke(lambda_db, "GET", f"/vests/{vest['vest_id']}/measurements/recent", query={"seconds": "60"})
+        invoke(lambda_db, "GET", f"/vests/{vest['vest_id']}/measurements/aggregate", query={"bucket": "1m"})
+
+    assert db_pool.stats()["open"] == 1
+    with db_pool.connection() as conn:
+        statements = prepared_statements(conn)
+    assert len(statements) == len(conn.prepared) == 11
+    assert any("measurements_1m" in sql for sql in statements.values())
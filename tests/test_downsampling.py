@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from utils.downsampling import downsample, lttb_indices, minmax_indices
+
+
+@pytest.fixture
+def walk():
+    rng = np.random.default_rng(42)
+    y = np.cumsum(rng.normal(size=100_000))
+    x = np.arange(len(y), dtype="float64")
+    return x, y
+
+
+def test_short_series_is_returned_unchanged():
+    x = np.arange(10)
+    y = np.arange(10, dtype="float64")
+    assert np.array_equal(downsample(x, y, 50), np.arange(10))
+    assert np.array_equal(lttb_indices(x, y, 50), np.arange(10))
+
+
+def test_lttb_keeps_endpoints_and_size(walk):
+    x, y = walk
+    idx = lttb_indices(x, y, 500)
+    assert len(idx) == 500
+    assert idx[0] == 0 and idx[-1] == len(x) - 1
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_lttb_picks_spike():
+    x = np.arange(1000, dtype="float64")
+    y = np.zeros(1000)
+    y[517] = 100.0
+    assert 517 in lttb_indices(x, y, 20)
+
+
+def test_minmax_matches_bucket_extremes(walk):
+    _, y = walk
+    idx = minmax_indices(y, 100)
+    buckets = y.reshape(100, -1)
+    assert set(y[idx]) >= set(buckets.min(axis=1)) | set(buckets.max(axis=1))
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax", "minmax_lttb"])
+def test_downsample_keeps_global_extremes(walk, method):
+    x, y = walk
+    idx = downsample(x, y, 1000, method=method)
+    assert len(idx) <= 1002
+    assert np.all(np.diff(idx) > 0)
+    assert y[idx].min() == y.min()
+    assert y[idx].max() == y.max()
+
+
+def test_downsample_skips_non_finite_values():
+    x = np.arange(10_000, dtype="float64")
+    y = np.sin(x / 100)
+    y[::7] = np.nan
+    idx = downsample(x, y, 300)
+    assert np.isfinite(y[idx]).all()
+
+
+def test_downsample_accepts_datetimes(walk):
+    _, y = walk
+    x = np.datetime64("2025-03-01T00:00:00") + np.arange(len(y)) * np.timedelta64(10, "ms")
+    idx = downsample(x, y, 400)
+    assert idx[0] == 0 and idx[-1] == len(y) - 1
+
+
+def test_unknown_method_raises(walk):
+    x, y = walk
+    with pytest.raises(ValueError):
+        downsample(x, y, 100, method="nearest")
@@ -0,0 +1,237 @@
+import gzip
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from gateway.edge_gateway import EdgeGateway, UDPGatewayServer, main, parse_datagram, serve
+from utils.stream_features import FeatureEngine
+
+
+class StandInBulkHandler(BaseHTTPRequestHandler):
+    """Accepts gzipped bulk batches, or answers with server.fail_status when set."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        status = self.server.fail_status
+        if status is None:
+            assert self.headers["Content-Encoding"] == "gzip"
+            rows = json.loads(gzip.decompress(body))["measurements"]
+            self.server.batches.append(rows)
+            status, payload = 200, {"received": len(rows), "accepted": len(rows), "duplicates": 0,
+                                    "rejected": 0, "rejected_sensor_ids": []}
+        else:
+            payload = {"error": "unavailable"}
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInBulkHandler)
+    server.batches = []
+    server.fail_status = None
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def readings(vest_id, start, count, sensor_id=1):
+    return [
+        {"vest_id": vest_id, "sensor_id": sensor_id, "value": float(i),
+         "timestamp": f"2025-03-01T00:00:{i:02d}Z"}
+        for i in range(start, start + count)
+    ]
+
+
+def values(batches):
+    return [row["value"] for rows in batches for row in rows]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_parse_datagram_forms():
+    assert parse_datagram(b'{"sensor_id": 1, "value": 2}') == [{"sensor_id": 1, "value": 2}]
+    assert parse_datagram(b'[{"sensor_id": 1}, {"sensor_id": 2}]') == [{"sensor_id": 1}, {"sensor_id": 2}]
+    assert parse_datagram(b'{"sensor_id": 1}\n{"sensor_id": 2}\n') == [{"sensor_id": 1}, {"sensor_id": 2}]
+    assert parse_datagram(b"  ") == []
+
+
+def test_batches_by_size_and_per_vest(upstream, tmp_path):
+    gateway = EdgeGateway(upstream.url, spill_dir=str(tmp_path), batch_max_rows=3)
+    assert gateway.submit(readings(1, 0, 7) + readings(2, 0, 2) + [{"sensor_id": "x", "value": 1}]) == 9
+    assert gateway.stats["invalid"] == 1
+    # Two full batches for vest 1 were flushed right away
+    assert gateway.pending()["memory"] == 2
+    gateway.flush()
+    while gateway._send_next():
+        pass
+
+    assert [len(rows) for rows in upstream.batches] == [3, 3, 1, 2]
+    assert values(upstream.batches[:3]) == [float(i) for i in range(7)]
+    assert gateway.stats["accepted"] == 9
+
+
+def test_feeds_the_feature_engine(upstream, tmp_path):
+    features = FeatureEngine(window=5.0, threshold=10.0)
+    gateway = EdgeGateway(upstream.url, spill_dir=str(tmp_path), features=features)
+    spike = [{"vest_id": 1, "sensor_id": 1, "value": value, "timestamp": f"2025-03-01T00:01:0{i}Z"}
+             for i, value in enumerate([12.0, 15.0, 3.0])]
+    gateway.submit(readings(1, 0, 7) + readings(2, 0, 2, sensor_id=4) + spike + [{"sensor_id": "x", "value": 1}])
+
+    snapshot = features.snapshot()
+    assert sorted(snapshot) == [(1, 1), (2, 4)]
+    assert snapshot[(1, 1)]["samples"] == 10
+    # The window follows reading timestamps, not arrival: only the spike is within 5 s
+    assert snapshot[(1, 1)]["mean"] == pytest.approx(10.0)
+    assert gateway.feature_summary()[1] == {"sensors": 1, "peaks": 1, "highest_peak": 15.0}
+
+
+@pytest.mark.parametrize("window", ["0", "-5", "nan"])
+def test_cli_refuses_a_window_that_is_not_positive(monkeypatch, capsys, window):
+    monkeypatch.setattr("sys.argv", ["edge_gateway", "--upstream", "http://127.0.0.1:9", "--features",
+                                     "--feature-window", window])
+    with pytest.raises(SystemExit) as exit:
+        main()
+    assert exit.value.code == 2
+    assert "--feature-window: must be positive" in capsys.readouterr().err
+
+
+def test_flushes_on_time(upstream, tmp_path):
+    gateway = EdgeGateway(upstream.url, spill_dir=str(tmp_path), flush_interval=0.1).start()
+    try:
+        gateway.submit([{"vest_id": 1, "sensor_id": 1, "value": 1.5}])
+        wait_for(lambda: upstream.batches)
+    finally:
+        gateway.stop()
+    [[row]] = upstream.batches
+    # Readings without a timestamp are stamped on arrival
+    assert row["value"] == 1.5 and row["timestamp"]
+
+
+def test_readings_without_timestamp_get_distinct_stamps(upstream, tmp_path):
+    gateway = EdgeGateway(upstream.url, spill_dir=str(tmp_path)).start()
+    try:
+        gateway.submit([{"vest_id": 1, "sensor_id": 1, "value": float(i)} for i in range(100)])
+        gateway.submit([{"vest_id": 1, "sensor_id": 1, "value": 100.0}, {"vest_id": 1, "sensor_id": 2, "value": 0.0}])
+        gateway.flush()
+        wait_for(lambda: upstream.batches)
+    finally:
+        gateway.stop()
+    [rows] = upstream.batches
+    # The backend keeps one reading per (sensor_id, timestamp), so none may share a stamp
+    stamps = [datetime.fromisoformat(row["timestamp"]) for row in rows if row["sensor_id"] == 1]
+    assert len(stamps) == len(set(stamps)) == 101
+    assert stamps == sorted(stamps)
+
+
+def test_unreadable_timestamps_are_restamped_and_non_finite_values_dropped(upstream, tmp_path):
+    gateway = EdgeGateway(upstream.url, spill_dir=str(tmp_path))
+    good = readings(1, 0, 2)
+    bad = [
+        {"vest_id": 1, "sensor_id": 2, "value": 1.0, "timestamp": "garbage"},
+        {"vest_id": 1, "sensor_id": 2, "value": 2.0, "timestamp": 1740787200},
+        {"vest_id": 1, "sensor_id": 3, "value": float("nan"), "timestamp": "2025-03-01T00:00:00Z"},
+        {"vest_id": 1, "sensor_id": 3, "value": float("inf")},
+    ]
+    assert gateway.submit(good + bad) == 4
+    assert (gateway.stats["invalid"], gateway.stats["restamped"]) == (2, 2)
+    gateway.flush()
+    gateway._send_next()
+
+    [rows] = upstream.batches
+    assert [row["timestamp"] for row in rows[:2]] == [row["timestamp"] for row in good]
+    # Stamped on arrival
+    now = datetime.now(timezone.utc)
+    assert [abs(now - datetime.fromisoformat(row["timestamp"])) < timedelta(minutes=1) for row in rows[2:]] == [True] * 2
+
+
+def test_naive_timestamps_are_utc(upstream, tmp_path):
+    features = FeatureEngine(window=5.0)
+    gateway = EdgeGateway(upstream.url, spill_dir=str(tmp_path), features=features)
+    gateway.submit([{"vest_id": 1, "sensor_id": 1, "value": 1.0, "timestamp": "2025-03-01T00:00:00"}])
+    assert features.snapshot()[(1, 1)]["last_t"] == datetime(2025, 3, 1, tzinfo=timezone.utc).timestamp()
+
+
+def test_spills_while_upstream_is_down_and_replays_in_order(upstream, tmp_path):
+    upstream.fail_status = 503
+    gateway = EdgeGateway(upstream.url, spill_dir=str(tmp_path), batch_max_rows=2, max_pending_batches=2)
+    gateway.submit(readings(1, 0, 4))
+    assert gateway._send_next() == "retry"
+    # The failed batch and the one queued behind it are now on disk
+    assert gateway.pending() == {"memory": 0, "disk": 2, "disk_bytes": gateway.spill.bytes}
+    gateway.submit(readings(1, 4, 6))
+    assert gateway.pending()["disk"] == 5
+
+    upstream.fail_status = None
+    while gateway._send_next():
+        pass
+    assert values(upstream.batches) == [float(i) for i in range(10)]
+    assert gateway.pending()["disk"] == 0
+    assert gateway.stats["replayed_batches"] == 5
+
+
+def test_spilled_batches_survive_a_restart(upstream, tmp_path):
+    upstream.fail_status = 503
+    gateway = EdgeGateway(upstream.url, spill_dir=str(tmp_path)).start()
+    gateway.submit(readings(1, 0, 3))
+    gateway.stop(drain_timeout=0.5)
+    assert len([n for n in os.listdir(tmp_path) if n.endswith(".json.gz")]) == 1
+
+    upstream.fail_status = None
+    restarted = EdgeGateway(upstream.url, spill_dir=str(tmp_path))
+    restarted.submit(readings(1, 3, 2))
+    restarted.flush()
+    while restarted._send_next():
+        pass
+    assert values(upstream.batches) == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_rejected_batch_does_not_block_the_rest(upstream, tmp_path):
+    gateway = EdgeGateway(upstream.url, spill_dir=str(tmp_path), batch_max_rows=1)
+    upstream.fail_status = 400
+    gateway.submit(readings(1, 0, 1))
+    assert gateway._send_next() == "rejected"
+    upstream.fail_status = None
+    gateway.submit(readings(1, 1, 1))
+    assert gateway._send_next() == "sent"
+
+    assert values(upstream.batches) == [1.0]
+    assert len(os.listdir(tmp_path / "rejected")) == 1
+
+
+def test_udp_readings_reach_upstream(upstream, tmp_path):
+    gateway = EdgeGateway(upstream.url, spill_dir=str(tmp_path), flush_interval=0.1).start()
+    server = serve(UDPGatewayServer(("127.0.0.1", 0), gateway))
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.sendto(json.dumps(readings(1, 0, 3)).encode(), server.server_address)
+            sock.sendto(b"not json", server.server_address)
+        wait_for(lambda: upstream.batches)
+    finally:
+        server.shutdown()
+        server.server_close()
+        gateway.stop()
+    assert values(upstream.batches) == [0.0, 1.0, 2.0]
+    assert gateway.stats["invalid"] == 1
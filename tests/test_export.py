@@ -0,0 +1,115 @@
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+
+import pyarrow.parquet as pq
+import pytest
+
+from backend.local_server import start_server
+from utils.api_requests import SensorVestClient
+
+START = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def cohort(lambda_db, invoke):
+    """Two vests with three sensors each; the sensors of a vest share every timestamp."""
+    vests = {}
+    for name in ("Export A", "Export B"):
+        vest = invoke(lambda_db, "POST", "/vests", body={"name": name}).body
+        sensor_ids = [
+            invoke(lambda_db, "POST", "/sensors",
+                   body={"vest_id": vest["vest_id"], "sensor_type_id": 1, "position": position}).body["sensor_id"]
+            for position in ("chest", "back", "left_elbow")
+        ]
+        rows = [
+            {"sensor_id": sensor_id, "timestamp": (START + timedelta(seconds=10 * i)).isoformat(), "value": float(i)}
+            for i in range(50) for sensor_id in sensor_ids
+        ]
+        invoke(lambda_db, "POST", "/measurements/bulk", body={"measurements": rows})
+        vests[vest["vest_id"]] = sensor_ids
+    return vests
+
+
+def export_pages(invoke, lambda_db, query, path="/measurements/export"):
+    pages = []
+    while True:
+        result = invoke(lambda_db, "GET", path, query=query)
+        assert result.status == 200, result.body
+        pages.append(result)
+        if "X-Next-Cursor" not in result.headers:
+            return pages
+        query = dict(query, cursor=result.headers["X-Next-Cursor"])
+
+
+def csv_rows(pages):
+    return list(csv.DictReader(io.StringIO("".join(page.body for page in pages))))
+
+
+def test_pages_concatenate_into_one_csv(lambda_db, cohort, invoke):
+    vest_ids = sorted(cohort)
+    pages = export_pages(invoke, lambda_db, {"vest_ids": ",".join(map(str, vest_ids)), "limit": "40",
+                                             "end": (START + timedelta(days=1)).isoformat()})
+    rows = csv_rows(pages)
+    # Pages cut through instants shared by several sensors without skipping or repeating rows
+    assert len(rows) == 300 and len(pages) == 8
+    assert len({row["measurement_id"] for row in rows}) == 300
+    keys = [(int(r["vest_id"]), datetime.fromisoformat(r["timestamp"]), int(r["measurement_id"])) for r in rows]
+    assert keys == sorted(keys)
+    assert [int(page.headers["X-Row-Count"]) for page in pages] == [40] * 7 + [20]
+    assert rows[0]["position"] == "chest" and rows[0]["sensor_type"]
+
+
+def test_time_and_sensor_filters(lambda_db, cohort, invoke):
+    vest_id, sensor_ids = next(iter(cohort.items()))
+    query = {
+        "start": (START + timedelta(seconds=100)).isoformat(),
+        "end": (START + timedelta(seconds=200)).isoformat(),
+        "sensor_ids": f"{sensor_ids[0]},{sensor_ids[2]}",
+        "limit": "7",
+    }
+    rows = csv_rows(export_pages(invoke, lambda_db, query, path=f"/vests/{vest_id}/measurements/export"))
+    assert len(rows) == 20
+    assert {int(row["sensor_id"]) for row in rows} == {sensor_ids[0], sensor_ids[2]}
+    assert sorted({float(row["value"]) for row in rows}) == [float(i) for i in range(10, 20)]
+
+
+def test_bucket_export_covers_every_row(lambda_db, cohort, invoke):
+    vest_ids = ",".join(map(str, sorted(cohort)))
+    end = (START + timedelta(days=1)).isoformat()
+    rows = csv_rows(export_pages(invoke, lambda_db, {"vest_ids": vest_ids, "bucket": "2m", "limit": "10", "end": end}))
+    # 50 readings 10 s apart fill four 2-minute buckets and part of a fifth, per sensor
+    assert len(rows) == 2 * 3 * 5
+    assert sum(int(row["count"]) for row in rows) == 300
+    first = next(row for row in rows if row["bucket"] == START.isoformat())
+    assert (float(first["min"]), float(first["max"]), float(first["mean"])) == (0.0, 11.0, 5.5)
+
+
+def test_bad_requests(lambda_db, cohort, invoke):
+    vest_id = str(next(iter(cohort)))
+    for query in [{}, {"vest_ids": vest_id, "format": "xlsx"}, {"vest_ids": vest_id, "cursor": "nope"},
+                  {"vest_ids": vest_id, "start": "yesterday"}]:
+        assert invoke(lambda_db, "GET", "/measurements/export", query=query).status == 400, query
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_client_writes_pages_to_a_file(lambda_db, cohort, tmp_path, fmt):
+    server = start_server()
+    client = SensorVestClient(f"http://127.0.0.1:{server.server_port}")
+    path = tmp_path / f"export.{fmt}"
+    seen = []
+    try:
+        rows = client.export_measurements(path, sorted(cohort), format=fmt, end=(START + timedelta(days=1)).isoformat(),
+                                          page_size=64, progress=seen.append)
+    finally:
+        client.close()
+        server.shutdown()
+    assert rows == 300 and seen[-1] == 300 and len(seen) == 5
+    if fmt == "parquet":
+        parquet = pq.ParquetFile(path)
+        assert parquet.metadata.num_row_groups == 5
+        table = parquet.read()
+        assert table.num_rows == 300
+        assert table.column("timestamp").type.tz == "UTC"
+    else:
+        assert len(list(csv.DictReader(io.StringIO(path.read_text())))) == 300
@@ -0,0 +1,142 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import history_cache
+from utils.history_cache import HistoryCache
+
+
+def make_frame(first_id, count, start="2025-03-01T00:00:00Z", step="1min"):
+    ids = np.arange(first_id, first_id + count)
+    return pd.DataFrame({
+        "measurement_id": ids,
+        "sensor_id": ids % 3 + 1,
+        "vest_id": 7,
+        "timestamp": pd.date_range(start, periods=count, freq=step),
+        "value": ids * 0.5,
+        "additional_data": None,
+        "position": pd.Categorical(np.array(["chest", "back", "left_elbow"])[ids % 3]),
+        "sensor_type": pd.Categorical(np.array(["IMU", "FlexSensor", "StretchSensor"])[ids % 3]),
+    })
+
+
+def test_round_trip_is_partitioned_by_day(tmp_path):
+    cache = HistoryCache(str(tmp_path))
+    assert cache.append(7, make_frame(1, 3 * 1440)) == 3 * 1440
+
+    assert sorted(os.listdir(tmp_path / "vest_7")) == ["2025-03-01", "2025-03-02", "2025-03-03"]
+    assert cache.last_id(7) == 3 * 1440
+    df = cache.read(7)
+    assert df["measurement_id"].tolist() == list(range(1, 3 * 1440 + 1))
+    assert df["timestamp"].dt.tz is not None
+    assert isinstance(df["position"].dtype, pd.CategoricalDtype)
+
+
+def test_rows_already_cached_are_skipped(tmp_path):
+    cache = HistoryCache(str(tmp_path))
+    cache.append(7, make_frame(1, 100))
+    assert cache.append(7, make_frame(51, 100)) == 50
+    assert cache.read(7)["measurement_id"].is_unique
+    assert len(cache.read(7)) == 150
+
+
+def test_json_decoded_frames_are_accepted(tmp_path):
+    cache = HistoryCache(str(tmp_path))
+    frame = make_frame(1, 10)
+    frame["timestamp"] = frame["timestamp"].map(lambda t: t.isoformat())
+    frame = frame.astype({"position": "object", "sensor_type": "object"})
+    cache.append(7, frame)
+    assert cache.read(7)["timestamp"].iloc[0] == pd.Timestamp("2025-03-01T00:00:00Z")
+
+
+def test_since_and_max_rows(tmp_path):
+    cache = HistoryCache(str(tmp_path))
+    cache.append(7, make_frame(1, 3 * 1440))
+    since = pd.Timestamp("2025-03-02T12:00:00Z")
+    df = cache.read(7, since=since)
+    assert df["timestamp"].min() == since
+    assert len(cache.read(7, since=since, max_rows=10)) == 10
+    assert cache.read(7, max_rows=10)["measurement_id"].iloc[-1] == 3 * 1440
+
+
+def test_small_appends_are_compacted(tmp_path):
+    cache = HistoryCache(str(tmp_path))
+    for first_id in range(1, 200, 10):
+        cache.append(7, make_frame(first_id, 10))
+    parts = os.listdir(tmp_path / "vest_7" / "2025-03-01")
+    assert len(parts) <= history_cache.MAX_PARTS_PER_DAY
+    assert cache.read(7)["measurement_id"].tolist() == list(range(1, 201))
+
+
+def test_oldest_days_are_evicted_first(tmp_path):
+    cache = HistoryCache(str(tmp_path), max_bytes=10 ** 9)
+    cache.append(7, make_frame(1, 5 * 1440))
+    day_size = cache.stats()["bytes"] / 5
+    cache.max_bytes = int(day_size * 3.5)
+    cache.evict()
+
+    assert sorted(os.listdir(tmp_path / "vest_7")) == ["2025-03-03", "2025-03-04", "2025-03-05"]
+    assert cache.last_id(7) == 5 * 1440
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_appends_keep_a_running_size_instead_of_scanning(tmp_path, monkeypatch):
+    cache = HistoryCache(str(tmp_path))
+    scans = []
+    day_sizes = cache._day_sizes
+    monkeypatch.setattr(cache, "_day_sizes", lambda: scans.append(1) or day_sizes())
+    for first_id in range(1, 200, 10):
+        cache.append(7, make_frame(first_id, 10))
+    # One scan on first use; writes and compactions after it are counted as they happen
+    assert len(scans) == 1
+    scans.clear()
+    assert cache._bytes == cache.stats()["bytes"]
+
+    # Passing max_bytes scans, then evicts
+    cache.max_bytes = cache._bytes
+    scans.clear()
+    cache.append(7, make_frame(500, 10, start="2025-03-02T00:00:00Z"))
+    assert len(scans) == 1
+    assert sorted(os.listdir(tmp_path / "vest_7")) == ["2025-03-02"]
+
+    # Other processes' writes are picked up by a scan every RESCAN_INTERVAL
+    monkeypatch.setattr(history_cache, "RESCAN_INTERVAL", 0)
+    scans.clear()
+    cache.evict()
+    assert len(scans) == 1
+
+
+def test_clear(tmp_path):
+    cache = HistoryCache(str(tmp_path))
+    cache.append(7, make_frame(1, 10))
+    cache.clear()
+    assert cache.last_id(7) == 0
+    assert cache.read(7).empty
+
+
+def _append_overlapping(root, worker):
+    cache = HistoryCache(root)
+    for first_id in range(1, 2001, 250):
+        # Every worker writes the same ids, offset a little, like sessions in
+        # different Streamlit processes fetching the same tail
+        cache.append(7, make_frame(first_id + worker * 5, 250))
+        cache.read(7)
+
+
+@pytest.mark.skipif(history_cache.fcntl is None, reason="multiprocess test uses fork")
+def test_concurrent_processes_do_not_duplicate_rows(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_append_overlapping, args=(str(tmp_path), i)) for i in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    df = HistoryCache(str(tmp_path)).read(7)
+    assert df["measurement_id"].is_unique
+    assert df["measurement_id"].is_monotonic_increasing
+    assert not [n for n in os.listdir(tmp_path / "vest_7" / "2025-03-01") if n.endswith(".tmp")]
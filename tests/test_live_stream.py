@@ -0,0 +1,77 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.live_stream import MeasurementStream, RingBuffer, iter_sse_events
+
+
+class StandInStreamHandler(BaseHTTPRequestHandler):
+    """Pushes two measurement events per connection, then hangs up."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.last_event_ids.append(self.headers.get("Last-Event-ID"))
+        start = int(self.headers.get("Last-Event-ID") or 0)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(b": connected\n\n")
+        for measurement_id in (start + 1, start + 2):
+            row = {"measurement_id": measurement_id, "sensor_id": 1, "value": float(measurement_id)}
+            self.wfile.write(
+                f"id: {measurement_id}\nevent: measurements\ndata: {json.dumps([row])}\n\n".encode()
+            )
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stream_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInStreamHandler)
+    server.last_event_ids = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_ring_buffer_keeps_most_recent_rows():
+    buffer = RingBuffer(3)
+    buffer.extend([1, 2])
+    buffer.extend([3, 4, 5])
+    assert buffer.snapshot() == [3, 4, 5]
+    assert buffer.total == 5
+    assert len(buffer) == 3
+
+
+def test_iter_sse_events_parses_fields():
+    lines = [
+        ": keepalive", "",
+        "id: 7", "event: measurements", "data: [1,", "data: 2]", "",
+        "id: 8", "",
+    ]
+    assert list(iter_sse_events(lines)) == [
+        ("measurements", "[1,\n2]", "7"),
+        ("message", "", "8"),
+    ]
+
+
+def test_stream_appends_pushed_rows_and_resumes(stream_server):
+    base_url = f"http://127.0.0.1:{stream_server.server_port}"
+    stream = MeasurementStream(base_url, vest_id=1, reconnect_delay=0.05).start()
+    try:
+        assert stream.wait_for(6)
+    finally:
+        stream.stop()
+
+    ids = [row["measurement_id"] for row in stream.buffer.snapshot()]
+    # Each reconnect continues from the last id received, so nothing repeats
+    assert ids[:6] == [1, 2, 3, 4, 5, 6]
+    assert stream_server.last_event_ids[:3] == [None, "2", "4"]
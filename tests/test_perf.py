@@ -0,0 +1,113 @@
+import pytest
+
+from utils import perf
+from utils.api_requests import SensorVestClient
+
+
+def test_histogram_quantiles_interpolate_within_buckets():
+    histogram = perf.Histogram(buckets=(0.01, 0.1, 1.0))
+    for _ in range(50):
+        histogram.observe(0.005)
+    for _ in range(50):
+        histogram.observe(0.05)
+
+    assert histogram.count == 100
+    # Interpolated between the observed minimum and the bucket's upper bound
+    assert histogram.quantile(0.25) == pytest.approx(0.0075)
+    assert histogram.quantile(0.5) == pytest.approx(0.01)
+    # The top bucket is capped at the observed maximum
+    assert histogram.quantile(0.9) == pytest.approx(0.042)
+    assert histogram.quantile(1.0) == pytest.approx(0.05)
+    assert perf.Histogram().quantile(0.5) is None
+
+
+def test_prometheus_export():
+    registry = perf.PerfRegistry(buckets=(0.01, 0.1))
+    registry.describe("fetch_seconds", "Fetch time.")
+    registry.observe("fetch_seconds", 0.005, helper="get_vest")
+    registry.observe("fetch_seconds", 0.5, helper="get_vest")
+    registry.set_gauge("pool_connections", 3, state='id"le')
+
+    assert registry.to_prometheus().splitlines() == [
+        "# HELP fetch_seconds Fetch time.",
+        "# TYPE fetch_seconds histogram",
+        'fetch_seconds_bucket{helper="get_vest",le="0.01"} 1',
+        'fetch_seconds_bucket{helper="get_vest",le="0.1"} 1',
+        'fetch_seconds_bucket{helper="get_vest",le="+Inf"} 2',
+        'fetch_seconds_sum{helper="get_vest"} 0.505',
+        'fetch_seconds_count{helper="get_vest"} 2',
+        "# TYPE pool_connections gauge",
+        'pool_connections{state="id\\"le"} 3',
+    ]
+
+
+def test_instrument_times_calls_by_function_name():
+    registry = perf.PerfRegistry()
+
+    @registry.instrument("fetch_seconds", label="helper")
+    def get_vest(vest_id):
+        return vest_id
+
+    assert get_vest(7) == 7
+    assert get_vest.__name__ == "get_vest"
+    [row] = registry.snapshot()
+    assert row["labels"] == {"helper": "get_vest"}
+    assert row["count"] == 1
+
+
+def test_server_timing_round_trip():
+    with perf.request_timing() as timing:
+        with perf.phase("db"):
+            pass
+        with perf.phase("db"):
+            pass
+        with perf.phase("encode"):
+            pass
+    # Outside a request, phases are not recorded anywhere
+    with perf.phase("db"):
+        pass
+
+    header = timing.header(total=0.0125)
+    assert header.startswith("total;dur=12.50, db;dur=")
+    assert 'desc="2 queries"' in header
+    parsed = perf.parse_server_timing(header)
+    assert set(parsed) == {"total", "db", "encode", "db-1", "db-2"}
+    assert parsed["total"] == pytest.approx(0.0125)
+    assert perf.parse_server_timing('cache;desc="hit", app;dur=bad') == {}
+
+
+def test_lambda_reports_server_timing(lambda_db):
+    response = lambda_db.lambda_handler({"httpMethod": "GET", "path": "/vests"}, None)
+    timings = perf.parse_server_timing(response["headers"]["Server-Timing"])
+    assert {"total", "pool", "db", "encode", "db-1"} <= set(timings)
+    assert timings["db"] <= timings["total"]
+
+    lambda_db.lambda_handler({"httpMethod": "GET", "path": "/nowhere"}, None)
+    routes = {row["labels"]["route"] for row in perf.registry.snapshot() if row["name"] == "api_request_seconds"}
+    assert {"get_vests", "unmatched"} <= routes
+
+
+def test_client_timing_hook_and_metrics_endpoint(db_pool):
+    from backend.local_server import start_server
+
+    server = start_server()
+    calls = []
+    client = SensorVestClient(
+        f"http://127.0.0.1:{server.server_port}",
+        timing_hook=lambda endpoint, timings: calls.append((endpoint, timings)),
+    )
+    try:
+        vest = client.create_vest(name="Timed")
+        client.get_vest_sensors(vest["vest_id"])
+        metrics = client.session.get(f"{client.base_url}/metrics").text
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+    assert [endpoint for endpoint, _ in calls] == ["POST /vests", "GET /vests/{id}/sensors"]
+    timings = calls[1][1]
+    assert {"round_trip", "decode", "server", "network", "db", "pool", "encode"} <= set(timings)
+    assert timings["server"] <= timings["round_trip"]
+    assert 'api_request_seconds_count{route="get_vest_sensors",status="200"}' in metrics
+    assert 'db_pool_connections{state="max_size"} 4' in metrics
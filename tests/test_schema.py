@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utils import db_connector
+
+
+def fetch(lambda_function, sql, params=None):
+    with db_connector.connection() as conn, conn, conn.cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+
+@pytest.fixture
+def sensor(lambda_db, invoke):
+    vest = invoke(lambda_db, "POST", "/vests", body={"name": "Schema test vest"}).body
+    sensor = invoke(lambda_db, "POST", "/sensors", body={
+        "vest_id": vest["vest_id"], "sensor_type_id": 1, "position": "chest",
+    }).body
+    return vest["vest_id"], sensor["sensor_id"]
+
+
+@pytest.fixture
+def ingest(lambda_db, invoke):
+    def ingest(sensor_id, start, count, step=timedelta(seconds=7)):
+        rows = [
+            {"sensor_id": sensor_id, "timestamp": (start + i * step).isoformat(), "value": float(i % 40)}
+            for i in range(count)
+        ]
+        return invoke(lambda_db, "POST", "/measurements/bulk", body={"measurements": rows}).body
+
+    return ingest
+
+
+def test_rollups_follow_inserts_but_not_duplicates(lambda_db, sensor, ingest):
+    _, sensor_id = sensor
+    start = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=3)
+    ingest(sensor_id, start, 1000)
+    ingest(sensor_id, start, 1000)
+
+    raw = fetch(lambda_db, "SELECT COUNT(*), SUM(value), MIN(value), MAX(value) FROM measurements")
+    for table in ("measurements_1m", "measurements_1h"):
+        rollup = fetch(lambda_db, f"SELECT SUM(count), SUM(sum), MIN(min), MAX(max) FROM {table}")
+        assert [float(v) for v in rollup[0]] == [float(v) for v in raw[0]]
+
+
+@pytest.mark.parametrize("bucket", ["1m", "5m", "1h"])
+def test_rollup_aggregates_match_raw_aggregates(lambda_db, sensor, ingest, invoke, bucket):
+    vest_id, sensor_id = sensor
+    # Start on an hour boundary so the first bucket is complete in both sources
+    start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(hours=2)
+    ingest(sensor_id, start, 900)
+    query = {"bucket": bucket, "agg": "mean,min,max,count", "seconds": str(3 * 3600)}
+
+    from_rollup = invoke(lambda_db, "GET", f"/vests/{vest_id}/measurements/aggregate", query=query).body
+    lambda_db.ROLLUPS, rollups = [], lambda_db.ROLLUPS
+    try:
+        from_raw = invoke(lambda_db, "GET", f"/vests/{vest_id}/measurements/aggregate", query=query).body
+    finally:
+        lambda_db.ROLLUPS = rollups
+    assert len(from_rollup) == len(from_raw) > 0
+    for a, b in zip(from_rollup, from_raw):
+        assert a["bucket"] == b["bucket"] and a["count"] == b["count"]
+        assert a["mean"] == pytest.approx(b["mean"])
+        assert (a["min"], a["max"]) == (b["min"], b["max"])
+
+
+def test_late_rows_move_from_default_partition(lambda_db, sensor, ingest):
+    _, sensor_id = sensor
+    start = datetime.now(timezone.utc) - timedelta(days=3)
+    ingest(sensor_id, start, 10)
+    assert fetch(lambda_db, "SELECT COUNT(*) FROM measurements_default") == [(10,)]
+
+    fetch(lambda_db, "SELECT create_measurement_partitions(%s, 2)", (start.date(),))
+    assert fetch(lambda_db, "SELECT COUNT(*) FROM measurements_default") == [(0,)]
+    assert fetch(lambda_db, "SELECT COUNT(*) FROM measurements") == [(10,)]
+
+
+def test_retention_keeps_rollups(lambda_db, sensor, ingest, invoke):
+    vest_id, sensor_id = sensor
+    old = datetime.now(timezone.utc) - timedelta(days=40)
+    fetch(lambda_db, "SELECT create_measurement_partitions(%s, 2)", (old.date(),))
+    ingest(sensor_id, old, 100)
+    ingest(sensor_id, datetime.now(timezone.utc) - timedelta(minutes=5), 10)
+
+    result = lambda_db.lambda_handler({"source": "aws.events", "detail-type": "Scheduled Event"}, None)
+    assert result["dropped"] >= 1
+    assert fetch(lambda_db, "SELECT COUNT(*) FROM measurements") == [(10,)]
+
+    buckets = invoke(lambda_db, "GET", f"/vests/{vest_id}/measurements/aggregate",
+                     query={"bucket": "1d", "agg": "count", "seconds": str(60 * 86400)}).body
+    assert sum(b["count"] for b in buckets) == 110
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from utils.stream_features import FeatureEngine, PeakDetector, RollingStats
+
+
+def test_rolling_stats_match_numpy_over_the_window():
+    rng = np.random.default_rng(1)
+    times = np.cumsum(rng.uniform(0.0, 0.05, 2000))
+    values = rng.normal(1e6, 3.0, 2000)  # far from zero, where naive sums of squares lose precision
+    stats = RollingStats(window=2.0)
+    for i, (t, value) in enumerate(zip(times, values)):
+        stats.push(t, value)
+        if i % 97:
+            continue
+        in_window = values[(times > t - 2.0) & (times <= t)]
+        assert len(stats) == len(in_window)
+        assert stats.mean == pytest.approx(in_window.mean())
+        assert stats.variance == pytest.approx(in_window.var(), rel=1e-6)
+        assert (stats.min, stats.max) == (in_window.min(), in_window.max())
+
+
+def test_min_and_max_expire_with_the_window():
+    stats = RollingStats(window=3.0)
+    for t, value in enumerate([5.0, 1.0, 9.0, 4.0, 4.0, 2.0]):
+        stats.push(float(t), value)
+    # Samples at t=3, 4, 5 remain
+    assert (stats.min, stats.max, len(stats)) == (2.0, 4.0, 3)
+    assert RollingStats(1.0).mean is None
+
+
+@pytest.mark.parametrize("window", [0, -1.0, float("nan")])
+def test_window_must_be_positive(window):
+    with pytest.raises(ValueError, match="window must be positive"):
+        RollingStats(window)
+    with pytest.raises(ValueError, match="window must be positive"):
+        FeatureEngine(window=window)
+
+
+def test_out_of_order_samples_count_as_arriving_now():
+    stats = RollingStats(window=1.0)
+    stats.push(10.0, 1.0)
+    stats.push(9.0, 3.0)  # late; kept instead of being expired at once
+    assert (len(stats), stats.mean) == (2, 2.0)
+    stats.push(10.5, 5.0)
+    stats.push(11.2, 7.0)
+    assert (len(stats), stats.min) == (2, 5.0)
+
+
+def test_peaks_need_to_fall_below_the_hysteresis_band():
+    detector = PeakDetector(threshold=10.0, hysteresis=2.0)
+    ended = [detector.push(float(t), value) for t, value in enumerate([5, 11, 9, 14, 7, 12, 3])]
+    # 9 is still within the band, so 11 -> 9 -> 14 is one peak
+    assert [peak for peak in ended if peak] == [(3.0, 14), (5.0, 12)]
+    assert detector.count == 2
+
+
+def test_peaks_closer_than_min_interval_are_ignored():
+    detector = PeakDetector(threshold=10.0, min_interval=1.0)
+    for t, value in [(0.0, 12), (0.1, 0), (0.5, 13), (0.6, 0), (1.2, 11), (1.3, 0)]:
+        detector.push(t, value)
+    assert detector.count == 2
+
+
+def test_engine_keeps_state_per_key():
+    engine = FeatureEngine(window=10.0, threshold=50.0)
+    peaks = engine.update_many(
+        [(1, 1), (1, 2), (1, 1), (1, 2), (1, 1)],
+        [0.0, 0.0, 1.0, 1.0, 2.0],
+        [10.0, 60.0, 20.0, 0.0, 30.0],
+    )
+    assert peaks == [((1, 2), 0.0, 60.0)]
+    assert engine.update((2, 1), 0.0, 55.0) is None
+    assert len(engine) == 3
+
+    snapshot = engine.snapshot()
+    assert snapshot[(1, 1)]["mean"] == pytest.approx(20.0)
+    assert snapshot[(1, 1)]["std"] == pytest.approx(np.std([10.0, 20.0, 30.0]))
+    assert snapshot[(1, 1)]["range"] == 20.0
+    assert (snapshot[(1, 1)]["peaks"], snapshot[(1, 2)]["peaks"]) == (0, 1)
+    assert snapshot[(1, 2)]["highest_peak"] == 60.0
+    # A peak that has not ended yet is not counted
+    assert snapshot[(2, 1)]["peaks"] == 0
+    assert FeatureEngine().snapshot() == {} and FeatureEngine().update(1, 0.0, 1.0) is None
@@ -0,0 +1,139 @@
+import pytest
+
+from backend.local_server import start_server
+from utils.api_requests import SensorVestClient
+
+
+@pytest.fixture
+def vests(lambda_db, invoke):
+    return [
+        invoke(lambda_db, "POST", "/vests", body={"name": f"Vest {i}", "is_active": i % 3 != 0}).body
+        for i in range(7)
+    ]
+
+
+def vest_ids(result):
+    assert result.status == 200
+    return [vest["vest_id"] for vest in result.body]
+
+
+def test_vests_are_filtered_in_the_database(lambda_db, vests, invoke):
+    ids = [vest["vest_id"] for vest in vests]
+    wanted = f"{ids[1]},{ids[4]}"
+    assert vest_ids(invoke(lambda_db, "GET", "/vests", query={"vest_ids": wanted})) == [ids[1], ids[4]]
+    active = vest_ids(invoke(lambda_db, "GET", "/vests", query={"is_active": "true"}))
+    assert active == [vest["vest_id"] for vest in vests if vest["is_active"]]
+    inactive = invoke(lambda_db, "GET", "/vests", query={"is_active": "false", "include": "sensor_count"})
+    assert [vest["sensor_count"] for vest in inactive.body] == [0, 0, 0]
+    assert invoke(lambda_db, "GET", "/vests", query={"is_active": "maybe"}).status == 400
+
+
+def test_sensor_counts_come_from_one_grouped_query(lambda_db, vests, invoke):
+    sensor_ids = {}
+    for vest, count in zip(vests[:3], [0, 2, 3]):
+        sensor_ids[vest["vest_id"]] = [
+            invoke(lambda_db, "POST", "/sensors", body={
+                "vest_id": vest["vest_id"], "sensor_type_id": 1, "position": f"position {i}", "is_active": i != 1,
+            }).body["sensor_id"]
+            for i in range(count)
+        ]
+    ids = ",".join(str(vest_id) for vest_id in sensor_ids)
+
+    counted = invoke(lambda_db, "GET", "/vests", query={"vest_ids": ids, "include": "sensor_count"}).body
+    # Every sensor counts, inactive ones included, and vests without sensors count 0
+    assert [(vest["vest_id"], vest["sensor_count"]) for vest in counted] == [
+        (vest_id, len(ids_of_vest)) for vest_id, ids_of_vest in sensor_ids.items()
+    ]
+    plain = invoke(lambda_db, "GET", "/vests", query={"vest_ids": ids}).body
+    assert [vest["vest_id"] for vest in plain] == list(sensor_ids)
+    assert all("sensor_count" not in vest for vest in plain)
+
+    sensors = invoke(lambda_db, "GET", "/sensors", query={"vest_ids": ids}).body
+    assert [sensor["sensor_id"] for sensor in sensors] == sum(sensor_ids.values(), [])
+
+
+def test_vests_are_counted_without_being_listed(lambda_db, vests, invoke):
+    active = invoke(lambda_db, "GET", "/vests", query={"is_active": "true", "include": "count"})
+    assert (active.status, active.body) == (200, {"count": 4})
+    ids = f"{vests[0]['vest_id']},{vests[1]['vest_id']}"
+    chosen = invoke(lambda_db, "GET", "/vests", query={"vest_ids": ids, "is_active": "false", "include": "count"})
+    assert chosen.body == {"count": 1}
+    # Paging options do not cap the count
+    assert invoke(lambda_db, "GET", "/vests", query={"limit": "2", "include": "count"}).body == {"count": 7}
+
+
+def test_unhandled_errors_are_logged_with_their_traceback(lambda_db, invoke, monkeypatch, caplog):
+    def broken(cur, sql, params=None):
+        raise RuntimeError("query planner on fire")
+
+    monkeypatch.setattr(lambda_db.db_connector, "execute", broken)
+    result = invoke(lambda_db, "GET", "/vests")
+    assert (result.status, result.body) == (500, {"error": "Internal server error"})
+    [record] = [record for record in caplog.records if record.name == "backend.lambda_function"]
+    assert record.getMessage() == "Unhandled error for GET /vests"
+    assert record.exc_info[0] is RuntimeError and "query planner on fire" in caplog.text
+
+
+@pytest.mark.parametrize("include", [None, "sensor_count"])
+def test_vests_page_by_cursor(lambda_db, vests, invoke, include):
+    pages, cursor = [], 0
+    while True:
+        query = {"after_vest_id": str(cursor), "limit": "3"}
+        if include:
+            query["include"] = include
+        page = vest_ids(invoke(lambda_db, "GET", "/vests", query=query))
+        if not page:
+            break
+        pages.append(page)
+        cursor = page[-1]
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert sum(pages, []) == [vest["vest_id"] for vest in vests]
+
+
+def test_unchanged_vest_list_is_a_304(lambda_db, vests, invoke):
+    etag = invoke(lambda_db, "GET", "/vests").headers["ETag"]
+    again = invoke(lambda_db, "GET", "/vests", headers={"If-None-Match": etag})
+    assert (again.status, again.body) == (304, "")
+    assert again.headers["ETag"] == etag
+
+    invoke(lambda_db, "POST", "/vests", body={"name": "One more"})
+    changed = invoke(lambda_db, "GET", "/vests", headers={"If-None-Match": etag})
+    assert changed.status == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_client_revalidates_with_its_etag(lambda_db, vests):
+    server = start_server()
+    client = SensorVestClient(f"http://127.0.0.1:{server.server_port}")
+    statuses = []
+    client.session.hooks["response"].append(lambda response, *args, **kwargs: statuses.append(response.status_code))
+    try:
+        first = client.get_vests(include_sensor_count=True, is_active=True)
+        second = client.get_vests(include_sensor_count=True, is_active=True)
+        assert second == first and len(first) == 4
+        assert statuses == [200, 304]
+        # A different query is a different resource
+        client.get_vests(vest_ids=[vests[0]["vest_id"]])
+        assert statuses[-1] == 200
+        assert client.count_vests(is_active=True) == 4
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def test_revalidated_results_are_copies(lambda_db, vests):
+    server = start_server()
+    client = SensorVestClient(f"http://127.0.0.1:{server.server_port}")
+    try:
+        first = client.get_vests()
+        expected = [dict(vest) for vest in first]
+        first[0]["name"] = "Changed by the caller"
+        first.pop()
+        # Answered by a 304: the caller's changes must not show up in later results
+        second = client.get_vests()
+        assert second == expected
+        second[0]["name"] = "Changed again"
+        assert client.get_vests() == expected
+    finally:
+        client.close()
+        server.shutdown()
@@ -0,0 +1,64 @@
+import threading
+
+from cachetools import TLRUCache
+
+
+class ApiCache:
+    """Size-bounded LRU cache for API responses with a TTL per endpoint.
+
+    Keys are tuples whose first element is the endpoint name (one of the
+    keys of ``ttls``) and whose second element, when present, is the vest
+    the response belongs to.  A single instance is shared by every
+    dashboard session, so all access goes through a lock.
+    """
+
+    def __init__(self, maxsize, ttls, default_ttl=30):
+        self.ttls = dict(ttls)
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._cache = TLRUCache(maxsize=maxsize, ttu=self._time_to_use)
+
+    def _time_to_use(self, key, value, now):
+        return now + self.ttls.get(key[0], self.default_ttl)
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._cache[key] = value
+
+    def invalidate_vest(self, vest_id):
+        """Drop every cached response that belongs to vest_id."""
+        vest_key = str(vest_id)
+        with self._lock:
+            # Expire stale entries first so iteration only sees live keys
+            self._cache.expire()
+            stale = [k for k in self._cache.keys() if len(k) > 1 and str(k[1]) == vest_key]
+            for key in stale:
+                del self._cache[key]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        with self._lock:
+            self._cache.expire()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._cache),
+                "max_entries": self._cache.maxsize,
+            }
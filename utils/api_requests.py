@@ -0,0 +1,377 @@
+import contextlib
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_exponential
+
+import config
+from utils.perf import parse_server_timing
+
+# Gateway errors that are worth retrying; a plain 500 comes from the Lambda itself
+RETRY_STATUS_CODES = (502, 503, 504)
+
+# Exponential backoff between retries: multiplier * 2**n seconds, capped (seconds)
+RETRY_BACKOFF_MULTIPLIER = 0.2
+RETRY_BACKOFF_MAX = 5
+
+# Columnar wire format offered by the measurement endpoints
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+
+# GET responses remembered for If-None-Match revalidation
+ETAG_CACHE_SIZE = 256
+
+
+class ApiError(Exception):
+    """Raised when the Sensor Vest API answers with a non-2xx status."""
+
+    def __init__(self, status_code, message=""):
+        super().__init__(f"HTTP {status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+def _is_transient(exc):
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    return isinstance(exc, ApiError) and exc.status_code in RETRY_STATUS_CODES
+
+
+def _as_frame(result):
+    # pandas and pyarrow load on first use; pages showing no measurements never pay for them
+    import pandas as pd
+    import pyarrow as pa
+
+    if isinstance(result, pa.Table):
+        # Numeric columns without nulls are handed to pandas without copying
+        return result.to_pandas(split_blocks=True, self_destruct=True)
+    return pd.DataFrame.from_records(result or [])
+
+
+def _endpoint(method, path):
+    # Ids are replaced so timings group by route rather than by vest
+    return f"{method} " + re.sub(r"/\d+(?=/|$)", "/{id}", path)
+
+
+def _is_connect_failure(exc):
+    # The request never reached the server, so a POST is safe to resend
+    return isinstance(exc, requests.ConnectTimeout)
+
+
+class SensorVestClient:
+    """HTTP client for the Sensor Vest API (see apiREADME.md).
+
+    One instance holds a pooled keep-alive session, so TLS handshakes are
+    paid once per connection rather than once per call.  GET requests are
+    retried with exponential backoff on connection errors and gateway
+    failures; POST requests are only retried when the connection could not
+    be opened at all, except bulk ingest, which is safe to resend.
+
+    timing_hook, if given, is called after every response as
+    timing_hook(endpoint, timings) with the durations in seconds of the
+    round trip, the body decode, and the server's Server-Timing phases
+    (server total, db, pool, encode); "network" is round trip minus server
+    time, i.e. API Gateway, Lambda overhead and the wire.
+
+    JSON GET responses that carry an ETag are remembered, and the next
+    identical GET sends If-None-Match; a 304 answer returns the remembered
+    result without downloading it again.  The remembered result is a
+    private copy, so callers may modify what they are given.
+    """
+
+    def __init__(self, base_url=config.API_BASE_URL,
+                 connect_timeout=config.API_CONNECT_TIMEOUT,
+                 read_timeout=config.API_READ_TIMEOUT,
+                 max_retries=config.API_MAX_RETRIES,
+                 pool_size=config.API_POOL_SIZE, timing_hook=None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.timing_hook = timing_hook
+        self._etags = OrderedDict()
+        self._etag_lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    def retry_budget(self):
+        """Longest one call can take, in seconds: every attempt timing out, plus the backoff between them."""
+        connect_timeout, read_timeout = self.timeout
+        backoff = sum(min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_MULTIPLIER * 2 ** n) for n in range(self.max_retries - 1))
+        return self.max_retries * (connect_timeout + read_timeout) + backoff
+
+    def _remembered(self, key):
+        with self._etag_lock:
+            entry = self._etags.get(key)
+            if entry is not None:
+                self._etags.move_to_end(key)
+            return entry
+
+    def _remember(self, key, etag, result):
+        with self._etag_lock:
+            self._etags[key] = (etag, result)
+            self._etags.move_to_end(key)
+            while len(self._etags) > ETAG_CACHE_SIZE:
+                self._etags.popitem(last=False)
+
+    def _send(self, method, path, params=None, json=None, headers=None, data=None, raw=False):
+        key = remembered = None
+        if method == "GET":
+            key = (path, tuple(sorted((params or {}).items())))
+            remembered = self._remembered(key)
+            if remembered is not None:
+                headers = {**(headers or {}), "If-None-Match": remembered[0]}
+        start = time.perf_counter()
+        response = self.session.request(
+            method,
+            f"{self.base_url}{path}",
+            params=params,
+            json=json,
+            data=data,
+            headers=headers,
+            timeout=self.timeout,
+        )
+        received = time.perf_counter()
+        try:
+            if response.status_code == 304 and remembered is not None:
+                return copy.deepcopy(remembered[1])
+            if response.status_code >= 400:
+                raise ApiError(response.status_code, response.text)
+            if raw:
+                return response.content, response.headers
+            if not response.content:
+                return None
+            if response.headers.get("Content-Type", "").startswith(ARROW_STREAM_TYPE):
+                import pyarrow as pa
+
+                return pa.ipc.open_stream(response.content).read_all()
+            result = response.json()
+            if key is not None and "ETag" in response.headers:
+                self._remember(key, response.headers["ETag"], copy.deepcopy(result))
+            return result
+        finally:
+            if self.timing_hook is not None:
+                self._report_timing(method, path, response, received - start, time.perf_counter() - received)
+
+    def _report_timing(self, method, path, response, round_trip, decode):
+        timings = {"round_trip": round_trip, "decode": decode}
+        server = parse_server_timing(response.headers.get("Server-Timing"))
+        if "total" in server:
+            timings["server"] = server.pop("total")
+            timings["network"] = max(0.0, round_trip - timings["server"])
+            timings.update(
+                (phase, seconds) for phase, seconds in server.items() if not phase.startswith("db-")
+            )
+        self.timing_hook(_endpoint(method, path), timings)
+
+    def _request(self, method, path, params=None, json=None, headers=None, data=None, idempotent=None,
+                 raw=False):
+        if idempotent is None:
+            idempotent = method == "GET"
+        retry_on = _is_transient if idempotent else _is_connect_failure
+        retrying = Retrying(
+            stop=stop_after_attempt(self.max_retries),
+            wait=wait_exponential(multiplier=RETRY_BACKOFF_MULTIPLIER, max=RETRY_BACKOFF_MAX),
+            retry=retry_if_exception(retry_on),
+            reraise=True,
+        )
+        return retrying(self._send, method, path, params=params, json=json, headers=headers, data=data, raw=raw)
+
+    # GET operations
+
+    def get_vests(self, include_sensor_count: bool = False, vest_ids=None, is_active: bool = None,
+                  after_vest_id: int = None, limit: int = None) -> list:
+        """GET /vests
+
+        With include_sensor_count each vest also carries a ``sensor_count``.
+        vest_ids and is_active filter on the server; after_vest_id and limit
+        page through the vests in vest_id order.
+        """
+        params = {
+            "include": "sensor_count" if include_sensor_count else None,
+            "vest_ids": ",".join(str(v) for v in vest_ids) if vest_ids is not None else None,
+            "is_active": None if is_active is None else str(is_active).lower(),
+            "after_vest_id": after_vest_id,
+            "limit": limit,
+        }
+        return self._request("GET", "/vests", params={k: v for k, v in params.items() if v is not None})
+
+    def count_vests(self, vest_ids=None, is_active: bool = None) -> int:
+        """GET /vests?include=count (how many vests match, without fetching them)"""
+        params = {
+            "include": "count",
+            "vest_ids": ",".join(str(v) for v in vest_ids) if vest_ids is not None else None,
+            "is_active": None if is_active is None else str(is_active).lower(),
+        }
+        return self._request("GET", "/vests", params={k: v for k, v in params.items() if v is not None})["count"]
+
+    def get_vest(self, vest_id: int) -> dict:
+        """GET /vests/{vest_id}"""
+        return self._request("GET", f"/vests/{vest_id}")
+
+    def get_vest_sensors(self, vest_id: int) -> list:
+        """GET /vests/{vest_id}/sensors"""
+        return self._request("GET", f"/vests/{vest_id}/sensors")
+
+    def get_sensors(self, vest_ids) -> list:
+        """GET /sensors?vest_ids=... (sensors for many vests in one request)"""
+        return self._request(
+            "GET", "/sensors", params={"vest_ids": ",".join(str(v) for v in vest_ids)}
+        )
+
+    def get_recent_measurements(self, vest_id: int, seconds: float = None, since: str = None,
+                                after_measurement_id: int = None, limit: int = None,
+                                as_frame: bool = False, calibrated: bool = False):
+        """GET /vests/{vest_id}/measurements/recent
+
+        Only the parameters that are given are sent; with none of them the
+        server returns the last 10 seconds.  With as_frame the response is
+        requested as Arrow and returned as a DataFrame (position and
+        sensor_type categorical, timestamp UTC); a server that only speaks
+        JSON still works.  calibrated returns values through each sensor's
+        calibration curve.
+        """
+        params = {
+            "seconds": seconds,
+            "since": since,
+            "after_measurement_id": after_measurement_id,
+            "limit": limit,
+            "calibrated": "true" if calibrated else None,
+        }
+        result = self._request(
+            "GET",
+            f"/vests/{vest_id}/measurements/recent",
+            params={k: v for k, v in params.items() if v is not None},
+            headers={"Accept": ARROW_STREAM_TYPE} if as_frame else None,
+        )
+        return _as_frame(result) if as_frame else result
+
+    def get_aggregated_measurements(self, vest_id: int, bucket: str = "1m",
+                                    agg=("mean", "min", "max"), seconds: float = None,
+                                    as_frame: bool = False, calibrated: bool = False):
+        """GET /vests/{vest_id}/measurements/aggregate
+
+        as_frame and calibrated work as in get_recent_measurements.
+        """
+        params = {"bucket": bucket, "agg": ",".join(agg)}
+        if seconds is not None:
+            params["seconds"] = seconds
+        if calibrated:
+            params["calibrated"] = "true"
+        result = self._request(
+            "GET",
+            f"/vests/{vest_id}/measurements/aggregate",
+            params=params,
+            headers={"Accept": ARROW_STREAM_TYPE} if as_frame else None,
+        )
+        return _as_frame(result) if as_frame else result
+
+    def export_measurements(self, destination, vest_ids, format: str = "csv", start: str = None,
+                            end: str = None, sensor_ids=None, bucket: str = None, calibrated: bool = False,
+                            page_size: int = None, progress=None) -> int:
+        """GET /measurements/export, following X-Next-Cursor to the last page
+
+        Each page is written to destination (a path or a binary file) as it
+        arrives, so memory use stays at one page however long the export.
+        CSV pages are appended as they are; Parquet pages each become one
+        row group of a single file.  progress, if given, is called with the
+        running row count after every page.  Returns the number of rows.
+        """
+        params = {
+            "vest_ids": ",".join(str(v) for v in vest_ids),
+            "format": format,
+            "start": start,
+            "end": end,
+            "sensor_ids": ",".join(str(s) for s in sensor_ids) if sensor_ids else None,
+            "bucket": bucket,
+            "calibrated": "true" if calibrated else None,
+            "limit": page_size,
+        }
+        params = {k: v for k, v in params.items() if v is not None}
+        rows = 0
+        with contextlib.ExitStack() as stack:
+            if hasattr(destination, "write"):
+                out = destination
+            else:
+                out = stack.enter_context(open(destination, "wb"))
+            writer = None
+            while True:
+                content, headers = self._request("GET", "/measurements/export", params=params, raw=True)
+                if format == "parquet":
+                    import pyarrow as pa
+                    import pyarrow.parquet as pq
+
+                    table = pq.read_table(pa.BufferReader(content))
+                    if writer is None:
+                        writer = stack.enter_context(pq.ParquetWriter(out, table.schema, compression="zstd"))
+                    writer.write_table(table)
+                else:
+                    out.write(content)
+                rows += int(headers.get("X-Row-Count", 0))
+                if progress is not None:
+                    progress(rows)
+                if "X-Next-Cursor" not in headers:
+                    return rows
+                params["cursor"] = headers["X-Next-Cursor"]
+
+    # POST operations
+
+    def create_vest(self, name: str, description: str = None, is_active: bool = True) -> dict:
+        """POST /vests"""
+        vest = {"name": name, "is_active": is_active}
+        if description is not None:
+            vest["description"] = description
+        return self._request("POST", "/vests", json=vest)
+
+    def create_sensor(self, vest_id: int, sensor_type_id: int, position: str,
+                      calibration_data=None, is_active: bool = True) -> dict:
+        """POST /sensors"""
+        sensor = {
+            "vest_id": vest_id,
+            "sensor_type_id": sensor_type_id,
+            "position": position,
+            "is_active": is_active,
+        }
+        if calibration_data is not None:
+            sensor["calibration_data"] = calibration_data
+        return self._request("POST", "/sensors", json=sensor)
+
+    def add_measurements(self, measurements) -> list:
+        """POST /measurements
+
+        Accepts a single measurement object, a list of them, or the
+        ``{"measurements": [...]}`` wrapper, and sends it unchanged.
+        """
+        return self._request("POST", "/measurements", json=measurements)
+
+    def bulk_add_measurements(self, measurements: list) -> dict:
+        """POST /measurements/bulk
+
+        Returns the batch counts (received, accepted, duplicates, rejected).
+        Resending a batch whose rows carry timestamps only adds duplicates,
+        so this is retried like a GET.
+        """
+        return self._request(
+            "POST", "/measurements/bulk", json={"measurements": measurements}, idempotent=True
+        )
+
+    def bulk_add_measurements_gzip(self, body: bytes) -> dict:
+        """POST /measurements/bulk with an already gzip-compressed body
+
+        body is the gzipped JSON of {"measurements": [...]}; the response is
+        the same as for bulk_add_measurements.
+        """
+        return self._request(
+            "POST", "/measurements/bulk", data=body,
+            headers={"Content-Encoding": "gzip"}, idempotent=True,
+        )
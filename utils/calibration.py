@@ -0,0 +1,253 @@
+"""Per-sensor calibration of raw readings.
+
+A sensor's calibration_data column holds one of these JSON shapes:
+
+    {"offset": 0.5, "scale": 1.2}                  value * scale + offset
+    {"type": "polynomial", "coefficients": [c0, c1, c2]}
+                                                   c0 + c1*value + c2*value**2
+    {"type": "piecewise", "points": [[0, 0], [10, 12.5], [20, 31]]}
+                                                   linear between (raw, calibrated)
+                                                   points, clamped past the ends
+
+"multiplier" is accepted as a synonym for "scale", and a missing or empty
+blob means no calibration.  A Calibration applies to a whole NumPy array
+at once (apply), or renders as a SQL expression (sql) so aggregate
+queries can calibrate rows before reducing them.
+
+Parsing is done once per sensor: CalibrationCache keeps the parsed curve
+by sensor_id together with the blob it came from, and parses again only
+when the sensor's blob has changed.
+"""
+import json
+import math
+import threading
+
+import numpy as np
+
+
+class CalibrationError(ValueError):
+    """Raised for calibration_data that does not describe a known curve."""
+
+
+def _number(value, name):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise CalibrationError(f"{name} must be a finite number")
+    return float(value)
+
+
+class Calibration:
+    """Base class: the identity calibration."""
+
+    kind = "identity"
+
+    @property
+    def linear(self):
+        """(scale, offset) when the curve is linear, else None."""
+        return (1.0, 0.0)
+
+    def apply(self, values):
+        return np.asarray(values, dtype="float64")
+
+    def sql(self, value):
+        return value
+
+    def __eq__(self, other):
+        return type(self) is type(other) and vars(self) == vars(other)
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in vars(self).items())
+        return f"{type(self).__name__}({fields})"
+
+
+class LinearCalibration(Calibration):
+    kind = "linear"
+
+    def __init__(self, scale=1.0, offset=0.0):
+        self.scale = scale
+        self.offset = offset
+
+    @property
+    def linear(self):
+        return (self.scale, self.offset)
+
+    def apply(self, values):
+        return np.asarray(values, dtype="float64") * self.scale + self.offset
+
+    def sql(self, value):
+        return f"({value} * {self.scale!r} + {self.offset!r})"
+
+
+class PolynomialCalibration(Calibration):
+    kind = "polynomial"
+
+    def __init__(self, coefficients):
+        self.coefficients = list(coefficients)  # lowest power first
+
+    @property
+    def linear(self):
+        if len(self.coefficients) > 2:
+            return None
+        offset, scale = (self.coefficients + [0.0])[:2]
+        return (scale, offset)
+
+    def apply(self, values):
+        values = np.asarray(values, dtype="float64")
+        # Horner's rule: one multiply-add over the array per coefficient
+        result = np.full_like(values, self.coefficients[-1])
+        for coefficient in reversed(self.coefficients[:-1]):
+            result *= values
+            result += coefficient
+        return result
+
+    def sql(self, value):
+        expression = repr(self.coefficients[-1])
+        for coefficient in reversed(self.coefficients[:-1]):
+            expression = f"({expression} * {value} + {coefficient!r})"
+        return expression
+
+
+class PiecewiseCalibration(Calibration):
+    kind = "piecewise"
+
+    def __init__(self, raw, calibrated):
+        self.raw = list(raw)  # strictly increasing
+        self.calibrated = list(calibrated)
+
+    @property
+    def linear(self):
+        return None
+
+    def apply(self, values):
+        return np.interp(np.asarray(values, dtype="float64"), self.raw, self.calibrated)
+
+    def sql(self, value):
+        # Same result as np.interp: clamped below the first and above the last point
+        cases = [f"WHEN {value} <= {self.raw[0]!r} THEN {self.calibrated[0]!r}"]
+        for (x0, x1), (y0, y1) in zip(zip(self.raw, self.raw[1:]), zip(self.calibrated, self.calibrated[1:])):
+            slope = (y1 - y0) / (x1 - x0)
+            cases.append(f"WHEN {value} <= {x1!r} THEN {y0!r} + ({value} - {x0!r}) * {slope!r}")
+        return f"(CASE {' '.join(cases)} ELSE {self.calibrated[-1]!r} END)"
+
+
+IDENTITY = Calibration()
+
+
+def parse_calibration(blob):
+    """Calibration for a calibration_data value (JSON text, a dict, or None)."""
+    if blob is None or blob == "":
+        return IDENTITY
+    if isinstance(blob, str):
+        try:
+            blob = json.loads(blob)
+        except ValueError:
+            raise CalibrationError("calibration_data is not valid JSON")
+    if not isinstance(blob, dict):
+        raise CalibrationError("calibration_data must be a JSON object")
+    if not blob:
+        return IDENTITY
+
+    kind = blob.get("type", "linear")
+    if kind == "linear":
+        if "scale" in blob and "multiplier" in blob:
+            raise CalibrationError("Give either scale or multiplier, not both")
+        scale = _number(blob.get("scale", blob.get("multiplier", 1.0)), "scale")
+        offset = _number(blob.get("offset", 0.0), "offset")
+        return LinearCalibration(scale, offset)
+    if kind == "polynomial":
+        coefficients = blob.get("coefficients")
+        if not isinstance(coefficients, list) or not coefficients:
+            raise CalibrationError("coefficients must be a non-empty list, lowest power first")
+        return PolynomialCalibration(_number(c, "coefficients[]") for c in coefficients)
+    if kind == "piecewise":
+        points = blob.get("points")
+        if not isinstance(points, list) or len(points) < 2:
+            raise CalibrationError("points must list at least two [raw, calibrated] pairs")
+        if not all(isinstance(p, (list, tuple)) and len(p) == 2 for p in points):
+            raise CalibrationError("points must be [raw, calibrated] pairs")
+        raw = [_number(p[0], "points[][0]") for p in points]
+        calibrated = [_number(p[1], "points[][1]") for p in points]
+        if any(b <= a for a, b in zip(raw, raw[1:])):
+            raise CalibrationError("points must be in strictly increasing raw order")
+        return PiecewiseCalibration(raw, calibrated)
+    raise CalibrationError(f"Unknown calibration type: {kind}")
+
+
+class CalibrationCache:
+    """Parsed calibrations by sensor_id, re-parsed when a sensor's blob changes.
+
+    A blob that does not parse is cached as the identity, so a bad row
+    written before validation existed shows raw values instead of failing
+    every request; get() reports it through the errors dict.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.errors = {}
+
+    def get(self, sensor_id, blob):
+        key = blob if isinstance(blob, (str, type(None))) else json.dumps(blob, sort_keys=True)
+        with self._lock:
+            entry = self._entries.get(sensor_id)
+            if entry is not None and entry[0] == key:
+                return entry[1]
+        try:
+            calibration = parse_calibration(blob)
+            error = None
+        except CalibrationError as e:
+            calibration, error = IDENTITY, str(e)
+        with self._lock:
+            self._entries[sensor_id] = (key, calibration)
+            if error is None:
+                self.errors.pop(sensor_id, None)
+            else:
+                self.errors[sensor_id] = error
+        return calibration
+
+    def for_sensors(self, sensors):
+        """{sensor_id: Calibration} for sensor rows carrying calibration_data."""
+        return {s["sensor_id"]: self.get(s["sensor_id"], s.get("calibration_data")) for s in sensors}
+
+    def invalidate(self, sensor_id=None):
+        with self._lock:
+            if sensor_id is None:
+                self._entries.clear()
+                self.errors.clear()
+            else:
+                self._entries.pop(sensor_id, None)
+                self.errors.pop(sensor_id, None)
+
+
+def apply_calibrations(sensor_ids, values, calibrations):
+    """Calibrated copy of values, each row by its sensor's curve.
+
+    One vectorized apply per sensor; sensors missing from calibrations
+    keep their raw values.
+    """
+    sensor_ids = np.asarray(sensor_ids)
+    result = np.array(values, dtype="float64")
+    if not len(result):
+        return result
+    for sensor_id in np.unique(sensor_ids):
+        calibration = calibrations.get(int(sensor_id), IDENTITY)
+        if calibration is IDENTITY:
+            continue
+        rows = sensor_ids == sensor_id
+        result[rows] = calibration.apply(result[rows])
+    return result
+
+
+def calibration_sql(calibrations, value, sensor_column="m.sensor_id"):
+    """SQL expression calibrating value by the sensor in sensor_column.
+
+    Sensor ids come from the database and the curves' numbers are finite
+    floats, so the expression is safe to inline.
+    """
+    cases = [
+        f"WHEN {int(sensor_id)} THEN {calibration.sql(value)}"
+        for sensor_id, calibration in sorted(calibrations.items())
+        if calibration is not IDENTITY
+    ]
+    if not cases:
+        return value
+    return f"(CASE {sensor_column} {' '.join(cases)} ELSE {value} END)"
@@ -0,0 +1,248 @@
+"""PostgreSQL connection pool shared by the backend.
+
+The pool is created on first use and lives as long as the process, so warm
+Lambda invocations and the request threads of backend/local_server.py reuse
+open connections instead of paying connection setup per request.  It never
+holds more than DB_POOL_MAX connections: when all of them are checked out,
+callers wait up to DB_POOL_TIMEOUT seconds and then get PoolTimeout.
+Connections that sat idle for a while are pinged before being handed out,
+and broken ones are replaced.
+
+Queries run through execute() are prepared server-side the first time a
+connection sees them and EXECUTEd from then on, so the hot queries behind
+each endpoint are parsed and planned once per connection.  Time spent
+waiting for a connection and running queries is added to the current
+request's timing (utils/perf.py), which the Lambda reports as Server-Timing.
+"""
+import functools
+import hashlib
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+
+from utils import perf
+
+# Connection settings come from the environment.
+# DATABASE_URL takes precedence over the individual DB_* variables.
+DATABASE_URL = os.environ.get("DATABASE_URL")
+DB_CONFIG = {
+    "host": os.environ.get("DB_HOST", "localhost"),
+    "port": int(os.environ.get("DB_PORT", "5432")),
+    "dbname": os.environ.get("DB_NAME", "sensor_vest"),
+    "user": os.environ.get("DB_USER", "postgres"),
+    "password": os.environ.get("DB_PASSWORD", ""),
+}
+
+# Pool bounds.  Connections are opened lazily, so a Lambda container that
+# serves one request at a time only ever opens one.
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", "0"))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", "5"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))
+# Connections idle for longer than this are pinged before reuse
+DB_HEALTH_CHECK_SECONDS = float(os.environ.get("DB_HEALTH_CHECK_SECONDS", "30"))
+
+# Prepared statements kept per connection; further queries run unprepared
+MAX_PREPARED_STATEMENTS = 200
+# Postgres only switches a prepared statement to its cached generic plan when
+# that looks no costlier than planning each call, and on the partitioned
+# measurements table it never does.  Forcing it lets partition pruning
+# happen at execution time instead of re-planning every request.
+DB_PLAN_CACHE_MODE = os.environ.get("DB_PLAN_CACHE_MODE", "force_generic_plan")
+
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free in time."""
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """Connection that remembers which statements it has prepared."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.last_used = time.monotonic()
+
+
+def connect(dsn=None):
+    """Open a single connection outside the pool (e.g. for LISTEN)."""
+    dsn = dsn or DATABASE_URL
+    if dsn:
+        conn = psycopg2.connect(dsn, connection_factory=PreparingConnection)
+    else:
+        conn = psycopg2.connect(connection_factory=PreparingConnection, **DB_CONFIG)
+    if DB_PLAN_CACHE_MODE:
+        with conn.cursor() as cur:
+            cur.execute("SELECT set_config('plan_cache_mode', %s, false)", (DB_PLAN_CACHE_MODE,))
+        conn.commit()
+    return conn
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of PreparingConnections."""
+
+    def __init__(self, dsn=None, min_size=DB_POOL_MIN, max_size=DB_POOL_MAX,
+                 timeout=DB_POOL_TIMEOUT, health_check_seconds=DB_HEALTH_CHECK_SECONDS):
+        self.dsn = dsn
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_seconds = health_check_seconds
+        self.opened = 0
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(min(min_size, max_size)):
+            self._idle.append(self._open())
+
+    def _open(self):
+        conn = connect(self.dsn)
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self.opened -= 1
+        if not conn.closed:
+            conn.close()
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used < self.health_check_seconds:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        if self._closed:
+            raise psycopg2.InterfaceError("connection pool is closed")
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No database connection free after {self.timeout}s")
+        try:
+            while True:
+                with self._lock:
+                    # Most recently used first: it is the least likely to have gone stale
+                    conn = self._idle.pop() if self._idle else None
+                if conn is None:
+                    return self._open()
+                if self._is_healthy(conn):
+                    return conn
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn):
+        try:
+            status = conn.info.transaction_status if not conn.closed else None
+            if status == psycopg2.extensions.TRANSACTION_STATUS_INTRANS \
+                    or status == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+                conn.rollback()
+                status = conn.info.transaction_status
+            if self._closed or status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                self._discard(conn)
+            else:
+                conn.last_used = time.monotonic()
+                with self._lock:
+                    self._idle.append(conn)
+        except psycopg2.Error:
+            self._discard(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of the with block."""
+        with perf.phase("pool"):
+            conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+            opened = self.opened
+        return {"max_size": self.max_size, "open": opened, "idle": idle, "in_use": opened - idle}
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+
+# One pool per process, reused across warm Lambda invocations
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
+
+
+def connection():
+    """Check out a connection from the process-wide pool."""
+    return get_pool().connection()
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile(sql):
+    """Rewrite %s / %(name)s placeholders as $n for PREPARE."""
+    order = []
+
+    def replace(match):
+        if match.group(0) == "%%":
+            return "%"
+        key = match.group(1) if match.group(1) is not None else len(order)
+        if key in order:
+            return f"${order.index(key) + 1}"
+        order.append(key)
+        return f"${len(order)}"
+
+    statement = _PLACEHOLDER.sub(replace, sql)
+    name = "ps_" + hashlib.md5(sql.encode("utf-8")).hexdigest()[:20]
+    return name, statement, tuple(order)
+
+
+def execute(cur, sql, params=None):
+    """Run sql on cur as a server-side prepared statement.
+
+    sql and params are written as for cursor.execute().  Cursors on
+    connections that did not come from connect() fall back to a plain
+    execute.
+    """
+    with perf.phase("db"):
+        prepared = getattr(cur.connection, "prepared", None)
+        if prepared is None:
+            return cur.execute(sql, params)
+        name, statement, order = _compile(sql)
+        if name not in prepared:
+            if len(prepared) >= MAX_PREPARED_STATEMENTS:
+                return cur.execute(sql, params)
+            cur.execute(f"PREPARE {name} AS {statement}")
+            prepared.add(name)
+        if not order:
+            return cur.execute(f"EXECUTE {name}")
+        values = [params[key] for key in order]
+        return cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(values))})", values)
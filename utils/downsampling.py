@@ -0,0 +1,105 @@
+"""Downsampling of time series for plotting.
+
+Every function returns the sorted indices of the points to keep, so the
+plotted points are always real samples with their real values.  Work is
+done with NumPy array operations; the only Python loop is over output
+buckets, never over input points.
+"""
+import numpy as np
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if x.dtype.kind in "mM":
+        # datetime64 / timedelta64 -> integer ticks
+        return x.astype("int64").astype("float64")
+    return x.astype("float64", copy=False)
+
+
+def minmax_indices(y, n_buckets):
+    """Indices of the minimum and maximum of y in each of n_buckets equal-count buckets."""
+    y = np.asarray(y, dtype="float64")
+    n = len(y)
+    if n_buckets >= n:
+        return np.arange(n)
+
+    size = -(-n // n_buckets)
+    rows = -(-n // size)
+    # Pad the last bucket so the series reshapes into one row per bucket
+    low = np.full(rows * size, np.inf)
+    high = np.full(rows * size, -np.inf)
+    low[:n] = y
+    high[:n] = y
+    offsets = np.arange(rows) * size
+    argmin = low.reshape(rows, size).argmin(axis=1) + offsets
+    argmax = high.reshape(rows, size).argmax(axis=1) + offsets
+    return np.unique(np.concatenate([argmin, argmax]))
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets selection of n_out points.
+
+    x must be sorted ascending. The first and last points are always kept.
+    """
+    x = _as_float(x)
+    y = np.asarray(y, dtype="float64")
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # n_out - 2 interior buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[:edges[-1]], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[:edges[-1]], edges[:-1]) / counts
+    # Each bucket is scored against the average of the bucket after it;
+    # the last interior bucket uses the final point
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for b in range(n_out - 2):
+        start, stop = edges[b], edges[b + 1]
+        xs = x[start:stop]
+        ys = y[start:stop]
+        area = np.abs((x[a] - next_x[b]) * (ys - y[a]) - (x[a] - xs) * (next_y[b] - y[a]))
+        a = start + int(area.argmax())
+        selected[b + 1] = a
+    return selected
+
+
+def downsample(x, y, n_out, method="minmax_lttb", minmax_ratio=4):
+    """Indices of at most about n_out points of (x, y) to plot.
+
+    method:
+        "lttb"         Largest-Triangle-Three-Buckets over all points
+        "minmax"       per-bucket minimum and maximum (n_out / 2 buckets)
+        "minmax_lttb"  min/max preselection of n_out * minmax_ratio points,
+                       then LTTB over those, so peaks survive the selection
+
+    Non-finite values are skipped, and the global minimum and maximum are
+    always included so chart hover shows the real extremes.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype="float64")
+    finite = np.flatnonzero(np.isfinite(y))
+    if len(finite) <= n_out:
+        return finite
+    xf, yf = x[finite], y[finite]
+
+    if method == "lttb":
+        keep = lttb_indices(xf, yf, n_out)
+    elif method == "minmax":
+        keep = minmax_indices(yf, max(1, n_out // 2))
+    elif method == "minmax_lttb":
+        candidates = minmax_indices(yf, max(1, n_out * minmax_ratio // 2))
+        candidates = np.union1d(candidates, [0, len(yf) - 1])
+        keep = candidates[lttb_indices(xf[candidates], yf[candidates], n_out)]
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+
+    keep = np.union1d(keep, [yf.argmin(), yf.argmax()])
+    return finite[keep]
@@ -0,0 +1,264 @@
+"""Disk cache of measurement history, so a new session starts warm.
+
+Rows are stored per vest as Parquet files partitioned by (UTC) day:
+
+    {root}/vest_{vest_id}/{YYYY-MM-DD}/{first_id}-{last_id}.parquet
+
+Part files are immutable and written under a temporary name, then renamed
+into place, so a reader never sees a half-written file.  Each vest has a
+lock file that writers hold exclusively and readers hold shared, which
+makes the cache safe to use from several Streamlit worker processes at
+once.  Because every row has a measurement_id, the newest cached id is the
+cursor for fetching the rest from the API, and rows a concurrent writer
+already stored are dropped instead of duplicated.
+
+When the cache grows past max_bytes, whole days are evicted, oldest first.
+Each instance keeps a running total of the bytes it has written, compacted
+and deleted, so an append does not walk the whole tree.  The tree is only
+scanned on first use, when the total passes max_bytes, and every
+RESCAN_INTERVAL seconds to pick up what other processes wrote.
+"""
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Column types on disk; matches the Arrow responses of the measurement endpoints
+HISTORY_SCHEMA = pa.schema([
+    ("measurement_id", pa.int64()),
+    ("sensor_id", pa.int32()),
+    ("vest_id", pa.int32()),
+    ("timestamp", pa.timestamp("us", tz="UTC")),
+    ("value", pa.float64()),
+    ("additional_data", pa.string()),
+    ("position", pa.dictionary(pa.int32(), pa.string())),
+    ("sensor_type", pa.dictionary(pa.int32(), pa.string())),
+])
+
+# A day with more part files than this is rewritten as a single file
+MAX_PARTS_PER_DAY = 8
+
+# Longest time (seconds) the running size total goes without a full scan
+RESCAN_INTERVAL = 300
+
+_PART_NAME = re.compile(r"^(\d{20})-(\d{20})\.parquet$")
+_DAY_NAME = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+@contextmanager
+def _file_lock(path, shared=False):
+    with open(path, "a+b") as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+        else:
+            # msvcrt has no shared locks; readers lock exclusively too
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _to_table(frame):
+    """Normalize a measurements DataFrame (Arrow- or JSON-decoded) to HISTORY_SCHEMA."""
+    frame = frame.reindex(columns=HISTORY_SCHEMA.names)
+    if not pd.api.types.is_datetime64_any_dtype(frame["timestamp"]):
+        frame["timestamp"] = pd.to_datetime(frame["timestamp"], utc=True, format="ISO8601")
+    return pa.Table.from_pandas(frame, preserve_index=False).cast(HISTORY_SCHEMA)
+
+
+class HistoryCache:
+    """Per-vest, day-partitioned Parquet store of measurement rows."""
+
+    def __init__(self, root, max_bytes=2 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+        # Cache size as of the last scan plus this instance's changes since; None until scanned
+        self._bytes = None
+        self._scanned_at = 0.0
+        self._bytes_lock = threading.Lock()
+
+    def _add_bytes(self, delta):
+        with self._bytes_lock:
+            if self._bytes is not None:
+                self._bytes += delta
+
+    def _vest_dir(self, vest_id):
+        return os.path.join(self.root, f"vest_{vest_id}")
+
+    def _lock(self, vest_id, shared=False):
+        return _file_lock(os.path.join(self.root, f"vest_{vest_id}.lock"), shared)
+
+    def _days(self, vest_id):
+        try:
+            return sorted(d for d in os.listdir(self._vest_dir(vest_id)) if _DAY_NAME.match(d))
+        except FileNotFoundError:
+            return []
+
+    def _parts(self, day_dir):
+        try:
+            names = os.listdir(day_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(n for n in names if _PART_NAME.match(n))
+
+    def _last_id(self, vest_id):
+        last_id = 0
+        for day in self._days(vest_id):
+            for name in self._parts(os.path.join(self._vest_dir(vest_id), day)):
+                last_id = max(last_id, int(_PART_NAME.match(name).group(2)))
+        return last_id
+
+    def last_id(self, vest_id):
+        """Newest cached measurement_id for the vest (0 when nothing is cached)."""
+        with self._lock(vest_id, shared=True):
+            return self._last_id(vest_id)
+
+    def read(self, vest_id, since=None, max_rows=None):
+        """Cached rows for the vest in measurement_id order, as a DataFrame.
+
+        since (a tz-aware Timestamp) skips whole days before it and filters
+        the rest; max_rows keeps only the newest rows.
+        """
+        vest_dir = self._vest_dir(vest_id)
+        if since is not None:
+            since = pd.Timestamp(since).tz_convert("UTC")
+        first_day = since.strftime("%Y-%m-%d") if since is not None else ""
+        with self._lock(vest_id, shared=True):
+            tables = [
+                pq.read_table(os.path.join(vest_dir, day, name), schema=HISTORY_SCHEMA)
+                for day in self._days(vest_id) if day >= first_day
+                for name in self._parts(os.path.join(vest_dir, day))
+            ]
+        if not tables:
+            return HISTORY_SCHEMA.empty_table().to_pandas()
+
+        table = pa.concat_tables(tables)
+        table = table.take(pc.sort_indices(table, [("measurement_id", "ascending")]))
+        if since is not None:
+            cutoff = pa.scalar(since, HISTORY_SCHEMA.field("timestamp").type)
+            table = table.filter(pc.greater_equal(table["timestamp"], cutoff))
+        if max_rows is not None and len(table) > max_rows:
+            table = table.slice(len(table) - max_rows)
+        return table.to_pandas()
+
+    def append(self, vest_id, frame):
+        """Store new rows for the vest; returns how many were not cached yet."""
+        if frame is None or len(frame) == 0:
+            return 0
+        table = _to_table(frame)
+        vest_dir = self._vest_dir(vest_id)
+        with self._lock(vest_id):
+            # Another process may have stored some of these rows already
+            table = table.filter(pc.greater(table["measurement_id"], self._last_id(vest_id)))
+            if len(table) == 0:
+                return 0
+            days = pc.strftime(table["timestamp"], format="%Y-%m-%d")
+            for day in pc.unique(days).to_pylist():
+                part = table.filter(pc.equal(days, day))
+                day_dir = os.path.join(vest_dir, day)
+                os.makedirs(day_dir, exist_ok=True)
+                self._write_part(day_dir, part)
+                if len(self._parts(day_dir)) > MAX_PARTS_PER_DAY:
+                    self._compact(day_dir)
+        self.evict()
+        return len(table)
+
+    def _write_part(self, day_dir, table):
+        ids = table["measurement_id"]
+        name = f"{pc.min(ids).as_py():020d}-{pc.max(ids).as_py():020d}.parquet"
+        path = os.path.join(day_dir, name)
+        tmp = os.path.join(day_dir, f".{name}.{os.getpid()}.tmp")
+        pq.write_table(table, tmp, compression="zstd")
+        size = os.path.getsize(tmp)
+        replaced = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp, path)
+        self._add_bytes(size - replaced)
+        return name
+
+    def _compact(self, day_dir):
+        names = self._parts(day_dir)
+        table = pa.concat_tables(
+            pq.read_table(os.path.join(day_dir, name), schema=HISTORY_SCHEMA) for name in names
+        )
+        table = table.take(pc.sort_indices(table, [("measurement_id", "ascending")]))
+        merged = self._write_part(day_dir, table.combine_chunks())
+        for name in names:
+            if name != merged:
+                path = os.path.join(day_dir, name)
+                size = os.path.getsize(path)
+                os.remove(path)
+                self._add_bytes(-size)
+
+    def _day_sizes(self):
+        """(day, vest_id, bytes) for every cached day."""
+        sizes = []
+        for entry in os.scandir(self.root):
+            if not (entry.is_dir() and entry.name.startswith("vest_")):
+                continue
+            vest_id = entry.name[len("vest_"):]
+            for day in self._days(vest_id):
+                day_dir = os.path.join(entry.path, day)
+                size = sum(os.path.getsize(os.path.join(day_dir, n)) for n in self._parts(day_dir))
+                sizes.append((day, vest_id, size))
+        return sizes
+
+    def evict(self):
+        """Drop whole days, oldest first, until the cache fits in max_bytes.
+
+        Returns at once while the running total is within max_bytes and
+        was last checked against the disk less than RESCAN_INTERVAL ago.
+        """
+        with self._bytes_lock:
+            if (self._bytes is not None and self._bytes <= self.max_bytes
+                    and time.monotonic() - self._scanned_at < RESCAN_INTERVAL):
+                return
+        with _file_lock(os.path.join(self.root, ".evict.lock")):
+            scanned_at = time.monotonic()
+            sizes = sorted(self._day_sizes())
+            total = sum(size for _, _, size in sizes)
+            for day, vest_id, size in sizes:
+                if total <= self.max_bytes:
+                    break
+                with self._lock(vest_id):
+                    shutil.rmtree(os.path.join(self._vest_dir(vest_id), day), ignore_errors=True)
+                total -= size
+            with self._bytes_lock:
+                self._bytes, self._scanned_at = total, scanned_at
+
+    def stats(self):
+        sizes = self._day_sizes()
+        return {
+            "vests": len({vest_id for _, vest_id, _ in sizes}),
+            "days": len(sizes),
+            "bytes": sum(size for _, _, size in sizes),
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self):
+        for entry in os.scandir(self.root):
+            if entry.is_dir() and entry.name.startswith("vest_"):
+                with self._lock(entry.name[len("vest_"):]):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+        with self._bytes_lock:
+            self._bytes = None
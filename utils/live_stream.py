@@ -0,0 +1,130 @@
+import json
+import threading
+import time
+from collections import deque
+
+import requests
+
+
+class RingBuffer:
+    """Fixed-capacity buffer of the most recent rows, safe to share between threads."""
+
+    def __init__(self, capacity):
+        self._rows = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        # Total rows ever appended, so readers can tell when something changed
+        self.total = 0
+
+    def extend(self, rows):
+        with self._lock:
+            self._rows.extend(rows)
+            self.total += len(rows)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+
+def iter_sse_events(lines):
+    """Yield (event, data, id) tuples from an iterable of Server-Sent Events lines.
+
+    An event that only carries an id is yielded with empty data, so the
+    caller can still advance its Last-Event-ID.
+    """
+    event, data, event_id = "message", [], None
+    for line in lines:
+        if line is None:
+            continue
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line:
+            if data or event_id is not None:
+                yield event, "\n".join(data), event_id
+            event, data, event_id = "message", [], None
+            continue
+        if line.startswith(":"):
+            # Comment / keepalive
+            continue
+        field, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if field == "event":
+            event = value
+        elif field == "data":
+            data.append(value)
+        elif field == "id":
+            event_id = value
+
+
+class MeasurementStream:
+    """Background subscriber to a vest's live measurement stream.
+
+    Connects to ``{base_url}/vests/{vest_id}/measurements/stream`` and
+    appends every pushed measurement to ``buffer``.  When the connection
+    drops it reconnects with the last event id, so no rows are skipped.
+    """
+
+    def __init__(self, base_url, vest_id, capacity=20000, reconnect_delay=1.0,
+                 read_timeout=30, after_measurement_id=None):
+        self.url = f"{base_url.rstrip('/')}/vests/{vest_id}/measurements/stream"
+        self.vest_id = vest_id
+        self.buffer = RingBuffer(capacity)
+        self.reconnect_delay = reconnect_delay
+        self.read_timeout = read_timeout
+        self.last_event_id = None if after_measurement_id is None else str(after_measurement_id)
+        self.connected = False
+        self.error = None
+
+        self._session = requests.Session()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"live-stream-{vest_id}", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._session.close()
+
+    @property
+    def running(self):
+        return self._thread.is_alive() and not self._stop.is_set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._consume()
+            except (requests.RequestException, ValueError) as e:
+                self.error = str(e)
+            finally:
+                self.connected = False
+            self._stop.wait(self.reconnect_delay)
+
+    def _consume(self):
+        headers = {"Accept": "text/event-stream"}
+        if self.last_event_id is not None:
+            headers["Last-Event-ID"] = self.last_event_id
+        with self._session.get(self.url, headers=headers, stream=True,
+                               timeout=(5, self.read_timeout)) as response:
+            response.raise_for_status()
+            self.connected = True
+            self.error = None
+            for event, data, event_id in iter_sse_events(response.iter_lines(chunk_size=None)):
+                if self._stop.is_set():
+                    return
+                if event == "measurements" and data:
+                    self.buffer.extend(json.loads(data))
+                if event_id is not None:
+                    self.last_event_id = event_id
+
+    def wait_for(self, rows, timeout=5.0):
+        """Block until the buffer has received at least rows rows (used by tests)."""
+        deadline = time.monotonic() + timeout
+        while self.buffer.total < rows and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.buffer.total >= rows
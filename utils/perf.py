@@ -0,0 +1,260 @@
+"""Timing histograms for the hot paths, with Prometheus text export.
+
+A PerfRegistry holds one fixed-bucket Histogram per metric name and label
+set.  Record with timed() or instrument(), or with observe() when the
+duration was measured elsewhere.  Quantiles are estimated from the
+buckets the way Prometheus' histogram_quantile() does, so the numbers in
+the dashboard match what a scrape of to_prometheus() would give.
+
+The backend also uses the request-scoped RequestTiming: lambda_handler
+opens one per request, and phase() blocks (e.g. around each query in
+utils/db_connector.py) add to it without the timing having to be passed
+down.  Its header() is the value for a Server-Timing response header.
+"""
+import bisect
+import contextvars
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket upper bounds in seconds, from sub-millisecond queries to slow page loads
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+# Server-Timing entries for individual queries stop after this many
+MAX_TIMING_ENTRIES = 20
+
+
+class Histogram:
+    """Per-bucket counts plus count, sum and extremes of the observed values."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate the q-quantile by interpolating within its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                # Observed extremes are tighter bounds than the bucket edges
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class PerfRegistry:
+    """Thread-safe collection of timing histograms and gauges."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._gauges = {}
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, text):
+        """Set the HELP text exported for a metric."""
+        self._help[name] = text
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    @contextmanager
+    def timed(self, name, **labels):
+        """Time the with block into the histogram for name and labels."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def instrument(self, name, label="function"):
+        """Decorator timing each call, labelled with the function's name."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timed(name, **{label: func.__name__}):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """One dict per histogram: name, labels, count, mean and p50/p95/p99 (seconds)."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            rows = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "mean": histogram.sum / histogram.count,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99),
+                    "max": histogram.max,
+                }
+                for (name, labels), histogram in items
+            ]
+        return rows
+
+    def to_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            gauges = sorted(self._gauges.items())
+            described = set()
+
+            def header(name, kind):
+                if name not in described:
+                    described.add(name)
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+
+            for (name, labels), histogram in histograms:
+                header(name, "histogram")
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), histogram.counts):
+                    cumulative += count
+                    le = (("le", _format_number(bound)),)
+                    lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(histogram.sum)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+            for (name, labels), value in gauges:
+                header(name, "gauge")
+                lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._gauges.clear()
+
+
+class RequestTiming:
+    """Phase durations of one request, rendered as a Server-Timing header."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.route = None
+        self.phases = {}
+        self.queries = []
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        if phase == "db":
+            self.queries.append(seconds)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def header(self, total=None):
+        total = self.elapsed if total is None else total
+        entries = [f"total;dur={total * 1000:.2f}"]
+        for phase, seconds in self.phases.items():
+            entry = f"{phase};dur={seconds * 1000:.2f}"
+            if phase == "db":
+                entry += f';desc="{len(self.queries)} queries"'
+            entries.append(entry)
+        entries.extend(
+            f"db-{i};dur={seconds * 1000:.2f}"
+            for i, seconds in enumerate(self.queries[:MAX_TIMING_ENTRIES], start=1)
+        )
+        return ", ".join(entries)
+
+
+_current_timing = contextvars.ContextVar("request_timing", default=None)
+
+
+@contextmanager
+def request_timing():
+    """Make a fresh RequestTiming current for the with block."""
+    timing = RequestTiming()
+    token = _current_timing.set(timing)
+    try:
+        yield timing
+    finally:
+        _current_timing.reset(token)
+
+
+@contextmanager
+def phase(name):
+    """Add the with block's duration to the current request's phase."""
+    timing = _current_timing.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - start)
+
+
+def parse_server_timing(header):
+    """{name: seconds} from a Server-Timing header value; entries without dur are skipped."""
+    timings = {}
+    for entry in (header or "").split(","):
+        name, *params = [part.strip() for part in entry.split(";")]
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "dur":
+                try:
+                    timings[name] = float(value) / 1000
+                except ValueError:
+                    pass
+    return timings
+
+
+# Process-wide registry the backend records into (served as /metrics by local_server)
+registry = PerfRegistry()
@@ -0,0 +1,238 @@
+"""Incremental per-sensor metrics over a stream of readings.
+
+Each sample is folded into the running state in O(1) amortized time, so
+metrics stay current as new rows arrive instead of being recomputed over
+the whole history:
+
+- RollingStats: mean, variance, min and max over the last `window`
+  seconds.  Sums are kept relative to the first value seen, which keeps
+  the variance accurate when values sit far from zero.  Min and max use
+  monotonic deques, so each sample is pushed and popped at most once.
+- PeakDetector: counts threshold crossings with hysteresis (a peak ends
+  when the value falls below threshold - hysteresis) and a minimum time
+  between peaks, and reports each peak's highest value.  For an IMU this
+  is a punch; for a flex sensor, a full bend.
+
+FeatureEngine keeps one SensorFeatures per key (a sensor_id, or a
+(vest_id, sensor_id) pair when it sees several vests) and is fed in
+arrival order.  Timestamps are seconds as floats; a sample older than
+the previous one for its key is treated as arriving at the same time.
+"""
+import math
+import threading
+from collections import deque
+
+
+class RollingStats:
+    """Mean, variance, min and max of the samples in the last window seconds."""
+
+    # Times and values sit in parallel deques of floats rather than one deque
+    # of tuples: floats are not tracked by the garbage collector, so a large
+    # window does not make every collection walk hundreds of thousands of tuples.
+    __slots__ = ("window", "_times", "_values", "_min_times", "_mins", "_max_times", "_maxes",
+                 "_shift", "_sum", "_sumsq", "_last_t")
+
+    def __init__(self, window):
+        if not window > 0:
+            raise ValueError(f"Rolling window must be positive: {window}")
+        self.window = window
+        self._times = deque()
+        self._values = deque()
+        self._min_times = deque()
+        self._mins = deque()  # increasing from the front
+        self._max_times = deque()
+        self._maxes = deque()  # decreasing from the front
+        self._shift = None
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self._last_t = -math.inf
+
+    def push(self, t, value):
+        if t < self._last_t:
+            t = self._last_t
+        self._last_t = t
+        if self._shift is None:
+            self._shift = value
+        shift = self._shift
+        delta = value - shift
+        self._sum += delta
+        self._sumsq += delta * delta
+        times, values = self._times, self._values
+        times.append(t)
+        values.append(value)
+
+        mins, min_times = self._mins, self._min_times
+        while mins and mins[-1] >= value:
+            mins.pop()
+            min_times.pop()
+        mins.append(value)
+        min_times.append(t)
+        maxes, max_times = self._maxes, self._max_times
+        while maxes and maxes[-1] <= value:
+            maxes.pop()
+            max_times.pop()
+        maxes.append(value)
+        max_times.append(t)
+
+        cutoff = t - self.window
+        while times and times[0] <= cutoff:
+            times.popleft()
+            delta = values.popleft() - shift
+            self._sum -= delta
+            self._sumsq -= delta * delta
+        while min_times and min_times[0] <= cutoff:
+            min_times.popleft()
+            mins.popleft()
+        while max_times and max_times[0] <= cutoff:
+            max_times.popleft()
+            maxes.popleft()
+
+    def __len__(self):
+        return len(self._values)
+
+    @property
+    def mean(self):
+        if not self._values:
+            return None
+        return self._shift + self._sum / len(self._values)
+
+    @property
+    def variance(self):
+        count = len(self._values)
+        if not count:
+            return None
+        return max(0.0, (self._sumsq - self._sum * self._sum / count) / count)
+
+    @property
+    def min(self):
+        return self._mins[0] if self._mins else None
+
+    @property
+    def max(self):
+        return self._maxes[0] if self._maxes else None
+
+
+class PeakDetector:
+    """Threshold crossings with hysteresis; push() returns (t, value) when a peak ends."""
+
+    __slots__ = ("threshold", "release", "min_interval", "count", "_above", "_peak_t", "_peak", "_last_peak_t")
+
+    def __init__(self, threshold, hysteresis=0.0, min_interval=0.0):
+        self.threshold = threshold
+        self.release = threshold - hysteresis
+        self.min_interval = min_interval
+        self.count = 0
+        self._above = False
+        self._peak_t = None
+        self._peak = None
+        self._last_peak_t = -math.inf
+
+    def push(self, t, value):
+        if not self._above:
+            if value >= self.threshold and t - self._last_peak_t >= self.min_interval:
+                self._above = True
+                self._peak_t, self._peak = t, value
+            return None
+        if value > self._peak:
+            self._peak_t, self._peak = t, value
+        if value < self.release:
+            self._above = False
+            self.count += 1
+            self._last_peak_t = self._peak_t
+            return (self._peak_t, self._peak)
+        return None
+
+
+class SensorFeatures:
+    """Rolling statistics and peak counts for one sensor."""
+
+    __slots__ = ("stats", "peaks", "samples", "last_value", "last_t", "highest_peak", "last_peak_t")
+
+    def __init__(self, window, threshold=None, hysteresis=0.0, min_interval=0.0):
+        self.stats = RollingStats(window)
+        self.peaks = PeakDetector(threshold, hysteresis, min_interval) if threshold is not None else None
+        self.samples = 0
+        self.last_value = None
+        self.last_t = None
+        self.highest_peak = None
+        self.last_peak_t = None
+
+    def push(self, t, value):
+        self.stats.push(t, value)
+        self.samples += 1
+        self.last_value = value
+        self.last_t = t
+        if self.peaks is None:
+            return None
+        peak = self.peaks.push(t, value)
+        if peak is not None:
+            self.last_peak_t = peak[0]
+            if self.highest_peak is None or peak[1] > self.highest_peak:
+                self.highest_peak = peak[1]
+        return peak
+
+    def snapshot(self):
+        stats = self.stats
+        low, high = stats.min, stats.max
+        return {
+            "samples": self.samples,
+            "last_value": self.last_value,
+            "last_t": self.last_t,
+            "mean": stats.mean,
+            "std": None if stats.variance is None else math.sqrt(stats.variance),
+            "min": low,
+            "max": high,
+            "range": None if low is None else high - low,
+            "peaks": self.peaks.count if self.peaks is not None else None,
+            "highest_peak": self.highest_peak,
+            "last_peak_t": self.last_peak_t,
+        }
+
+
+class FeatureEngine:
+    """SensorFeatures per key, created on first sight, all with the same settings."""
+
+    def __init__(self, window=5.0, threshold=None, hysteresis=0.0, min_interval=0.0):
+        if not window > 0:
+            raise ValueError(f"Rolling window must be positive: {window}")
+        self.window = window
+        self.threshold = threshold
+        self.hysteresis = hysteresis
+        self.min_interval = min_interval
+        self._sensors = {}
+        self._lock = threading.Lock()
+
+    def _features(self, key):
+        features = self._sensors.get(key)
+        if features is None:
+            features = self._sensors[key] = SensorFeatures(
+                self.window, self.threshold, self.hysteresis, self.min_interval
+            )
+        return features
+
+    def update(self, key, t, value):
+        """Fold one sample in; returns (t, peak value) when it ends a peak."""
+        with self._lock:
+            return self._features(key).push(t, value)
+
+    def update_many(self, keys, times, values):
+        """Fold samples in arrival order; returns the peaks they ended as (key, t, value)."""
+        peaks = []
+        sensors = self._sensors
+        with self._lock:
+            for key, t, value in zip(keys, times, values):
+                features = sensors.get(key)
+                if features is None:
+                    features = self._features(key)
+                peak = features.push(t, value)
+                if peak is not None:
+                    peaks.append((key, peak[0], peak[1]))
+        return peaks
+
+    def snapshot(self):
+        """{key: metrics dict} for every key seen so far."""
+        with self._lock:
+            return {key: features.snapshot() for key, features in self._sensors.items()}
+
+    def __len__(self):
+        return len(self._sensors)